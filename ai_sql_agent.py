@@ -3,6 +3,8 @@ from openai import OpenAI
 import streamlit as st
 import re
 
+from src.agent.sql_guardrails import IncrementalSqlExtractor
+
 def setup_database():
     conn = sqlite3.connect('test.db')
     cursor = conn.cursor()
@@ -31,8 +33,12 @@ def execute_sql_query(sql_query):
         return str(e)
 
 # Agent interaction function
-def query_agent(query_to_agent):
-    """Send the user query to the LLM agent and return the generated SQL query and answer."""
+def query_agent(query_to_agent, stream=False, on_delta=None):
+    """Send the user query to the LLM agent and return the generated SQL query and answer.
+
+    With stream=True the completion is streamed and closed as soon as the first
+    complete SELECT statement has arrived; on_delta receives the SQL typed so far.
+    """
     # OpenAI agent setup
     url = "http://localhost:1234/v1"
     client = OpenAI(base_url=url, api_key="lm-studio")
@@ -55,9 +61,26 @@ def query_agent(query_to_agent):
         model="lmstudio-community/Meta-Llama-3.1-8B-Instruct-GGUF",
         messages=history,
         temperature=0.7,
-        stream=False,
+        stream=stream,
     )
 
+    if stream:
+        extractor = IncrementalSqlExtractor()
+        try:
+            for chunk in completion:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                done = extractor.feed(delta) is not None
+                if on_delta is not None and extractor.partial:
+                    on_delta(extractor.partial)
+                if done:
+                    break
+        finally:
+            completion.close()
+        # Same fallback as the providers path when the reply ends without a ';'
+        return extractor.buffer, extractor.finish() or None
+
     # Extract SQL query from assistant's response
     response_content = completion.choices[0].message.content if completion.choices else ""
     
@@ -87,7 +110,11 @@ def main():
         if query_to_agent:
             # Query the agent
             st.info("Sending query to the assistant...")
-            response_content, sql_query = query_agent(query_to_agent)
+            live_sql = st.empty()
+            response_content, sql_query = query_agent(
+                query_to_agent, stream=True, on_delta=lambda text: live_sql.code(text, language="sql")
+            )
+            live_sql.empty()
 
             if sql_query:
                 # Display the generated SQL
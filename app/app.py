@@ -1,7 +1,8 @@
+import functools
 import os
 import sys
 import time
-from typing import List
+from typing import List, Optional, Tuple
 
 import pandas as pd
 import streamlit as st
@@ -12,134 +13,210 @@ PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
-from src.agent.sql_guardrails import ensure_limit, contains_forbidden, is_select_only
-from src.db.sqlite import execute_readonly, list_tables, preview_table, get_schema_overview, build_erd_dot
+from src.agent.sql_guardrails import check_sql
+from src.db.sqlite import preview_table, get_schema_overview
+from src.db.adapter import DatabaseAdapter, SQLiteAdapter, get_adapter
+from src.db.catalog import invalidate_catalog
+from src.db.erd import build_erd_dot, render_erd_svg
+from src.db.result_cache import RESULT_CACHE
+from src.db.paginator import Paginator
+from src.db.stats import TableStats, column_hint, get_stats
+from src.db.export import COMPRESSIONS, EXPORT_DOWNLOAD_MAX_BYTES, MIME_TYPES, export_filename, export_to_file, read_export
+from src.db.arrow import arrow_cache_key, iter_record_batches, to_pandas as arrow_to_pandas, to_table
+from src.db.governor import QueryBudgetExceeded
+from src.db.plan_gate import PLAN_GATE_POLICY, POLICIES, check_plan, format_plan
+from src.db.index_advisor import WORKLOAD_PATH, apply_recommendations, format_timings, load_workload, recommend, record_query, time_workload
+from src.agent.generation_cache import get_generation_cache
+from src.agent.schema_index import build_sql_prompt
 from src.agent.providers import (
     get_provider,
+    get_model_id,
     LLMProvider,
     generate_sql_openai,
     generate_sql_bedrock,
+    stream_sql_openai,
+    stream_sql_bedrock,
 )
 
 
 st.set_page_config(page_title="AI SQL Agent (Bedrock)", layout="wide")
 
 
-def render_schema_help():
+def render_schema_help(adapter: DatabaseAdapter):
     st.sidebar.header("Settings")
-    st.sidebar.info("Local SQLite DB (test.db). Use the Data model tab to seed and inspect schema.")
+    st.sidebar.info(f"Database: {adapter.name}. Use the Data model tab to inspect the schema (and seed the SQLite demo).")
+
+
+def render_cache_settings() -> Tuple[bool, bool]:
+    use_gen_cache = st.sidebar.checkbox("Reuse SQL for repeated questions", value=True)
+    bypass = st.sidebar.checkbox("Bypass result cache", value=False)
+    stats = RESULT_CACHE.stats()
+    st.sidebar.caption(
+        f"Result cache: {stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB; "
+        f"{stats['hits']} hits / {stats['misses']} misses / {stats['evictions']} evictions"
+    )
+    return use_gen_cache, bypass
 
 
 def main():
     st.title("AI SQL Agent — Amazon Bedrock + Streamlit")
     st.write("Enter a natural language question. The agent will propose SQL and run it safely.")
 
-    render_schema_help()
+    adapter = get_adapter()
+    # The plan gate, paginator, export, statistics and index advisor are SQLite-only
+    local = isinstance(adapter, SQLiteAdapter)
+    render_schema_help(adapter)
+    use_gen_cache, bypass_cache = render_cache_settings()
 
     if "proposed_sql" not in st.session_state:
         st.session_state.proposed_sql = None
+    if "plan_decision" not in st.session_state:
+        st.session_state.plan_decision = None
+    if "export_sql" not in st.session_state:
+        st.session_state.export_sql = None
+    if "remote_plan" not in st.session_state:
+        st.session_state.remote_plan = None
 
     provider = st.sidebar.selectbox("LLM Provider", [LLMProvider.OPENAI, LLMProvider.BEDROCK], index=0)
     if provider == LLMProvider.OPENAI:
         openai_key = st.sidebar.text_input("OPENAI_API_KEY", type="password")
     else:
         st.sidebar.info("Using AWS credentials from env for Bedrock")
+    stream_generation = st.sidebar.checkbox("Stream SQL as it is generated", value=True)
+    # Off SQLite an EXPLAIN is a real query, billed on Athena
+    explain_remote = not local and st.sidebar.checkbox("Explain generated SQL on the database", value=False)
+    gate_policy = st.sidebar.selectbox(
+        "Query plan check", POLICIES, index=POLICIES.index(PLAN_GATE_POLICY) if PLAN_GATE_POLICY in POLICIES else 1
+    )
 
     # Tabs for main content
-    tab_query, tab_model = st.tabs(["Query", "Data model"])
+    tab_query, tab_model = st.tabs(["Query", "Data model"], key="main_tab", on_change="rerun")
 
     with tab_query:
         question = st.text_input("Ask a question")
         generate_clicked = st.button("Generate SQL")
 
     with tab_model:
-        st.subheader("Data model")
-        if st.button("Seed demo data"):
-            try:
-                from src.data.seed_sqlite import seed_baseball
-                seed_baseball()
-                st.success("Seeded Baseball tables into SQLite.")
-            except Exception as e:
-                st.error(str(e))
+        # Hidden tabs skip their work entirely; see render_data_model
+        if tab_model.open:
+            render_data_model(adapter, local)
 
-        st.caption("Schema overview (tables and columns):")
-        st.code(get_schema_overview() or "No tables found. Use Seed demo data.")
+    if generate_clicked and question:
+        schema_hash = adapter.catalog().fingerprint
+        model = get_model_id(provider)
+        gen_cache = get_generation_cache()
+        hit = gen_cache.get(question, schema_hash, provider, model) if use_gen_cache else None
+        if hit is not None:
+            proposed_sql = hit.sql
+        else:
+            prompt = build_sql_prompt(question, adapter=None if local else adapter)
+            live_sql = st.empty()
 
-        st.caption("Entity-Relationship Diagram (auto-generated):")
-        # Show a cleaner ERD with only table names and relationship arrows
-        dot = build_erd_dot(include_columns=False)
-        st.graphviz_chart(dot)
-        with st.expander("Show ERD DOT source"):
-            st.code(dot, language="dot")
+            def show_partial(text: str) -> None:
+                live_sql.code(text, language="sql")
 
-        # Schema dropdowns: tables → columns and types
-        st.caption("Schema details:")
-        tbls = [t for t in list_tables() if not t.startswith("sqlite_")]
-        for t in tbls:
-            with st.expander(t, expanded=False):
-                try:
-                    from src.db.sqlite import get_table_columns
-                    cols = get_table_columns(t)
-                    if cols:
-                        df_cols = pd.DataFrame(cols, columns=["column", "type"])
-                        st.table(df_cols)
-                    else:
-                        st.write("No columns.")
-                except Exception as e:
-                    st.write(str(e))
+            if provider == LLMProvider.OPENAI:
+                if not openai_key:
+                    st.error("Please provide OPENAI_API_KEY.")
+                    return
+                if stream_generation:
+                    proposed_sql = stream_sql_openai(prompt, api_key=openai_key, model=model, on_delta=show_partial)
+                else:
+                    proposed_sql = generate_sql_openai(prompt, api_key=openai_key, model=model)
+            elif stream_generation:
+                proposed_sql = stream_sql_bedrock(prompt, on_delta=show_partial)
+            else:
+                proposed_sql = generate_sql_bedrock(prompt)
+            live_sql.empty()
 
-        # Table row counts chart
-        try:
-            tbls = [t for t in list_tables() if not t.startswith("sqlite_")]
-            if tbls:
-                counts = []
-                for t in tbls:
-                    cols, rows = execute_readonly(f"SELECT COUNT(*) AS count FROM {t};")
-                    cnt = int(rows[0][0]) if rows and rows[0] else 0
-                    counts.append({"table": t, "rows": cnt})
-                if counts:
-                    st.caption("Row counts by table:")
-                    df_counts = pd.DataFrame(counts).set_index("table")
-                    st.bar_chart(df_counts)
-        except Exception:
-            pass
+        verdict = check_sql(proposed_sql, default_limit=50)
+        if not verdict.ok:
+            st.error(f"Generated SQL failed safety checks: {verdict.reason}.")
+            return
 
-    if generate_clicked and question:
-        prompt = (
-            "Return only a valid SQL SELECT statement ending with a semicolon; "
-            "avoid DDL/DML; include a LIMIT 50 if not specified.\n"
-            f"Schema:\n{get_schema_overview()}\n"
-            f"Question: {question}"
-        )
-        if provider == LLMProvider.OPENAI:
-            if not openai_key:
-                st.error("Please provide OPENAI_API_KEY.")
+        if use_gen_cache and hit is None:
+            gen_cache.put(question, schema_hash, provider, model, proposed_sql)
+        remote_plan = None
+        if local:
+            decision = check_plan(verdict.sql, policy=gate_policy)
+            if not decision.allowed:
+                st.error(f"Query rejected by the plan check: {decision.message}")
                 return
-            proposed_sql = generate_sql_openai(prompt, api_key=openai_key)
+            proposed_sql = decision.sql
         else:
-            proposed_sql = generate_sql_bedrock(prompt)
-
-        if not is_select_only(proposed_sql) or contains_forbidden(proposed_sql):
-            st.error("Generated SQL failed safety checks.")
-            return
-
-        proposed_sql = ensure_limit(proposed_sql, default_limit=50)
+            decision = None
+            proposed_sql = adapter.limit(verdict.statement, 50)
+            if explain_remote:
+                try:
+                    remote_plan = "\n".join(adapter.explain(proposed_sql))
+                except Exception as e:
+                    remote_plan = f"(no plan: {e})"
         st.session_state.proposed_sql = proposed_sql
+        st.session_state.plan_decision = decision
+        st.session_state.remote_plan = remote_plan
+        # Exports run the approved statement without the preview LIMIT
+        st.session_state.export_sql = verdict.statement
+        if hit is not None:
+            st.info(f"Reused cached SQL (similarity {hit.similarity:.2f} to: {hit.question})")
         st.success("SQL generated and saved. Review below and click Run SQL.")
 
     # Show current SQL (if any) and a persistent Run button
     if st.session_state.proposed_sql:
-        st.write("Current SQL:")
-        st.code(st.session_state.proposed_sql, language="sql")
+        sql_col, plan_col = st.columns([3, 2])
+        sql_col.write("Current SQL:")
+        sql_col.code(st.session_state.proposed_sql, language="sql")
+        decision = st.session_state.plan_decision
+        if decision is not None and decision.estimate is not None:
+            plan_col.write(f"Query plan (estimated cost {decision.estimate.cost:,.0f}, ~{decision.estimate.rows:,.0f} rows):")
+            plan_col.code(format_plan(decision.estimate.plan))
+        if decision is not None and decision.message:
+            note = "LIMIT added by the plan check. " if decision.action == "limit" else ""
+            plan_col.warning(note + decision.message)
+        if st.session_state.remote_plan:
+            plan_col.write("Query plan:")
+            plan_col.code(st.session_state.remote_plan)
 
     if st.button("Run SQL", disabled=not bool(st.session_state.proposed_sql)):
         try:
             start = time.time()
-            columns, rows = execute_readonly(st.session_state.proposed_sql)
+            query_stats = []  # Athena: bytes scanned and engine time of this run
+            caption = st.empty()
+            table = st.empty()
+            # Off SQLite there is no data_version to key cached results on
+            key = arrow_cache_key(st.session_state.proposed_sql) if local else None
+            cached = None if bypass_cache or key is None else RESULT_CACHE.get(key)
+            if cached is not None:
+                result = cached[1]
+            else:
+                batches = []
+                n_rows = 0
+                # Render the first batch as soon as it arrives; the rest streams in behind it
+                source = iter_record_batches(
+                    st.session_state.proposed_sql,
+                    budget=adapter.query_budget,
+                    adapter=None if local else adapter,
+                    on_stats=query_stats.append,
+                )
+                for batch in source:
+                    batches.append(batch)
+                    n_rows += batch.num_rows
+                    caption.caption(f"Streaming results… {n_rows} rows so far")
+                    if len(batches) == 1:
+                        table.dataframe(arrow_to_pandas(batch), use_container_width=True)
+                result = to_table(batches)
+                if key is not None:
+                    RESULT_CACHE.put(key, result.column_names, result, size=result.nbytes)
             elapsed = time.time() - start
-            df = pd.DataFrame(rows, columns=columns)
-            st.caption(f"Query completed in {elapsed:.2f}s; {len(df)} rows")
-            st.dataframe(df, use_container_width=True)
+            if cached is None and local:
+                record_query(st.session_state.proposed_sql, elapsed)
+            df = arrow_to_pandas(result)
+            source = " (cached)" if cached is not None else ""
+            stats = query_stats[-1] if query_stats else None
+            if stats is not None:
+                reused = ", reused result" if stats.reused else ""
+                source = f" ({stats.scanned_bytes / 1e6:.1f} MB scanned, engine {stats.engine_ms / 1000:.2f}s{reused})"
+            caption.caption(f"Query completed in {elapsed:.2f}s{source}; {len(df)} rows")
+            table.dataframe(df, use_container_width=True)
             # Quick charts: try to find numeric columns for bar, date-like for line
             if not df.empty:
                 num_cols = df.select_dtypes(include=["number"]).columns.tolist()
@@ -155,10 +232,221 @@ def main():
                         st.line_chart(dff.select_dtypes(include=["number"]))
                     except Exception:
                         pass
-            st.download_button("Download CSV", df.to_csv(index=False), "results.csv", "text/csv")
+        except QueryBudgetExceeded as e:
+            st.warning(f"Query stopped: {e}")
         except Exception as e:
             st.error(str(e))
 
+    if st.session_state.export_sql and local:
+        render_browser(st.session_state.export_sql)
+        render_export(st.session_state.export_sql)
+
+
+# ``version`` (adapter.version()) only keys these; the adapter itself is not hashed: a reseed, new index or data change misses them
+@st.cache_data(show_spinner=False, max_entries=8)
+def cached_schema_overview(version: Tuple, _adapter: DatabaseAdapter) -> str:
+    return get_schema_overview(catalog=_adapter.catalog())
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def cached_erd(version: Tuple, focus: Optional[str], top_n: Optional[int], _adapter: DatabaseAdapter) -> Tuple[str, Optional[str]]:
+    dot = build_erd_dot(_adapter.catalog(), include_columns=False, focus=focus, top_n=top_n)
+    return dot, render_erd_svg(dot)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def cached_recommendations(version: Tuple, workload_stamp: Tuple) -> Tuple[list, list]:
+    workload = load_workload()
+    return workload, recommend(workload)
+
+
+def clear_data_model_caches() -> None:
+    """After seeding or creating indexes; the version keys would miss anyway, this frees the entries."""
+    invalidate_catalog()
+    for cached in (cached_schema_overview, cached_erd, cached_recommendations):
+        cached.clear()
+
+
+def _workload_stamp() -> Tuple:
+    try:
+        info = os.stat(WORKLOAD_PATH)
+    except FileNotFoundError:
+        return ()
+    return info.st_mtime_ns, info.st_size
+
+
+def render_data_model(adapter: DatabaseAdapter, local: bool) -> None:
+    """The Data model tab; every piece is cached on adapter.version() or deferred to its expander."""
+    st.subheader("Data model")
+    if local and st.button("Seed demo data"):
+        try:
+            from src.data.seed_sqlite import seed_baseball
+            loads = seed_baseball()
+            clear_data_model_caches()
+            st.success("Seeded Baseball tables into SQLite.")
+            lost = [f"{load.table}.{name}" for load in loads for name in load.lost_indexes]
+            if lost:
+                st.warning(f"Dropped indexes that no longer match the reloaded columns: {', '.join(lost)}")
+        except Exception as e:
+            st.error(str(e))
+
+    version = adapter.version()
+    catalog = adapter.catalog()
+    st.caption("Schema overview (tables and columns):")
+    st.code(cached_schema_overview(version, adapter) or "No tables found. Use Seed demo data.")
+
+    st.caption("Entity-Relationship Diagram (auto-generated):")
+    erd_tables = catalog.table_names()
+    erd_cols = st.columns(2)
+    focus = erd_cols[0].selectbox("Focus table", ["(all tables)"] + erd_tables, index=0)
+    top_n = erd_cols[1].number_input("Max tables (most connected first)", min_value=0, value=40, step=10)
+    # Show a cleaner ERD with only table names and relationship arrows
+    dot, svg = cached_erd(version, None if focus == "(all tables)" else focus, int(top_n) or None, adapter)
+    if svg:
+        st.image(svg, use_container_width=True)
+    else:
+        st.graphviz_chart(dot)
+    dot_source = st.expander("Show ERD DOT source", key="erd_dot", on_change="rerun")
+    with dot_source:
+        if dot_source.open:
+            st.code(dot, language="dot")
+
+    if local:
+        advisor = st.expander("Index advisor", key="index_advisor", on_change="rerun")
+        with advisor:
+            if advisor.open:
+                render_index_advisor(version)
+
+    # Schema dropdowns: tables → columns and types, plus statistics once collected
+    st.caption("Schema details:")
+    stats_service = get_stats() if local else None
+    table_stats = stats_service.current() if stats_service is not None else {}
+    for t in erd_tables:
+        details = st.expander(t, key=f"schema_{t}", on_change="rerun")
+        with details:
+            if details.open:
+                render_table_details([(c.name, c.type) for c in catalog.columns(t)], table_stats.get(t))
+
+    # Table row counts chart, from the statistics service (refreshed in the background)
+    counts = [{"table": t, "rows": table_stats[t].rows} for t in erd_tables if t in table_stats]
+    if counts:
+        st.caption("Row counts by table:")
+        st.bar_chart(pd.DataFrame(counts).set_index("table"))
+    if stats_service is not None:
+        failed = stats_service.failed()
+        skipped = [t for t in erd_tables if t not in table_stats and t in failed]
+        if skipped:
+            st.caption(f"No statistics for {', '.join(skipped)}: counting rows failed or exceeded the statistics budget.")
+        if len(counts) + len(skipped) < len(erd_tables):
+            st.caption("Collecting table statistics in the background…")
+
+
+def render_index_advisor(version: Tuple) -> None:
+    workload, recs = cached_recommendations(version, _workload_stamp())
+    st.caption(f"{len(workload)} distinct queries recorded from Run SQL.")
+    if not recs:
+        st.write("No recommendations.")
+        return
+    st.table(pd.DataFrame(
+        [(r.sql, "covering" if r.covering else r.reason, r.queries, round(r.weight_sec, 3)) for r in recs],
+        columns=["index", "kind", "queries", "recorded sec"],
+    ))
+    if st.button("Create recommended indexes and ANALYZE"):
+        with st.spinner("Timing workload, creating indexes…"):
+            before = time_workload(workload)
+            apply_recommendations(recs)
+            clear_data_model_caches()
+            after = time_workload(workload)
+        st.code(format_timings(before, after))
+
+
+def render_table_details(cols: List[Tuple[str, str]], stats: Optional[TableStats]) -> None:
+    if not cols:
+        st.write("No columns.")
+        return
+    df_cols = pd.DataFrame(cols, columns=["column", "type"])
+    if stats is not None and stats.partial:
+        st.caption(f"{stats.rows:,} rows; column statistics exceeded the statistics budget.")
+    elif stats is not None:
+        by_name = {c.name: c for c in stats.columns}
+        df_cols["null %"] = [round(100 * by_name[c].null_frac, 1) if c in by_name else None for c, _ in cols]
+        df_cols["distinct (est.)"] = [round(by_name[c].distinct) if c in by_name else None for c, _ in cols]
+        df_cols["values"] = [column_hint(by_name[c]) if c in by_name else "" for c, _ in cols]
+    st.table(df_cols)
+
+
+def render_browser(sql: str) -> None:
+    with st.expander("Browse full result (no preview LIMIT)"):
+        # One paginator per statement, so cached pages and the count survive reruns
+        pager = st.session_state.get("pager")
+        if pager is None or pager.sql != sql:
+            try:
+                pager = Paginator(sql)
+            except Exception as e:
+                st.error(str(e))
+                return
+            st.session_state.pager = pager
+            st.session_state.page_number = 0
+        number = st.session_state.page_number
+        try:
+            page = pager.page(number)
+        except QueryBudgetExceeded as e:
+            st.warning(f"Page stopped: {e}")
+            return
+        except Exception as e:
+            st.error(str(e))
+            return
+        st.dataframe(pd.DataFrame(page.rows, columns=page.columns), use_container_width=True)
+        cols = st.columns([1, 1, 4])
+        if cols[0].button("Previous", disabled=number == 0):
+            st.session_state.page_number = number - 1
+            st.rerun()
+        if cols[1].button("Next", disabled=not page.has_next):
+            st.session_state.page_number = number + 1
+            st.rerun()
+        total, pages = pager.total(), pager.page_count()
+        of = f" of {pages:,} ({total:,} rows)" if total is not None else " (counting rows…)"
+        cols[2].caption(f"Page {number + 1}{of}; {pager.strategy} pagination")
+
+
+def _discard_export() -> None:
+    previous = st.session_state.get("export_file")
+    st.session_state.export_file = None
+    if previous is not None and os.path.exists(previous[1]):
+        os.unlink(previous[1])
+
+
+def render_export(sql: str) -> None:
+    if "export_file" not in st.session_state:
+        st.session_state.export_file = None
+    # (sql, path, stats, file name, mime) of the last export, kept on disk until replaced
+    if st.session_state.export_file is not None and st.session_state.export_file[0] != sql:
+        _discard_export()
+    with st.expander("Export full result (no preview LIMIT)"):
+        cols = st.columns(3)
+        formats = {"CSV": "csv", "Parquet": "parquet", "Arrow IPC": "arrow"}
+        fmt = formats[cols[0].selectbox("Format", list(formats))]
+        compression = cols[1].selectbox("Compression", COMPRESSIONS[fmt], format_func=lambda c: c or "none")
+        if cols[2].button("Prepare export"):
+            _discard_export()
+            try:
+                with st.spinner("Exporting…"):
+                    path, stats = export_to_file(sql, fmt, compression)
+                st.session_state.export_file = (sql, path, stats, export_filename(fmt, compression), MIME_TYPES[fmt])
+            except QueryBudgetExceeded as e:
+                st.warning(f"Export stopped: {e}")
+            except Exception as e:
+                st.error(str(e))
+        if st.session_state.export_file is not None:
+            _, path, stats, name, mime = st.session_state.export_file
+            size = f"{stats.rows:,} rows ({stats.bytes / 2**20:.1f} MiB)"
+            if stats.bytes > EXPORT_DOWNLOAD_MAX_BYTES:
+                st.info(f"{size} written to {path}; too large to download from the browser.")
+            else:
+                # Read from disk only when clicked, without rerunning the app
+                st.download_button(f"Download {size}", functools.partial(read_export, path), name, mime, on_click="ignore")
+            st.caption(f"Exported in {stats.seconds:.2f}s")
+
 
 if __name__ == "__main__":
     main()
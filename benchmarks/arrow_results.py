@@ -0,0 +1,89 @@
+"""Row tuples -> DataFrame vs Arrow record batches -> ArrowDtype DataFrame.
+
+    python -m benchmarks.arrow_results --rows 2000000
+
+Builds a synthetic batting-like table, then runs each path in a fresh
+subprocess so peak RSS belongs to that path alone. "rows" is what app.py
+did before: ``execute_readonly_iter`` batches, one DataFrame per batch,
+concatenated. "arrow" is ``execute_arrow`` plus ``to_pandas``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+SQL = "SELECT player_id, year, team_id, g, ab, hr, avg FROM batting"
+
+
+def build_db(path: str, rows: int) -> None:
+    rng = random.Random(3)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE batting (player_id TEXT, year INTEGER, team_id TEXT, g INTEGER, ab INTEGER, hr INTEGER, avg REAL)"
+    )
+    with conn:
+        conn.executemany(
+            "INSERT INTO batting VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (f"player{i % 20000:05d}", 1871 + i % 145, f"T{i % 30}", rng.randint(1, 162), rng.randint(0, 600), None if i % 7 == 0 else rng.randint(0, 50), rng.random())
+                for i in range(rows)
+            ),
+        )
+    conn.close()
+
+
+def run_path(path: str) -> None:
+    import pandas as pd
+
+    from src.db.governor import QueryBudget
+    from src.db.sqlite import execute_readonly_iter
+
+    budget = QueryBudget(timeout_sec=None)
+    start = time.perf_counter()
+    if path == "rows":
+        frames = [pd.DataFrame(batch, columns=cols) for cols, batch in execute_readonly_iter(SQL, budget=budget)]
+        df = pd.concat(frames, ignore_index=True)
+    else:
+        from src.db.arrow import execute_arrow, to_pandas
+
+        df = to_pandas(execute_arrow(SQL, budget=budget))
+    elapsed = time.perf_counter() - start
+    frame_bytes = int(df.memory_usage(deep=True).sum())
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"sec": elapsed, "rows": len(df), "frame_bytes": frame_bytes, "peak_kib": peak_kib}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--run", choices=["rows", "arrow"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        run_path(args.run)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        build_db(path, args.rows)
+        env = dict(os.environ, SQLITE_PATH=path)
+        print(f"{'path':<6} {'sec':>7} {'frame MB':>9} {'peak RSS MB':>12}")
+        for name in ("rows", "arrow"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.arrow_results", "--run", name],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{name:<6} {r['sec']:>7.2f} {r['frame_bytes'] / 2**20:>9.1f} {r['peak_kib'] / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
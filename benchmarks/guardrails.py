@@ -0,0 +1,108 @@
+"""Compare the single-pass SQL lexer against the old regex guardrails.
+
+    python -m benchmarks.guardrails --statements 10000 --repeat 5
+
+Times the full check a generated query goes through (select-only, forbidden
+keywords, LIMIT rewrite): the legacy path runs ten regex scans per statement,
+the lexer path one tokenizer pass via ``check_sql``. Also counts how often
+the two disagree on the corpus, which is where the legacy misfires show up.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import statistics
+import time
+from typing import Callable, List, Sequence, Tuple
+
+from src.agent.sql_guardrails import check_many, check_sql
+
+
+# The regex guardrails as they were before the lexer, kept for comparison
+LEGACY_FORBIDDEN_PATTERNS = [
+    r"\bINSERT\b",
+    r"\bUPDATE\b",
+    r"\bDELETE\b",
+    r"\bDROP\b",
+    r"\bALTER\b",
+    r"\bCREATE\b",
+    r"\bATTACH\b",
+    r"\bPRAGMA\b",
+]
+
+
+def legacy_is_select_only(sql: str) -> bool:
+    return bool(re.match(r"^\s*SELECT\b", sql.strip(), flags=re.IGNORECASE))
+
+
+def legacy_contains_forbidden(sql: str) -> bool:
+    return any(re.search(p, sql, flags=re.IGNORECASE) for p in LEGACY_FORBIDDEN_PATTERNS)
+
+
+def legacy_ensure_limit(sql: str, default_limit: int = 500) -> str:
+    if re.search(r"\bLIMIT\s+\d+\b", sql, flags=re.IGNORECASE):
+        return sql
+    return f"{sql.rstrip(';')} LIMIT {default_limit};"
+
+
+def legacy_check(sql: str, default_limit: int = 500) -> Tuple[bool, str]:
+    ok = legacy_is_select_only(sql) and not legacy_contains_forbidden(sql)
+    return ok, legacy_ensure_limit(sql, default_limit) if ok else sql
+
+
+TEMPLATES = [
+    "SELECT nameFirst, nameLast FROM player WHERE birthYear > {n} ORDER BY birthYear;",
+    "SELECT p.nameFirst, SUM(b.hr) AS hr FROM batting b JOIN player p ON p.player_id = b.player_id "
+    "WHERE b.year = {n} GROUP BY p.player_id ORDER BY hr DESC LIMIT 10;",
+    "WITH top AS (SELECT player_id, SUM(salary) AS s FROM salary GROUP BY player_id ORDER BY s DESC LIMIT {n}) "
+    "SELECT p.nameLast, top.s FROM top JOIN player p USING (player_id);",
+    "SELECT team_id FROM team WHERE name = 'Update Giants' -- no delete here\nAND year > {n};",
+    "SELECT a FROM t1 UNION ALL SELECT a FROM t2 ORDER BY a LIMIT {n} OFFSET 20;",
+    "SELECT * FROM (SELECT player_id FROM hall_of_fame WHERE inducted = 'Y' LIMIT {n}) s;",
+    "SELECT 1; DROP TABLE player;",
+    "DELETE FROM player WHERE birthYear < {n};",
+]
+
+
+def make_corpus(n: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    return [rng.choice(TEMPLATES).format(n=rng.randint(1, 2000)) for _ in range(n)]
+
+
+def time_it(fn: Callable[[Sequence[str]], object], corpus: Sequence[str], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(corpus)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--statements", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.statements)
+    legacy = time_it(lambda c: [legacy_check(s) for s in c], corpus, args.repeat)
+    lexer = time_it(check_many, corpus, args.repeat)
+    n = len(corpus)
+    print(f"{'path':<8} {'total ms':>10} {'us/stmt':>9} {'stmt/s':>10}")
+    for name, sec in (("legacy", legacy), ("lexer", lexer)):
+        print(f"{name:<8} {sec * 1000:>10.1f} {sec / n * 1e6:>9.2f} {n / sec:>10.0f}")
+
+    disagreements = {}
+    for sql in set(corpus):
+        ok_old, _ = legacy_check(sql)
+        if ok_old != check_sql(sql).ok:
+            disagreements[sql] = (ok_old, check_sql(sql).reason)
+    print(f"verdicts differ on {len(disagreements)} distinct statements:")
+    for sql, (ok_old, reason) in sorted(disagreements.items())[:10]:
+        print(f"  legacy={'accept' if ok_old else 'reject'} lexer={reason or 'accept'}: {sql[:80]!r}")
+
+
+if __name__ == "__main__":
+    main()
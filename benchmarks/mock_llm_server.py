@@ -0,0 +1,148 @@
+"""Local OpenAI-compatible chat completions server that replays recorded answers.
+
+    python -m benchmarks.mock_llm_server --recordings benchmarks/data/baseball_questions.json \\
+        --port 8765 --latency-ms 400 --jitter-ms 100
+
+Point ``generate_sql_local(base_url="http://127.0.0.1:8765/v1")`` (or
+``OPENAI_API_BASE``) at it. A recording is ``{"question": ..., "completion": ...}``;
+the first recording whose question appears in the last user message wins.
+``"stream": true`` requests are answered as SSE in small chunks.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+FALLBACK_COMPLETION = "SELECT 1;"
+
+
+class MockLLM:
+    def __init__(self, recordings: List[Dict[str, str]], latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.recordings = [(r["question"].lower(), r["completion"]) for r in recordings]
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def complete(self, prompt: str) -> str:
+        with self._lock:
+            self.requests += 1
+        text = prompt.lower()
+        # Prefer the question line so schema text can't trigger a false match
+        marker = text.rfind("question:")
+        needle = text[marker:] if marker >= 0 else text
+        for question, completion in self.recordings:
+            if question in needle:
+                return completion
+        return FALLBACK_COMPLETION
+
+    def sleep(self) -> None:
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+
+def _make_handler(llm: MockLLM):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):  # keep benchmark output clean
+            pass
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("chat/completions"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            messages = body.get("messages") or [{}]
+            user = [m for m in messages if m.get("role") == "user"] or messages
+            completion = llm.complete(str(user[-1].get("content", "")))
+            llm.sleep()
+            model = body.get("model", "mock")
+            if body.get("stream"):
+                self._stream(completion, model)
+            else:
+                payload = json.dumps(
+                    {
+                        "id": "mock",
+                        "object": "chat.completion",
+                        "model": model,
+                        "choices": [
+                            {"index": 0, "message": {"role": "assistant", "content": completion}, "finish_reason": "stop"}
+                        ],
+                    }
+                ).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        def _stream(self, completion: str, model: str) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            try:
+                for i in range(0, len(completion), 8):
+                    chunk = {"model": model, "choices": [{"index": 0, "delta": {"content": completion[i : i + 8]}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client stopped reading early, which is the point of streaming
+            self.close_connection = True
+
+    return Handler
+
+
+def start_mock_server(
+    recordings: List[Dict[str, str]],
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    host: str = "127.0.0.1",
+    port: int = 0,
+) -> Tuple[ThreadingHTTPServer, str, MockLLM]:
+    """Start the server on a daemon thread; returns (server, base_url, llm)."""
+    llm = MockLLM(recordings, latency_ms, jitter_ms)
+    server = ThreadingHTTPServer((host, port), _make_handler(llm))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1", llm
+
+
+def load_recordings(path: Optional[str]) -> List[Dict[str, str]]:
+    if not path:
+        return []
+    with open(path) as f:
+        data = json.load(f)
+    return [r for r in data if "completion" in r]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recordings", default="benchmarks/data/baseball_questions.json")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, url, _ = start_mock_server(
+        load_recordings(args.recordings), args.latency_ms, args.jitter_ms, args.host, args.port
+    )
+    print(f"Mock LLM listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
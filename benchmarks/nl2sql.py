@@ -0,0 +1,197 @@
+"""End-to-end NL-to-SQL benchmark: latency per stage, throughput and execution accuracy.
+
+    python -m benchmarks.nl2sql                              # bundled mock LLM, 300ms latency
+    python -m benchmarks.nl2sql --concurrency 1 4 16 --repeat 3
+    python -m benchmarks.nl2sql --provider openai --model gpt-4o-mini
+    python -m benchmarks.nl2sql --provider local --base-url http://localhost:1234/v1
+
+Each question runs the same pipeline as the Streamlit app: build the prompt,
+generate, guardrails, ensure_limit, execute_readonly. A question counts as
+correct when its result rows equal the gold SQL's as a multiset (column
+names and row order are ignored). Runs against SQLITE_PATH, so seed first.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.agent.providers import generate_sql_bedrock, generate_sql_local, generate_sql_openai
+from src.agent.schema_index import build_sql_prompt
+from src.agent.sql_guardrails import contains_forbidden, ensure_limit, is_select_only
+from src.db.governor import USER_QUERY_BUDGET
+from src.db.sqlite import execute_readonly
+
+from .mock_llm_server import load_recordings, start_mock_server
+
+STAGES = ("prompt", "generate", "guardrails", "limit", "execute")
+DEFAULT_QUESTIONS = os.path.join(os.path.dirname(__file__), "data", "baseball_questions.json")
+
+
+class QuestionResult(NamedTuple):
+    question: str
+    sql: Optional[str]
+    timings: Dict[str, float]
+    correct: bool
+    error: Optional[str]
+
+
+def _normalize_row(row: Tuple) -> Tuple:
+    return tuple(round(v, 6) if isinstance(v, float) else v for v in row)
+
+
+def same_results(rows: Sequence[Tuple], gold: Sequence[Tuple]) -> bool:
+    return Counter(map(_normalize_row, rows)) == Counter(map(_normalize_row, gold))
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty sample."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def run_question(
+    item: Dict[str, str],
+    generate: Callable[[str], str],
+    gold: Dict[str, Optional[List[Tuple]]],
+    default_limit: int = 50,
+) -> QuestionResult:
+    question = item["question"]
+    timings: Dict[str, float] = {}
+    sql: Optional[str] = None
+
+    def timed(stage: str, fn: Callable):
+        start = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            timings[stage] = time.perf_counter() - start
+
+    try:
+        prompt = timed("prompt", lambda: build_sql_prompt(question, default_limit))
+        sql = timed("generate", lambda: generate(prompt))
+        safe = timed("guardrails", lambda: is_select_only(sql) and not contains_forbidden(sql))
+        if not safe:
+            return QuestionResult(question, sql, timings, False, "failed guardrails")
+        sql = timed("limit", lambda: ensure_limit(sql, default_limit=default_limit))
+        _, rows = timed("execute", lambda: execute_readonly(sql, budget=USER_QUERY_BUDGET))
+    except Exception as e:
+        return QuestionResult(question, sql, timings, False, f"{type(e).__name__}: {e}")
+    expected = gold.get(question)
+    return QuestionResult(question, sql, timings, expected is not None and same_results(rows, expected), None)
+
+
+def gold_results(items: Sequence[Dict[str, str]]) -> Dict[str, Optional[List[Tuple]]]:
+    gold: Dict[str, Optional[List[Tuple]]] = {}
+    for item in items:
+        try:
+            gold[item["question"]] = execute_readonly(item["gold_sql"], budget=USER_QUERY_BUDGET)[1]
+        except Exception:
+            gold[item["question"]] = None
+    return gold
+
+
+def run_benchmark(
+    items: Sequence[Dict[str, str]],
+    generate: Callable[[str], str],
+    concurrency: int = 1,
+    repeat: int = 1,
+    gold: Optional[Dict[str, Optional[List[Tuple]]]] = None,
+) -> Dict:
+    """Run every question ``repeat`` times with ``concurrency`` clients; return a report dict."""
+    gold = gold if gold is not None else gold_results(items)
+    work = [item for _ in range(repeat) for item in items]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        results = list(pool.map(partial(run_question, generate=generate, gold=gold), work))
+    wall = time.perf_counter() - start
+
+    stages: Dict[str, Dict[str, float]] = {}
+    for stage in STAGES + ("total",):
+        if stage == "total":
+            values = [sum(r.timings.values()) for r in results]
+        else:
+            values = [r.timings[stage] for r in results if stage in r.timings]
+        stages[stage] = {f"p{p}": percentile(values, p) * 1000 for p in (50, 95, 99)}
+    return {
+        "concurrency": concurrency,
+        "runs": len(results),
+        "wall_sec": wall,
+        "throughput_qps": len(results) / wall if wall else 0.0,
+        "accuracy": sum(r.correct for r in results) / len(results) if results else 0.0,
+        "errors": sum(r.error is not None for r in results),
+        "gold_missing": sum(v is None for v in gold.values()),
+        "stages_ms": stages,
+        "failures": sorted({(r.question, r.error or "wrong result") for r in results if not r.correct}),
+    }
+
+
+def format_report(report: Dict) -> str:
+    lines = [
+        f"concurrency={report['concurrency']} runs={report['runs']} "
+        f"throughput={report['throughput_qps']:.2f} q/s accuracy={report['accuracy']:.1%} "
+        f"errors={report['errors']} gold_missing={report['gold_missing']}",
+        f"  {'stage':<11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+    ]
+    for stage, pct in report["stages_ms"].items():
+        lines.append(f"  {stage:<11}{pct['p50']:>10.1f}{pct['p95']:>10.1f}{pct['p99']:>10.1f}")
+    return "\n".join(lines)
+
+
+def make_generator(args: argparse.Namespace) -> Tuple[Callable[[str], str], Callable[[], None]]:
+    """Return (generate, shutdown) for the chosen provider."""
+    if args.provider == "mock":
+        server, url, _ = start_mock_server(load_recordings(args.questions), args.latency_ms, args.jitter_ms)
+        return partial(generate_sql_local, base_url=url, model="mock"), server.shutdown
+    if args.provider == "local":
+        return partial(generate_sql_local, base_url=args.base_url, model=args.model or "local-model"), lambda: None
+    if args.provider == "openai":
+        key = os.environ["OPENAI_API_KEY"]
+        kwargs = {"model": args.model} if args.model else {}
+        return partial(generate_sql_openai, api_key=key, **kwargs), lambda: None
+    return generate_sql_bedrock, lambda: None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS)
+    parser.add_argument("--provider", choices=["mock", "local", "openai", "bedrock"], default="mock")
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--base-url", default="http://localhost:1234/v1")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="mock provider only")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="mock provider only")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--json", dest="json_path", default=None, help="also write the reports here")
+    args = parser.parse_args()
+
+    with open(args.questions) as f:
+        items = json.load(f)
+    generate, shutdown = make_generator(args)
+    try:
+        gold = gold_results(items)
+        build_sql_prompt(items[0]["question"])  # warm the schema index outside the timings
+        reports = [run_benchmark(items, generate, c, args.repeat, gold) for c in args.concurrency]
+    finally:
+        shutdown()
+    for report in reports:
+        print(format_report(report))
+        for question, error in report["failures"]:
+            print(f"    x {question}: {error}")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
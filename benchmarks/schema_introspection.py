@@ -0,0 +1,75 @@
+"""Compare bulk vs per-table schema introspection on synthetic schemas.
+
+    python -m benchmarks.schema_introspection --tables 100 1000 2000
+
+Also times a warm ``get_catalog`` lookup, which is what every schema consumer
+pays once the catalog is built. On local SQLite files the two introspection
+strategies land within noise of each other (the pragma table-valued functions
+re-prepare a PRAGMA per outer row), so the catalog cache is the main win; the
+single statement matters most where a round trip is expensive.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from typing import Callable, List
+
+from src.db.catalog import get_catalog, introspect_bulk, introspect_per_table
+
+
+def build_schema(path: str, n_tables: int, n_columns: int) -> None:
+    conn = sqlite3.connect(path)
+    with conn:
+        for i in range(n_tables):
+            cols = [f"t{i}_id INTEGER PRIMARY KEY"]
+            cols += [f"c{j} TEXT" for j in range(n_columns - 2)]
+            # Chain every table to its predecessor so FK lists are non-empty
+            if i:
+                cols.append(f"t{i - 1}_id INTEGER REFERENCES t{i - 1}(t{i - 1}_id)")
+            else:
+                cols.append("extra INTEGER")
+            conn.execute(f"CREATE TABLE t{i} ({', '.join(cols)})")
+    conn.close()
+
+
+def time_it(fn: Callable, path: str, repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        # Fresh connection each run so schema parsing is part of the cost, as in the app
+        conn = sqlite3.connect(path)
+        start = time.perf_counter()
+        fn(conn)
+        timings.append(time.perf_counter() - start)
+        conn.close()
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tables", type=int, nargs="+", default=[100, 1000, 2000])
+    parser.add_argument("--columns", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'tables':>8} {'per-table ms':>14} {'bulk ms':>10} {'speedup':>8} {'cached ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.tables:
+            path = os.path.join(tmp, f"schema_{n}.db")
+            build_schema(path, n, args.columns)
+            slow = statistics.median(time_it(introspect_per_table, path, args.repeat))
+            fast = statistics.median(time_it(introspect_bulk, path, args.repeat))
+            get_catalog(path)
+            cached = statistics.median(time_it(lambda _conn: get_catalog(path), path, args.repeat))
+            print(
+                f"{n:>8} {slow * 1e3:>14.1f} {fast * 1e3:>10.1f} {slow / fast:>7.1f}x"
+                f" {cached * 1e3:>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
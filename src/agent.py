@@ -4,7 +4,12 @@ import json
 from typing import Dict, List, Optional
 import pandas as pd
 
+from src.db.athena import AthenaAdapter
+from src.db.governor import ATHENA_BUDGET, QueryBudget
+
 bucket_name = "llm-sandbox-842676020002"
+# Whole results: ATHENA_TIMEOUT_SEC still applies, the ATHENA_MAX_ROWS cap does not
+WHOLE_RESULT_BUDGET = QueryBudget(timeout_sec=ATHENA_BUDGET.timeout_sec)
 
 class DataAgent:
     def __init__(self):
@@ -13,6 +18,8 @@ class DataAgent:
             region_name='us-east-1'  # ensure Llama 2 is available in your region
         )
         self.athena = boto3.client('athena')
+        # Adaptive polling, paged typed results and result reuse; scanned bytes via iter_batches(on_stats=...)
+        self.warehouse = AthenaAdapter(self.athena, output_location=f"s3://{bucket_name}/query-results/")
         self.s3 = boto3.client('s3')
         
     def generate_sql(self, user_question: str) -> str:
@@ -55,25 +62,17 @@ class DataAgent:
         return response_body['generation']
 
     def execute_query(self, sql: str) -> pd.DataFrame:
-        """Execute query in Athena and return results"""
-        response = self.athena.start_query_execution(
-            QueryString=sql,
-            ResultConfiguration={
-                f'OutputLocation': 's3://{bucket_name}/query-results/'
-            }
-        )
-        
-        # Wait for query to complete
-        query_execution_id = response['QueryExecutionId']
-        waiter = self.athena.get_waiter('query_execution_complete')
-        waiter.wait(
-            QueryExecutionId=query_execution_id,
-            WaiterConfig={'Delay': 1, 'MaxAttempts': 60}
-        )
-        
-        # Get results
-        result_df = pd.read_csv(f"s3://{bucket_name}/query-results/{query_execution_id}.csv")
-        return result_df
+        """Execute query in Athena and return the whole result.
+
+        No row cap (only ATHENA_TIMEOUT_SEC); the frame is built one batch at
+        a time, so the rows are never all held as Python tuples.
+        """
+        return pd.concat(list(self.iter_query_batches(sql)), ignore_index=True)
+
+    def iter_query_batches(self, sql: str, batch_size: int = 10_000):
+        """Execute query in Athena and yield DataFrames of up to batch_size rows (no row cap, as execute_query)"""
+        for columns, rows in self.warehouse.iter_batches(sql, batch_size=batch_size, budget=WHOLE_RESULT_BUDGET):
+            yield pd.DataFrame.from_records(rows, columns=columns)
 
 # Testing function
 def test_llama_connection():
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Sequence
+
+from .providers import (
+    HTTP_POOL_SIZE,
+    LOCAL_LLM_BASE,
+    LOCAL_LLM_MODEL,
+    OPENAI_MODEL,
+    generate_sql_bedrock,
+    generate_sql_local,
+    generate_sql_openai,
+)
+
+
+# The sync providers already share pooled HTTP/boto3 connections, so the async
+# layer runs them on a thread pool sized to match rather than adding a second
+# HTTP stack (aiohttp/aiobotocore) to the dependencies.
+_EXECUTOR = ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE, thread_name_prefix="llm")
+
+AsyncGenerate = Callable[[str], Awaitable[str]]
+
+
+async def _run(fn: Callable[[], str]) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_EXECUTOR, fn)
+
+
+async def agenerate_sql_openai(prompt: str, api_key: str, model: str = OPENAI_MODEL) -> str:
+    return await _run(partial(generate_sql_openai, prompt, api_key=api_key, model=model))
+
+
+async def agenerate_sql_bedrock(prompt: str) -> str:
+    return await _run(partial(generate_sql_bedrock, prompt))
+
+
+async def agenerate_sql_local(prompt: str, base_url: str = LOCAL_LLM_BASE, model: str = LOCAL_LLM_MODEL) -> str:
+    return await _run(partial(generate_sql_local, prompt, base_url=base_url, model=model))
+
+
+class BatchResult(NamedTuple):
+    index: int
+    prompt: str
+    sql: Optional[str]
+    error: Optional[str]
+    elapsed_sec: float
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def generate_sql_batch(
+    prompts: Sequence[str],
+    generate: AsyncGenerate,
+    concurrency: int = 8,
+    timeout_sec: Optional[float] = 60.0,
+    on_result: Optional[Callable[[BatchResult], None]] = None,
+) -> List[BatchResult]:
+    """Generate SQL for many prompts with at most ``concurrency`` in flight.
+
+    Results come back in input order. A failure or timeout is recorded on its
+    own BatchResult and never cancels the rest of the batch. A timed-out call
+    stops being awaited, but its worker thread finishes the HTTP request.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(i: int, prompt: str) -> BatchResult:
+        async with semaphore:
+            start = time.perf_counter()
+            sql: Optional[str] = None
+            error: Optional[str] = None
+            try:
+                sql = await asyncio.wait_for(generate(prompt), timeout=timeout_sec)
+            except asyncio.TimeoutError:
+                error = f"timed out after {timeout_sec:g}s"
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            result = BatchResult(i, prompt, sql, error, time.perf_counter() - start)
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    return list(await asyncio.gather(*(one(i, p) for i, p in enumerate(prompts))))
+
+
+def run_sql_batch(prompts: Sequence[str], generate: AsyncGenerate, **kwargs) -> List[BatchResult]:
+    """Blocking wrapper around generate_sql_batch for scripts and notebooks."""
+    return asyncio.run(generate_sql_batch(prompts, generate, **kwargs))
@@ -2,9 +2,45 @@ from __future__ import annotations
 
 import json
 import os
-from typing import Any, Dict, List, Optional
+import threading
+from typing import Any, Dict, Iterator, List, Optional
 
 import boto3
+from botocore.config import Config
+
+
+DEFAULT_MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-5-sonnet-20240620-v1:0")
+BEDROCK_MAX_POOL_CONNECTIONS = int(os.getenv("BEDROCK_MAX_POOL_CONNECTIONS", "16"))
+BEDROCK_MAX_ATTEMPTS = int(os.getenv("BEDROCK_MAX_ATTEMPTS", "4"))
+BEDROCK_RETRY_MODE = os.getenv("BEDROCK_RETRY_MODE", "adaptive")
+BEDROCK_READ_TIMEOUT_SEC = int(os.getenv("BEDROCK_READ_TIMEOUT_SEC", "60"))
+
+_RUNTIME_CLIENTS: Dict[str, Any] = {}
+_RUNTIME_LOCK = threading.Lock()
+
+
+def get_runtime_client(region: str) -> Any:
+    """Shared bedrock-runtime client per region.
+
+    Built once with a tuned botocore Config: a larger connection pool and
+    standard/adaptive retry mode, which retries throttling and 5xx responses
+    with jittered exponential backoff. Client creation is not thread-safe, so
+    it happens under a lock; the client itself is.
+    """
+    client = _RUNTIME_CLIENTS.get(region)
+    if client is None:
+        with _RUNTIME_LOCK:
+            client = _RUNTIME_CLIENTS.get(region)
+            if client is None:
+                config = Config(
+                    max_pool_connections=BEDROCK_MAX_POOL_CONNECTIONS,
+                    retries={"max_attempts": BEDROCK_MAX_ATTEMPTS, "mode": BEDROCK_RETRY_MODE},
+                    read_timeout=BEDROCK_READ_TIMEOUT_SEC,
+                    tcp_keepalive=True,
+                )
+                client = boto3.session.Session().client("bedrock-runtime", region_name=region, config=config)
+                _RUNTIME_CLIENTS[region] = client
+    return client
 
 
 class BedrockToolUseClient:
@@ -15,9 +51,9 @@ class BedrockToolUseClient:
     def __init__(self,
                  model_id: Optional[str] = None,
                  region: Optional[str] = None):
-        self.model_id = model_id or os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-5-sonnet-20240620-v1:0")
+        self.model_id = model_id or DEFAULT_MODEL_ID
         self.region = region or os.getenv("AWS_DEFAULT_REGION", "us-east-1")
-        self.client = boto3.client("bedrock-runtime", region_name=self.region)
+        self.client = get_runtime_client(self.region)
 
     def invoke_text(self, system: str, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         payload: Dict[str, Any] = {
@@ -38,5 +74,26 @@ class BedrockToolUseClient:
         body = json.loads(response["body"].read())
         return body
 
-
-
+    def stream_text(self, system: str, messages: List[Dict[str, Any]]) -> Iterator[str]:
+        """Yield text deltas from ConverseStream; closing the generator closes the stream."""
+        converse_messages = [
+            {
+                "role": m["role"],
+                "content": [{"text": m["content"]}] if isinstance(m["content"], str) else m["content"],
+            }
+            for m in messages
+        ]
+        response = self.client.converse_stream(
+            modelId=self.model_id,
+            system=[{"text": system}],
+            messages=converse_messages,
+            inferenceConfig={"temperature": 0.1},
+        )
+        stream = response["stream"]
+        try:
+            for event in stream:
+                text = event.get("contentBlockDelta", {}).get("delta", {}).get("text")
+                if text:
+                    yield text
+        finally:
+            stream.close()
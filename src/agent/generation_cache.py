@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+
+GEN_CACHE_PATH = os.getenv("SQL_GEN_CACHE_PATH", os.path.abspath(".cache/nl2sql_cache.db"))
+GEN_CACHE_THRESHOLD = float(os.getenv("SQL_GEN_CACHE_THRESHOLD", "0.9"))
+VECTOR_DIM = 512
+
+_PUNCT = re.compile(r"[^\w\s]")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(_PUNCT.sub(" ", question.lower()).split())
+
+
+def vectorize(text: str, dim: int = VECTOR_DIM) -> List[float]:
+    """L2-normalized hashing-trick vector of words and word character trigrams."""
+    vec = [0.0] * dim
+    for word in normalize_question(text).split():
+        features = [word]
+        padded = f"#{word}#"
+        features += [padded[i : i + 3] for i in range(len(padded) - 2)]
+        for f in features:
+            h = zlib.crc32(f.encode())
+            # Signed hashing keeps collisions from only ever adding up
+            vec[h % dim] += 1.0 if (h >> 31) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec))
+    return [v / norm for v in vec] if norm else vec
+
+
+def cosine(a: List[float], b: List[float]) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+class CacheHit(NamedTuple):
+    sql: str
+    similarity: float
+    question: str
+
+
+class GenerationCache:
+    """On-disk cache of generated SQL keyed by question, schema, provider and model.
+
+    Exact matches are on the normalized question. Failing that, the closest
+    cached question in the same (schema, provider, model) scope is returned
+    when its cosine similarity reaches ``threshold`` and it mentions the same
+    numbers, so "top 5 in 2015" never answers "top 5 in 2016".
+    """
+
+    def __init__(
+        self,
+        path: str = GEN_CACHE_PATH,
+        threshold: float = GEN_CACHE_THRESHOLD,
+        max_candidates: int = 5_000,
+    ):
+        self.path = path
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL;")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS generations (
+                    norm_question TEXT NOT NULL,
+                    schema_hash TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    sql TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (norm_question, schema_hash, provider, model)
+                );
+                CREATE INDEX IF NOT EXISTS generations_scope
+                    ON generations (schema_hash, provider, model, created_at);
+                """
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, question: str, schema_hash: str, provider: str, model: str) -> Optional[CacheHit]:
+        norm = normalize_question(question)
+        scope = (schema_hash, provider, model)
+        with self._lock:
+            conn = self._db()
+            row = conn.execute(
+                "SELECT sql, question FROM generations WHERE norm_question = ? AND schema_hash = ? "
+                "AND provider = ? AND model = ?;",
+                (norm, *scope),
+            ).fetchone()
+            if row is not None:
+                self._touch(conn, norm, scope)
+                return CacheHit(row[0], 1.0, row[1])
+            if self.threshold >= 1.0:
+                return None
+            candidates = conn.execute(
+                "SELECT norm_question, sql, question, vector FROM generations "
+                "WHERE schema_hash = ? AND provider = ? AND model = ? "
+                "ORDER BY created_at DESC LIMIT ?;",
+                (*scope, self.max_candidates),
+            ).fetchall()
+            query_vec = vectorize(norm)
+            numbers = _NUMBER.findall(norm)
+            best: Optional[Tuple[float, str, str, str]] = None
+            for cand_norm, sql, cand_question, blob in candidates:
+                if _NUMBER.findall(cand_norm) != numbers:
+                    continue
+                sim = cosine(query_vec, array("f", blob).tolist())
+                if sim >= self.threshold and (best is None or sim > best[0]):
+                    best = (sim, cand_norm, sql, cand_question)
+            if best is None:
+                return None
+            self._touch(conn, best[1], scope)
+            return CacheHit(best[2], best[0], best[3])
+
+    @staticmethod
+    def _touch(conn: sqlite3.Connection, norm: str, scope: Tuple[str, str, str]) -> None:
+        with conn:
+            conn.execute(
+                "UPDATE generations SET hits = hits + 1 WHERE norm_question = ? AND schema_hash = ? "
+                "AND provider = ? AND model = ?;",
+                (norm, *scope),
+            )
+
+    def put(self, question: str, schema_hash: str, provider: str, model: str, sql: str) -> None:
+        norm = normalize_question(question)
+        blob = array("f", vectorize(norm)).tobytes()
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO generations "
+                    "(norm_question, schema_hash, provider, model, question, sql, vector, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?);",
+                    (norm, schema_hash, provider, model, question, sql, blob, time.time()),
+                )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_DEFAULT: Optional[GenerationCache] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_generation_cache() -> GenerationCache:
+    global _DEFAULT
+    if _DEFAULT is None:
+        with _DEFAULT_LOCK:
+            if _DEFAULT is None:
+                _DEFAULT = GenerationCache()
+    return _DEFAULT
+
+
+def cached_generate(
+    question: str,
+    schema_hash: str,
+    provider: str,
+    model: str,
+    generate: Callable[[], str],
+    cache: Optional[GenerationCache] = None,
+) -> Tuple[str, Optional[CacheHit]]:
+    """Return (sql, hit); calls ``generate`` and stores its result on a miss."""
+    cache = cache or get_generation_cache()
+    hit = cache.get(question, schema_hash, provider, model)
+    if hit is not None:
+        return hit.sql, hit
+    sql = generate()
+    cache.put(question, schema_hash, provider, model, sql)
+    return sql, None
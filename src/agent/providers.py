@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+import json
 import os
-from typing import Any, Dict, List
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from .bedrock_client import BedrockToolUseClient
-from .sql_guardrails import extract_first_select
+from .bedrock_client import DEFAULT_MODEL_ID, BedrockToolUseClient
+from .sql_guardrails import IncrementalSqlExtractor, extract_first_select
 
 
 class LLMProvider:
@@ -14,33 +18,173 @@ class LLMProvider:
     BEDROCK = "bedrock"
 
 
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+LOCAL_LLM_BASE = os.getenv("LOCAL_LLM_BASE", "http://localhost:1234/v1")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "lmstudio-community/Meta-Llama-3.1-8B-Instruct-GGUF")
+HTTP_POOL_SIZE = int(os.getenv("LLM_HTTP_POOL_SIZE", "16"))
+HTTP_RETRIES = int(os.getenv("LLM_HTTP_RETRIES", "3"))
+HTTP_BACKOFF_SEC = float(os.getenv("LLM_HTTP_BACKOFF_SEC", "0.5"))
+HTTP_TIMEOUT_SEC = float(os.getenv("LLM_HTTP_TIMEOUT_SEC", "60"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+_BEDROCK_CLIENTS: Dict[Tuple[str, str], BedrockToolUseClient] = {}
+_BEDROCK_LOCK = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """Process-wide Session so every call reuses pooled keep-alive connections.
+
+    Retries 429/5xx (honouring Retry-After) with exponential, jittered backoff.
+    The underlying urllib3 pool is thread-safe and sized by LLM_HTTP_POOL_SIZE.
+    """
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                retry = Retry(
+                    total=HTTP_RETRIES,
+                    backoff_factor=HTTP_BACKOFF_SEC,
+                    backoff_jitter=HTTP_BACKOFF_SEC,
+                    status_forcelist=RETRY_STATUSES,
+                    allowed_methods=frozenset({"POST"}),
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _SESSION = session
+    return _SESSION
+
+
+def get_bedrock_client(model_id: Optional[str] = None, region: Optional[str] = None) -> BedrockToolUseClient:
+    """Cached BedrockToolUseClient per (model, region); boto3 clients are thread-safe."""
+    key = (model_id or DEFAULT_MODEL_ID, region or os.getenv("AWS_DEFAULT_REGION", "us-east-1"))
+    client = _BEDROCK_CLIENTS.get(key)
+    if client is None:
+        with _BEDROCK_LOCK:
+            client = _BEDROCK_CLIENTS.get(key)
+            if client is None:
+                client = BedrockToolUseClient(model_id=key[0], region=key[1])
+                _BEDROCK_CLIENTS[key] = client
+    return client
+
+
 def get_provider() -> str:
     return os.getenv("LLM_PROVIDER", LLMProvider.OPENAI).lower()
 
 
-def generate_sql_openai(prompt: str, api_key: str, model: str = "gpt-4o-mini") -> str:
-    url = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1/chat/completions")
+def get_model_id(provider: str) -> str:
+    """Model identifier a provider will use by default (e.g. for cache keys)."""
+    if provider == LLMProvider.BEDROCK:
+        return DEFAULT_MODEL_ID
+    return OPENAI_MODEL
+
+
+OPENAI_SYSTEM_PROMPT = "You are an expert SQL generator. Return only a single SQL SELECT statement, end with a semicolon."
+BEDROCK_SYSTEM_PROMPT = "You return only SQL."
+
+DeltaCallback = Callable[[str], None]
+
+
+def _openai_request(
+    prompt: str, api_key: str, model: str, stream: bool = False, url: Optional[str] = None
+) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+    url = url or os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1/chat/completions")
     headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
     data: Dict[str, Any] = {
         "model": model,
         "messages": [
-            {"role": "system", "content": "You are an expert SQL generator. Return only a single SQL SELECT statement, end with a semicolon."},
+            {"role": "system", "content": OPENAI_SYSTEM_PROMPT},
             {"role": "user", "content": prompt},
         ],
         "temperature": 0.1,
     }
-    resp = requests.post(url, headers=headers, json=data, timeout=60)
+    if stream:
+        data["stream"] = True
+    return url, headers, data
+
+
+def generate_sql_openai(prompt: str, api_key: str, model: str = OPENAI_MODEL) -> str:
+    url, headers, data = _openai_request(prompt, api_key, model)
+    resp = get_http_session().post(url, headers=headers, json=data, timeout=HTTP_TIMEOUT_SEC)
+    resp.raise_for_status()
+    content = resp.json()["choices"][0]["message"]["content"]
+    return extract_first_select(content)
+
+
+def generate_sql_local(prompt: str, base_url: str = LOCAL_LLM_BASE, model: str = LOCAL_LLM_MODEL) -> str:
+    """generate_sql_openai against a local OpenAI-compatible server (e.g. LM Studio)."""
+    url = base_url.rstrip("/") + "/chat/completions"
+    _, headers, data = _openai_request(prompt, "lm-studio", model, url=url)
+    resp = get_http_session().post(url, headers=headers, json=data, timeout=HTTP_TIMEOUT_SEC)
     resp.raise_for_status()
     content = resp.json()["choices"][0]["message"]["content"]
     return extract_first_select(content)
 
 
 def generate_sql_bedrock(prompt: str) -> str:
-    client = BedrockToolUseClient()
+    client = get_bedrock_client()
     messages = [{"role": "user", "content": prompt}]
-    body = client.invoke_text(system="You return only SQL.", messages=messages)
+    body = client.invoke_text(system=BEDROCK_SYSTEM_PROMPT, messages=messages)
     # Adapter: extract text depending on provider format
     text = body.get("output", {}).get("text", "") or body.get("content", "")
     return extract_first_select(text)
 
 
+def iter_sse_deltas(resp: requests.Response) -> Iterator[str]:
+    """Yield content deltas from an OpenAI-style chat completion SSE stream."""
+    try:
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            payload = line[len("data:") :].strip()
+            if payload == "[DONE]":
+                break
+            choices = json.loads(payload).get("choices") or [{}]
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
+    finally:
+        resp.close()
+
+
+def stream_until_sql(chunks: Iterator[str], on_delta: Optional[DeltaCallback] = None) -> str:
+    """Feed streamed text to an IncrementalSqlExtractor; stop at the first full SELECT.
+
+    Closing the chunk generator closes the underlying stream, so no further
+    tokens are generated or paid for once the statement is complete.
+    """
+    extractor = IncrementalSqlExtractor()
+    try:
+        for chunk in chunks:
+            done = extractor.feed(chunk) is not None
+            if on_delta is not None and extractor.partial:
+                on_delta(extractor.partial)
+            if done:
+                break
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+    return extractor.finish()
+
+
+def stream_sql_openai(
+    prompt: str, api_key: str, model: str = OPENAI_MODEL, on_delta: Optional[DeltaCallback] = None
+) -> str:
+    """Like generate_sql_openai, but streams and cancels at the first complete statement."""
+    url, headers, data = _openai_request(prompt, api_key, model, stream=True)
+    resp = get_http_session().post(url, headers=headers, json=data, timeout=HTTP_TIMEOUT_SEC, stream=True)
+    resp.raise_for_status()
+    return stream_until_sql(iter_sse_deltas(resp), on_delta)
+
+
+def stream_sql_bedrock(prompt: str, on_delta: Optional[DeltaCallback] = None) -> str:
+    """Like generate_sql_bedrock, but via ConverseStream with early stop."""
+    client = get_bedrock_client()
+    messages = [{"role": "user", "content": prompt}]
+    return stream_until_sql(client.stream_text(system=BEDROCK_SYSTEM_PROMPT, messages=messages), on_delta)
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter, deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.db.adapter import DatabaseAdapter, SQLiteAdapter
+from src.db.catalog import SchemaCatalog
+from src.db.erd import infer_relationships, join_columns
+from src.db.governor import PREVIEW_BUDGET, QueryBudgetExceeded
+from src.db.sqlite import db_version, execute_readonly, get_schema_catalog, get_schema_overview
+from src.db.stats import column_hint, get_stats
+
+
+_WORD = re.compile(r"[A-Za-z]+|\d+")
+_CAMEL = re.compile(r"(?<=[a-z])(?=[A-Z])")
+STOPWORDS = frozenset(
+    "a an and are as at by did do does for from how in is it many much of on or per "
+    "show the to was were what when which who with".split()
+)
+
+
+def singular(word: str) -> str:
+    """Minimal plural folding: salaries -> salary, teams -> team; status, class, axis stay."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens; splits snake_case/camelCase and folds plurals."""
+    tokens: List[str] = []
+    for word in _WORD.findall(_CAMEL.sub(" ", text)):
+        w = word.lower()
+        if w in STOPWORDS:
+            continue
+        tokens.append(singular(w))
+    return tokens
+
+
+class BM25:
+    def __init__(self, docs: Dict[str, List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.tf = {key: Counter(tokens) for key, tokens in docs.items()}
+        self.len = {key: len(tokens) for key, tokens in docs.items()}
+        self.avg_len = (sum(self.len.values()) / len(docs)) if docs else 0.0
+        df: Counter = Counter()
+        for tf in self.tf.values():
+            df.update(tf.keys())
+        n = len(docs)
+        self.idf = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+
+    def score(self, query: Iterable[str]) -> Dict[str, float]:
+        terms = [t for t in set(query) if t in self.idf]
+        scores: Dict[str, float] = {}
+        for key, tf in self.tf.items():
+            s = 0.0
+            norm = self.k1 * (1 - self.b + self.b * self.len[key] / (self.avg_len or 1))
+            for t in terms:
+                f = tf.get(t)
+                if f:
+                    s += self.idf[t] * f * (self.k1 + 1) / (f + norm)
+            if s > 0:
+                scores[key] = s
+        return scores
+
+
+class SchemaIndex:
+    """BM25 over table names, column names and sample values of one schema version."""
+
+    def __init__(self, catalog: SchemaCatalog, samples: Optional[Dict[str, List[str]]] = None):
+        self.catalog = catalog
+        self.relationships = infer_relationships(catalog)
+        samples = samples or {}
+        docs: Dict[str, List[str]] = {}
+        for t in catalog.table_names():
+            # Table names weigh most, then column names, then sample values
+            tokens = tokenize(t) * 3
+            for c in catalog.columns(t):
+                tokens += tokenize(c.name) * 2
+            for value in samples.get(t, ()):
+                tokens += tokenize(value)
+            docs[t] = tokens
+        self.tables = BM25(docs)
+        self.column_tokens = {
+            t: {c.name: set(tokenize(c.name)) for c in catalog.columns(t)} for t in docs
+        }
+        self.neighbors: Dict[str, Set[str]] = {}
+        for r in self.relationships:
+            self.neighbors.setdefault(r.src, set()).add(r.dst)
+            self.neighbors.setdefault(r.dst, set()).add(r.src)
+
+    def search(self, question: str, k: int = 6) -> List[str]:
+        scores = self.tables.score(tokenize(question))
+        return sorted(scores, key=lambda t: (-scores[t], t))[:k]
+
+    def _path(self, src: str, dst: str, max_hops: int) -> List[str]:
+        prev: Dict[str, Optional[str]] = {src: None}
+        queue = deque([(src, 0)])
+        while queue:
+            node, hops = queue.popleft()
+            if node == dst:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = prev[node]
+                return path[::-1]
+            if hops == max_hops:
+                continue
+            for n in sorted(self.neighbors.get(node, ())):
+                if n not in prev:
+                    prev[n] = node
+                    queue.append((n, hops + 1))
+        return []
+
+    def connect(self, tables: List[str], max_hops: int = 2) -> List[str]:
+        """Add bridge tables so every selected table joins to the top-ranked one."""
+        if not tables:
+            return []
+        chosen = list(tables)
+        for t in tables[1:]:
+            for bridge in self._path(tables[0], t, max_hops)[1:-1]:
+                if bridge not in chosen:
+                    chosen.append(bridge)
+        return chosen
+
+    def join_keys(self, tables: Iterable[str]) -> List[Tuple[str, str, str, str]]:
+        """(table, column, ref_table, ref_column) for relationships among tables."""
+        shown = set(tables)
+        keys = []
+        for r in self.relationships:
+            if r.src in shown and r.dst in shown:
+                cols = join_columns(self.catalog, r)
+                if cols:
+                    keys.append((r.src, cols[0], r.dst, cols[1]))
+        return sorted(set(keys))
+
+    def relevant_columns(self, table: str, question: str, keys: Set[str], limit: int) -> List[str]:
+        q = set(tokenize(question))
+        all_cols = [c.name for c in self.catalog.columns(table)]
+        if len(all_cols) <= limit:
+            return all_cols
+        info = self.catalog.table(table)
+        wanted = set(info.primary_key if info else ()) | keys
+        wanted |= {c for c, toks in self.column_tokens.get(table, {}).items() if toks & q}
+        picked = {c for c in all_cols if c in wanted}
+        for c in all_cols:
+            if len(picked) >= limit:
+                break
+            picked.add(c)
+        return [c for c in all_cols if c in picked]
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def sample_values(
+    catalog: SchemaCatalog, rows: int = 20, max_len: int = 40, adapter: Optional[DatabaseAdapter] = None
+) -> Dict[str, List[str]]:
+    """Short distinct TEXT values per table, read under the preview budget."""
+    samples: Dict[str, List[str]] = {}
+    quote = adapter.quote if adapter is not None else _quote
+    for t in catalog.table_names():
+        text_cols = [
+            c.name for c in catalog.columns(t) if any(k in c.type.upper() for k in ("CHAR", "TEXT", "CLOB"))
+        ]
+        if not text_cols:
+            continue
+        col_sql = ", ".join(quote(c) for c in text_cols)
+        try:
+            if adapter is None:
+                _, data = execute_readonly(
+                    f"SELECT {col_sql} FROM {_quote(t)} LIMIT {int(rows)};", budget=PREVIEW_BUDGET
+                )
+            else:
+                sql = adapter.limit(f"SELECT {col_sql} FROM {quote(t)}", rows)
+                _, data = adapter.execute_readonly(sql, budget=PREVIEW_BUDGET)
+        except (QueryBudgetExceeded, sqlite3.Error, SQLAlchemyError):
+            continue
+        values = {v for row in data for v in row if isinstance(v, str) and 0 < len(v) <= max_len}
+        samples[t] = sorted(values)
+    return samples
+
+
+_INDEX: Dict[Tuple, SchemaIndex] = {}
+_LOCK = threading.Lock()
+
+
+def get_schema_index(sample_rows: int = 20, adapter: Optional[DatabaseAdapter] = None) -> SchemaIndex:
+    """SchemaIndex for the current database (or adapter's), rebuilt when its schema or data change.
+
+    The key includes the database version, not just the schema, so sampled
+    values follow a reseed or a switch to another database with the same schema.
+    """
+    catalog = adapter.catalog() if adapter is not None else get_schema_catalog()
+    version = adapter.version() if adapter is not None else db_version()
+    key = (version, catalog.fingerprint, sample_rows)
+    index = _INDEX.get(key)
+    if index is None:
+        with _LOCK:
+            index = _INDEX.get(key)
+            if index is None:
+                samples = sample_values(catalog, rows=sample_rows, adapter=adapter) if sample_rows else {}
+                index = SchemaIndex(catalog, samples)
+                _INDEX.clear()
+                _INDEX[key] = index
+    return index
+
+
+def build_schema_prompt(
+    question: str, top_k: int = 6, max_columns: int = 30, adapter: Optional[DatabaseAdapter] = None
+) -> str:
+    """Schema block for a prompt, limited to tables relevant to the question.
+
+    Picks the top-k BM25 tables, adds bridge tables needed to join them and
+    lists the join keys. Columns carry value hints (ranges, small value sets)
+    when ``src.db.stats`` has them. Falls back to ``get_schema_overview`` when
+    nothing in the question matches the schema.
+    """
+    index = get_schema_index(adapter=adapter)
+    tables = index.connect(index.search(question, k=top_k))
+    if not tables:
+        return get_schema_overview(catalog=index.catalog)
+    keys = index.join_keys(tables)
+    key_cols: Dict[str, Set[str]] = {}
+    for t, c, rt, rc in keys:
+        key_cols.setdefault(t, set()).add(c)
+        key_cols.setdefault(rt, set()).add(rc)
+
+    types = {t: {c.name: c.type for c in index.catalog.columns(t)} for t in tables}
+    # Statistics are only collected for the built-in SQLite database
+    stats = get_stats().current() if adapter is None or isinstance(adapter, SQLiteAdapter) else {}
+    lines: List[str] = []
+    for t in tables:
+        cols = index.relevant_columns(t, question, key_cols.get(t, set()), max_columns)
+        parts = []
+        for c in cols:
+            col_stats = stats[t].column(c) if t in stats else None
+            hint = column_hint(col_stats) if col_stats is not None else ""
+            parts.append(f"{c} {types[t][c]}" + (f" ({hint})" if hint else ""))
+        lines.append(f"Table {t}: {', '.join(parts)}")
+    if keys:
+        lines.append("Join keys: " + "; ".join(f"{t}.{c} = {rt}.{rc}" for t, c, rt, rc in keys))
+    return "\n".join(lines)
+
+
+def build_sql_prompt(question: str, default_limit: int = 50, adapter: Optional[DatabaseAdapter] = None) -> str:
+    """Full NL-to-SQL prompt: instructions, pruned schema and the question."""
+    if adapter is None or adapter.dialect == "sqlite":
+        dialect, bound = "", f"include a LIMIT {default_limit} if not specified"
+    else:
+        # The app bounds the result itself in the dialect's syntax (TOP, FETCH FIRST, ...)
+        dialect, bound = f"{adapter.dialect} ", f"return at most {default_limit} rows if not specified"
+    return (
+        f"Return only a valid {dialect}SQL SELECT statement ending with a semicolon; "
+        f"avoid DDL/DML; {bound}.\n"
+        f"Schema:\n{build_schema_prompt(question, adapter=adapter)}\n"
+        f"Question: {question}"
+    )
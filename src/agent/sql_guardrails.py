@@ -1,32 +1,51 @@
 from __future__ import annotations
 
 import re
+from typing import Iterable, List, NamedTuple, Optional
 
-
-FORBIDDEN_PATTERNS = [
-    r"\bINSERT\b",
-    r"\bUPDATE\b",
-    r"\bDELETE\b",
-    r"\bDROP\b",
-    r"\bALTER\b",
-    r"\bCREATE\b",
-    r"\bATTACH\b",
-    r"\bPRAGMA\b",
-]
+from .sql_lexer import OP, SqlAnalysis, analyze, rewrite_limit, tokenize
 
 
 def is_select_only(sql: str) -> bool:
-    return bool(re.match(r"^\s*SELECT\b", sql.strip(), flags=re.IGNORECASE))
+    """Exactly one statement, and it is a SELECT (``WITH ... SELECT`` included)."""
+    return analyze(sql).is_select
 
 
 def contains_forbidden(sql: str) -> bool:
-    return any(re.search(p, sql, flags=re.IGNORECASE) for p in FORBIDDEN_PATTERNS)
+    """A write/DDL keyword outside strings and comments, in any statement."""
+    return bool(analyze(sql).forbidden)
+
+
+def ensure_limit(sql: str, default_limit: int = 500, max_limit: Optional[int] = None) -> str:
+    return rewrite_limit(sql, default_limit, max_limit)
+
 
+class GuardrailResult(NamedTuple):
+    ok: bool
+    sql: str  # limit-bounded SQL when ok, else the input unchanged
+    reason: Optional[str]
+    statement: Optional[str] = None  # the approved statement before the LIMIT rewrite, for full exports
 
-def ensure_limit(sql: str, default_limit: int = 500) -> str:
-    if re.search(r"\bLIMIT\s+\d+\b", sql, flags=re.IGNORECASE):
-        return sql
-    return f"{sql.rstrip(';')} LIMIT {default_limit};"
+
+def check_sql(sql: str, default_limit: int = 500, max_limit: Optional[int] = None, analysis: Optional[SqlAnalysis] = None) -> GuardrailResult:
+    """All guardrails plus the LIMIT rewrite from a single lexer pass."""
+    a = analysis or analyze(sql)
+    if a.unterminated:
+        return GuardrailResult(False, sql, "unterminated string, identifier or comment")
+    if a.unbalanced:
+        return GuardrailResult(False, sql, "unbalanced parentheses")
+    if a.statements != 1:
+        return GuardrailResult(False, sql, f"expected one statement, found {a.statements}")
+    if a.kind != "select":
+        return GuardrailResult(False, sql, "not a SELECT statement")
+    if a.forbidden:
+        return GuardrailResult(False, sql, "forbidden keyword: " + ", ".join(a.forbidden))
+    return GuardrailResult(True, rewrite_limit(sql, default_limit, max_limit, analysis=a), None, sql[: a.end] + ";")
+
+
+def check_many(sqls: Iterable[str], default_limit: int = 500, max_limit: Optional[int] = None) -> List[GuardrailResult]:
+    """check_sql over a batch, for replay jobs validating thousands of statements."""
+    return [check_sql(sql, default_limit, max_limit) for sql in sqls]
 
 
 def strip_code_fences(text: str) -> str:
@@ -41,22 +60,100 @@ def strip_code_fences(text: str) -> str:
     return text.strip()
 
 
+# Where a query starts in model output: SELECT, or WITH opening a CTE
+# (``WITH [RECURSIVE] name [(cols)] AS (``), so prose such as "the query
+# with totals" is not mistaken for one
+STATEMENT_START = re.compile(
+    r"""\bWITH\s+(?:RECURSIVE\s+)?(?:\w+|"[^"]*"|`[^`]*`|\[[^\]]*\])\s*(?:\([^()]*\)\s*)?AS\s*(?:NOT\s+)?(?:MATERIALIZED\s+)?\(
+      | \bSELECT\b""",
+    flags=re.IGNORECASE | re.VERBOSE,
+)
+
+
 def extract_first_select(text: str) -> str:
-    """Extract the first SQL SELECT statement from a model response.
+    """Extract the first SQL query (``SELECT`` or ``WITH ... SELECT``) from a model response.
     Handles plain text, code fences, and inline prose.
     """
     cleaned = strip_code_fences(text)
-    # Find first SELECT ... ; (non-greedy)
-    match = re.search(r"SELECT[\s\S]*?;", cleaned, flags=re.IGNORECASE)
-    if match:
-        return match.group(0).strip()
-    # Fallback: if response looks like a single line SELECT without semicolon
-    line_match = re.search(r"^\s*SELECT[\s\S]*", cleaned, flags=re.IGNORECASE)
-    if line_match:
-        sql = line_match.group(0).strip()
-        if not sql.endswith(";"):
-            sql += ";"
-        return sql
-    return cleaned
+    match = STATEMENT_START.search(cleaned)
+    if match is None:
+        return cleaned
+    sql = cleaned[match.start() :]
+    # Up to the first ';' outside strings and comments
+    end = next((t.end for t in tokenize(sql) if t.kind == OP and t.text == ";"), None)
+    if end is not None:
+        return sql[:end].strip()
+    sql = sql.strip()
+    return sql if sql.endswith(";") else sql + ";"
+
+
+class IncrementalSqlExtractor:
+    """Find the first complete ``SELECT ...;`` (or ``WITH ... SELECT ...;``) in text that arrives in chunks.
+
+    ``feed`` returns the statement as soon as its terminating semicolon (outside
+    quotes and comments) has arrived, so a streaming caller can stop reading.
+    ``partial`` is the statement typed out so far, for live display.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.sql: Optional[str] = None
+        self._start: Optional[int] = None
+        self._pos = 0
+        self._state: Optional[str] = None  # quote char, "--" or "/*" while inside one
+
+    @property
+    def done(self) -> bool:
+        return self.sql is not None
+
+    @property
+    def partial(self) -> str:
+        if self.sql is not None:
+            return self.sql
+        return self.buffer[self._start :].strip() if self._start is not None else ""
 
+    def feed(self, chunk: str) -> Optional[str]:
+        if self.sql is not None:
+            return self.sql
+        self.buffer += chunk
+        if self._start is None:
+            # Re-scan the (short) prose so a start split across chunks is still found
+            match = STATEMENT_START.search(self.buffer)
+            if match is None:
+                return None
+            self._start = self._pos = match.start()
+        buf = self.buffer
+        i = self._pos
+        # Leave the last char unscanned when it could open a two-char comment marker
+        end = len(buf) - 1 if buf[-1:] in ("-", "/", "*") else len(buf)
+        while i < end:
+            ch = buf[i]
+            state = self._state
+            if state is None:
+                if ch in ("'", '"', "`"):
+                    self._state = ch
+                elif buf.startswith("--", i):
+                    self._state = "--"
+                    i += 1
+                elif buf.startswith("/*", i):
+                    self._state = "/*"
+                    i += 1
+                elif ch == ";":
+                    self.sql = buf[self._start : i + 1].strip()
+                    return self.sql
+            elif state == "--":
+                if ch == "\n":
+                    self._state = None
+            elif state == "/*":
+                if buf.startswith("*/", i):
+                    self._state = None
+                    i += 1
+            elif ch == state:
+                self._state = None
+            i += 1
+        self._pos = i
+        return None
 
+    def finish(self) -> str:
+        """The extracted statement, falling back to ``extract_first_select``."""
+        return self.sql if self.sql is not None else extract_first_select(self.buffer)
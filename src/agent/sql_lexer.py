@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import re
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+
+# The one tokenizer: a compiled pattern for every token kind, tried left to
+# right after skipping whitespace (words and numbers first, as the most
+# common). Strings, quoted identifiers and comments are consumed whole, so
+# keywords inside them are never seen; when one never closes, the
+# ``unterminated`` branch swallows the rest of the input. ``tokenize`` and
+# ``analyze`` both run on it, so they always agree on what is code.
+_TOKEN_RE = re.compile(
+    r"""
+    \s*
+    (?:
+        (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+      | (?P<number>0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+      | (?P<comment>--[^\n]*|/\*[\s\S]*?\*/)
+      | (?P<string>'[^']*(?:''[^']*)*')
+      | (?P<qident>"[^"]*(?:""[^"]*)*"|`[^`]*(?:``[^`]*)*`|\[[^\]]*\])
+      | (?P<unterminated>(?:/\*|['"`\[])[\s\S]*)
+      | (?P<param>\?\d*|[:@$][A-Za-z0-9_]+)
+      | (?P<op>\|\||->>|->|<<|>>|<=|>=|==|!=|<>|\S)
+    )
+    """,
+    re.VERBOSE,
+)
+
+COMMENT, STRING, QIDENT, UNTERMINATED, NUMBER, WORD, PARAM, OP = (
+    "comment", "string", "qident", "unterminated", "number", "word", "param", "op"
+)
+
+# Keywords that make a statement write or change connection state. REPLACE is
+# left out on purpose: it is also a scalar function, and REPLACE INTO is
+# already rejected by classification.
+FORBIDDEN_KEYWORDS = frozenset(
+    {"INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "CREATE", "ATTACH", "DETACH", "PRAGMA", "VACUUM", "REINDEX"}
+)
+# Keywords that open the main statement after a WITH clause
+_MAIN_KEYWORDS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "VALUES"})
+
+
+class Token(NamedTuple):
+    kind: str
+    text: str
+    start: int
+    end: int
+    depth: int  # parenthesis depth (0 = top level of the statement)
+
+
+def tokenize(sql: str, keep_comments: bool = False) -> List[Token]:
+    """All tokens of sql, whitespace dropped; comments only if keep_comments."""
+    tokens: List[Token] = []
+    depth = 0
+    for m in _TOKEN_RE.finditer(sql):
+        kind = m.lastgroup
+        if kind is None:
+            continue  # trailing whitespace
+        text = m.group(kind)
+        if kind == OP:
+            if text == ")":
+                depth = max(0, depth - 1)
+            elif text == ";":
+                depth = 0
+        if kind != COMMENT or keep_comments:
+            tokens.append(Token(kind, text, m.start(kind), m.end(), depth))
+        if kind == OP and text == "(":
+            depth += 1
+    return tokens
+
+
+def split_statements(sql: str) -> List[str]:
+    """Source text of each non-empty statement, without its terminating ``;``."""
+    statements: List[str] = []
+    start: Optional[int] = None
+    end = 0
+    for tok in tokenize(sql):
+        if tok.kind == OP and tok.text == ";":
+            if start is not None:
+                statements.append(sql[start:end])
+            start = None
+            continue
+        if start is None:
+            start = tok.start
+        end = tok.end
+    if start is not None:
+        statements.append(sql[start:end])
+    return statements
+
+
+class SqlAnalysis(NamedTuple):
+    statements: int
+    kind: str  # first statement: "select", "other" or "empty"
+    forbidden: Tuple[str, ...]  # forbidden keywords, from every statement
+    unterminated: bool  # a string, quoted identifier or comment never closes
+    end: int  # end of the first statement's last token, where a LIMIT can go
+    limit: Optional[Tuple[int, int]]  # span of the first statement's outermost LIMIT clause
+    limit_count: Optional[Tuple[int, int, int]]  # (start, end, value) of its row count, if a literal
+    unbalanced: bool = False  # a ')' without its '(', or a '(' still open at ';' or the end
+
+    @property
+    def is_select(self) -> bool:
+        return self.statements == 1 and self.kind == "select" and not self.unterminated and not self.unbalanced
+
+
+_SCAN_WORDS = FORBIDDEN_KEYWORDS | _MAIN_KEYWORDS | {"WITH", "LIMIT"}
+# A literal row count: LIMIT n [OFFSET ...] (group 1) or LIMIT m, n (group 2);
+# anything else, such as LIMIT ? or LIMIT 5 * 2, leaves the count unknown
+_LIMIT_CLAUSE_RE = re.compile(r"LIMIT\s+(?:(\d+)(?:\s+OFFSET\b[\s\S]*)?|\d+\s*,\s*(\d+))", re.IGNORECASE)
+
+
+def analyze(sql: str) -> SqlAnalysis:
+    """Classify sql and locate its outermost LIMIT in a single pass.
+
+    A statement is a SELECT when its first keyword is SELECT, or it is WITH and
+    the first top-level keyword after the CTE definitions is SELECT. The
+    outermost LIMIT is the one at parenthesis depth 0, so LIMITs inside
+    subqueries and CTEs never count, and a LIMIT after a compound SELECT
+    (UNION etc.) is the one that bounds the whole result. Runs the
+    ``tokenize`` pattern without building Token tuples.
+    """
+    statements = 0
+    kind = "empty"
+    forbidden: List[str] = []
+    unterminated = False
+    unbalanced = False
+    end = 0
+    limit_start: Optional[int] = None
+
+    depth = 0
+    first: Optional[str] = None  # first token of the current statement (upper-cased), "" if not a word
+    in_with = False
+    in_first = True
+    has_tokens = False
+
+    for m in _TOKEN_RE.finditer(sql):
+        k = m.lastgroup
+        if k is None or k == COMMENT:
+            continue
+        if k == OP:
+            ch = m.group(k)
+            if ch == ";":
+                if has_tokens:
+                    statements += 1
+                    in_first = False
+                has_tokens = False
+                first = None
+                in_with = False
+                unbalanced = unbalanced or depth != 0
+                depth = 0
+                continue
+            if ch == "(":
+                depth += 1
+            elif ch == ")":
+                if depth:
+                    depth -= 1
+                else:
+                    unbalanced = True
+        elif k == WORD:
+            word = m.group(k).upper()
+            if first is None:
+                first = word
+                in_with = word == "WITH"
+                if in_first:
+                    kind = "select" if word == "SELECT" else "other"
+            if word in _SCAN_WORDS:
+                if word in FORBIDDEN_KEYWORDS:
+                    forbidden.append(word)
+                if in_with and depth == 0 and word in _MAIN_KEYWORDS:
+                    in_with = False
+                    if in_first:
+                        kind = "select" if word == "SELECT" else "other"
+                elif in_first and depth == 0 and word == "LIMIT":
+                    limit_start = m.start(k)
+        elif k == UNTERMINATED:
+            unterminated = True
+        if first is None:
+            first = ""
+            if in_first:
+                kind = "other"
+        has_tokens = True
+        if in_first:
+            end = m.end()
+    if has_tokens:
+        statements += 1
+    unbalanced = unbalanced or depth != 0
+
+    found = tuple(dict.fromkeys(forbidden))
+    if limit_start is None:
+        return SqlAnalysis(statements, kind, found, unterminated, end, None, None, unbalanced)
+    # The LIMIT clause runs to the end of the statement
+    count = None
+    clause = _LIMIT_CLAUSE_RE.fullmatch(sql, limit_start, end)
+    if clause is not None:
+        g = 1 if clause.group(1) else 2
+        count = (clause.start(g), clause.end(g), int(clause.group(g)))
+    return SqlAnalysis(statements, kind, found, unterminated, end, (limit_start, end), count, unbalanced)
+
+
+def analyze_many(sqls: Iterable[str]) -> List[SqlAnalysis]:
+    """analyze() over many statements, for bulk validation and replay jobs."""
+    return [analyze(sql) for sql in sqls]
+
+
+def rewrite_limit(sql: str, default_limit: int, max_limit: Optional[int] = None, analysis: Optional[SqlAnalysis] = None) -> str:
+    """Bound the first statement's result with an outermost LIMIT.
+
+    Without one, ``LIMIT default_limit`` goes after the last token, so a
+    trailing comment cannot swallow it and a LIMIT inside a subquery or CTE
+    does not count. With ``max_limit``, a literal row count above it is
+    lowered to it. Anything after the first statement is dropped.
+    """
+    a = analysis or analyze(sql)
+    if a.kind == "empty":
+        return sql
+    if a.limit is None:
+        return f"{sql[: a.end]} LIMIT {default_limit};"
+    if max_limit is not None and a.limit_count is not None and a.limit_count[2] > max_limit:
+        start, stop, _ = a.limit_count
+        return f"{sql[:start]}{max_limit}{sql[stop : a.end]};"
+    return f"{sql[: a.end]};"
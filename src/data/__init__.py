@@ -0,0 +1 @@
+"""Dataset loaders that seed the local SQLite database."""
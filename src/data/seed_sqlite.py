@@ -0,0 +1,569 @@
+"""Bulk-load the Baseball CSV extracts into SQLite.
+
+    python -m src.data.seed_sqlite                         # SEED_DATA_DIR or SEED_HF_DATASET
+    python -m src.data.seed_sqlite data/TheHistoryofBaseball.zip --workers 8
+    python -m src.data.seed_sqlite --force                 # reload every table
+
+Every ``*.csv`` under the source becomes a table named after the file (the
+extract lays them out as ``<table>/<table>.csv``). Files are read as raw
+byte blocks that end on record boundaries; a process pool decodes and
+parses them while the single writer connection inserts finished blocks
+with ``executemany``, committing every SEED_COMMIT_ROWS rows. Column types
+are inferred from the first block and applied by SQLite's type affinity; a
+numeric column that later turns out to hold a value affinity would change
+(``007``, ``+5``, ``1.0`` as an INTEGER) is widened and the table reloaded.
+Durability pragmas are relaxed for the load and restored afterwards.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import sqlite3
+import time
+import zipfile
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.request import pathname2url
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent seeders are not detected
+    fcntl = None
+
+from src.db import sqlite as db
+from src.db.catalog import invalidate_catalog
+from src.db.pool import reset_pools
+
+
+DATA_DIR = os.getenv("SEED_DATA_DIR", os.path.abspath("data/extracted/TheHistoryofBaseball"))
+# Hub dataset repo holding the CSVs; downloaded into (or reused from) the local HF cache
+HF_DATASET = os.getenv("SEED_HF_DATASET", "")
+# Parser processes besides the writer; 0 parses inline
+WORKERS = int(os.getenv("SEED_WORKERS", str((os.cpu_count() or 1) - 1)))
+CHUNK_BYTES = int(os.getenv("SEED_CHUNK_BYTES", str(4 << 20)))
+COMMIT_ROWS = int(os.getenv("SEED_COMMIT_ROWS", "500000"))
+# A quoted field may span lines, but never more than this (a stray quote would swallow the file)
+MAX_RECORD_BYTES = int(os.getenv("SEED_MAX_RECORD_BYTES", str(1 << 20)))
+
+MANIFEST_TABLE = "_seed_manifest"
+MANIFEST_DDL = f"""CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+    name TEXT PRIMARY KEY, path TEXT, size INTEGER, mtime_ns INTEGER, sha256 TEXT, rows INTEGER
+)"""
+SIDE_SUFFIX = ".seeding"
+LOCK_SUFFIX = ".seeding.lock"
+
+BULK_PRAGMAS = (
+    ("journal_mode", "MEMORY"),
+    ("synchronous", "OFF"),
+    ("temp_store", "MEMORY"),
+    ("cache_size", "-262144"),  # 256 MiB
+)
+
+# Numbers in the form affinity stores them unchanged: no sign but '-', no
+# padding, no leading zeros (so IDs such as 007 stay TEXT)
+_INT_RE = re.compile(r"-?(?:0|[1-9][0-9]{0,17})")
+_FLOAT_RE = re.compile(r"-?(?:(?:0|[1-9][0-9]*)(?:\.[0-9]*)?|\.[0-9]+)(?:[eE][-+]?[0-9]{1,3})?")
+# Each type only widens to the ones after it
+_WIDER = {"INTEGER": ("INTEGER", "REAL", "TEXT"), "REAL": ("REAL", "TEXT"), "TEXT": ("TEXT",)}
+_RANK = {"INTEGER": 0, "REAL": 1, "TEXT": 2}
+_IDENT_RE = re.compile(r"[^0-9a-zA-Z_]+")
+
+
+class TableLoad(NamedTuple):
+    table: str
+    rows: int
+    seconds: float
+    lost_indexes: Tuple[str, ...] = ()  # indexes on the old table that no longer apply to the new columns
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+def _identifier(name: str) -> str:
+    name = _IDENT_RE.sub("_", name.strip().lower()).strip("_") or "col"
+    return "_" + name if name[0].isdigit() else name
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def discover_csvs(source: str) -> Dict[str, str]:
+    """Map table name to CSV path for every CSV under a directory or zip.
+
+    A zip is extracted next to itself first (once), as ``dependencies/config.py``
+    does for the same archive.
+    """
+    if zipfile.is_zipfile(source):
+        target = os.path.splitext(source)[0]
+        if not os.path.isdir(target):
+            with zipfile.ZipFile(source) as zf:
+                zf.extractall(target)
+        source = target
+    if not os.path.isdir(source):
+        raise FileNotFoundError(f"No CSV source at {source}; set SEED_DATA_DIR or SEED_HF_DATASET")
+    found: Dict[str, str] = {}
+    for root, dirs, files in os.walk(source):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(".csv") and not name.startswith("."):
+                found.setdefault(_identifier(os.path.splitext(name)[0]), os.path.join(root, name))
+    return found
+
+
+def resolve_source(source: Optional[str] = None) -> str:
+    """Explicit path, else the SEED_HF_DATASET snapshot, else SEED_DATA_DIR."""
+    if source:
+        return source
+    if HF_DATASET:
+        try:
+            from huggingface_hub import snapshot_download
+        except ImportError as e:
+            raise RuntimeError("SEED_HF_DATASET needs huggingface_hub (pip install huggingface_hub)") from e
+        # Reuses the cached snapshot when present; HF_TOKEN is picked up for private repos
+        return snapshot_download(HF_DATASET, repo_type="dataset", allow_patterns=["*.csv", "**/*.csv"])
+    return DATA_DIR
+
+
+class CsvFormatError(ValueError):
+    pass
+
+
+def _read_record(f: io.BufferedReader, block: bytes, max_record_bytes: int = MAX_RECORD_BYTES) -> bytes:
+    # An odd number of quotes means a quoted field spans the line break
+    odd = block.count(b'"') % 2
+    extra = 0
+    while odd:
+        line = f.readline()
+        if not line:
+            break
+        extra += len(line)
+        if extra > max_record_bytes:
+            raise CsvFormatError(
+                f"{f.name}: quoted field still open {max_record_bytes:,} bytes past its line "
+                f"(unbalanced quote before offset {f.tell() - extra:,}); raise SEED_MAX_RECORD_BYTES if it is real"
+            )
+        block += line
+        odd ^= line.count(b'"') % 2
+    return block
+
+
+def iter_blocks(path: str, chunk_bytes: int = CHUNK_BYTES, max_record_bytes: int = MAX_RECORD_BYTES) -> Iterator[bytes]:
+    """Yield the header record, then blocks of about chunk_bytes ending on record boundaries."""
+    with open(path, "rb") as f:
+        yield _read_record(f, f.readline(), max_record_bytes)
+        while True:
+            lines = f.readlines(chunk_bytes)
+            if not lines:
+                return
+            yield _read_record(f, b"".join(lines), max_record_bytes)
+
+
+def _decode(block: bytes) -> str:
+    try:
+        return block.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return block.decode("latin-1")
+
+
+def _fits(value: str, type: str) -> bool:
+    if type == "INTEGER":
+        return _INT_RE.fullmatch(value) is not None and value != "-0"
+    if type == "REAL":
+        return _FLOAT_RE.fullmatch(value) is not None
+    return True
+
+
+def fit_types(rows: Sequence[Sequence[str]], types: Sequence[str]) -> List[str]:
+    """The narrowest widening of types under which affinity keeps every value as written; blanks are ignored."""
+    fitted = list(types)
+    for i, t in enumerate(types):
+        if t == "TEXT":
+            continue
+        for r in rows:
+            v = r[i]
+            if v and not _fits(v, t):
+                t = next(w for w in _WIDER[t] if _fits(v, w))
+                if t == "TEXT":
+                    break
+        fitted[i] = t
+    return fitted
+
+
+def parse_block(block: bytes, width: int, types: Optional[Sequence[str]] = None) -> Tuple[List[List[str]], List[str]]:
+    """Decode and parse one block of records (runs in the worker processes).
+
+    Values stay strings: the INSERT maps blanks to NULL and the declared
+    column types convert the rest inside SQLite, which is far cheaper than
+    calling int()/float() per value here. Returns the rows and
+    ``fit_types(rows, types)``, so the writer learns when a value would not
+    survive its column's affinity.
+    """
+    rows = []
+    for rec in csv.reader(io.StringIO(_decode(block))):
+        if len(rec) == width:
+            rows.append(rec)
+        elif rec:
+            rows.append((rec + [""] * width)[:width])
+    types = list(types) if types is not None else ["TEXT"] * width
+    return rows, fit_types(rows, types)
+
+
+def infer_types(rows: Sequence[Sequence[str]], width: int) -> List[str]:
+    """INTEGER, REAL or TEXT per column from sample rows; blanks are ignored."""
+    types = fit_types([(list(r) + [""] * width)[:width] for r in rows], ["INTEGER"] * width)
+    # A column with no values in the sample stays TEXT
+    return [t if any(i < len(r) and r[i] for r in rows) else "TEXT" for i, t in enumerate(types)]
+
+
+def read_header(path: str, chunk_bytes: int = CHUNK_BYTES) -> Tuple[List[str], List[str]]:
+    """Column names and inferred types from the header and the first block."""
+    blocks = iter_blocks(path, chunk_bytes)
+    try:
+        header = next(csv.reader(io.StringIO(_decode(next(blocks)))), [])
+        sample = list(csv.reader(io.StringIO(_decode(next(blocks, b"")))))
+    finally:
+        blocks.close()
+    names: List[str] = []
+    for i, raw in enumerate(header):
+        name = _identifier(raw) if raw.strip() else f"col{i + 1}"
+        while name in names:
+            name += "_"
+        names.append(name)
+    return names, infer_types(sample, len(names))
+
+
+def _set_pragmas(conn: sqlite3.Connection, pragmas: Sequence[Tuple[str, str]]) -> Dict[str, str]:
+    previous = {}
+    for name, value in pragmas:
+        previous[name] = str(conn.execute(f"PRAGMA {name};").fetchone()[0])
+        conn.execute(f"PRAGMA {name} = {value};").fetchall()
+    return previous
+
+
+def _parsed_blocks(
+    blocks: Iterator[bytes], types: Sequence[str], executor: Optional[ProcessPoolExecutor], workers: int
+) -> Iterator[Tuple[List[List[str]], List[str]]]:
+    width = len(types)
+    if executor is None:
+        for block in blocks:
+            yield parse_block(block, width, types)
+        return
+    # Bounded in-flight window: parsing overlaps inserting without reading the whole file ahead
+    pending: Deque[Future] = deque()
+    for block in blocks:
+        pending.append(executor.submit(parse_block, block, width, types))
+        if len(pending) >= 2 * workers:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def load_csv(
+    conn: sqlite3.Connection,
+    table: str,
+    path: str,
+    executor: Optional[ProcessPoolExecutor] = None,
+    workers: int = 1,
+    chunk_bytes: int = CHUNK_BYTES,
+    commit_rows: int = COMMIT_ROWS,
+    types: Optional[List[str]] = None,
+) -> TableLoad:
+    """Replace table with the contents of one CSV; conn must be in autocommit mode.
+
+    ``types`` overrides the inferred column types. When a later block holds
+    a value its column's affinity would change (text in a numeric column, or
+    a number not written the way SQLite prints it back), the table is
+    reloaded once with the widened types, so numbers keep their value and
+    everything else is stored exactly as the CSV's text.
+    """
+    start = time.perf_counter()
+    names, inferred = read_header(path, chunk_bytes)
+    types = types or inferred
+    columns = ", ".join(f"{_quote(n)} {t}" for n, t in zip(names, types))
+    values = ", ".join(["NULLIF(?, '')"] * len(names))
+    insert = f"INSERT INTO {_quote(table)} VALUES ({values})"
+    conn.execute("BEGIN")
+    # Explicit indexes (e.g. from the index advisor) go with the table; auto indexes have no SQL
+    indexes = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+    ).fetchall()
+    conn.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+    conn.execute(f"CREATE TABLE {_quote(table)} ({columns})")
+    rows = uncommitted = 0
+    widened = list(types)
+    blocks = iter_blocks(path, chunk_bytes)
+    next(blocks)  # header
+    try:
+        for batch, fitted in _parsed_blocks(blocks, types, executor, workers):
+            widened = [max(w, f, key=_RANK.get) for w, f in zip(widened, fitted)]
+            conn.executemany(insert, batch)
+            rows += len(batch)
+            uncommitted += len(batch)
+            if uncommitted >= commit_rows:
+                conn.execute("COMMIT")
+                conn.execute("BEGIN")
+                uncommitted = 0
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        blocks.close()
+    if widened != list(types):
+        rows = load_csv(conn, table, path, executor, workers, chunk_bytes, commit_rows, widened).rows
+    lost = _restore_indexes(conn, indexes)
+    return TableLoad(table, rows, time.perf_counter() - start, lost)
+
+
+def _restore_indexes(conn: sqlite3.Connection, indexes: Sequence[Tuple[str, str]]) -> Tuple[str, ...]:
+    """Re-create indexes after a reload; returns the names of those that no longer apply."""
+    lost = []
+    for name, sql in indexes:
+        try:
+            conn.execute(sql)
+        except sqlite3.Error:
+            lost.append(name)
+    return tuple(lost)
+
+
+class ManifestEntry(NamedTuple):
+    name: str
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: str
+    rows: int
+
+
+def file_checksum(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(name: str, path: str, known: Optional[ManifestEntry] = None) -> ManifestEntry:
+    """Manifest entry for a source file; the checksum is reused while size and mtime match."""
+    st = os.stat(path)
+    if known is not None and (known.size, known.mtime_ns) == (st.st_size, st.st_mtime_ns):
+        sha = known.sha256
+    else:
+        sha = file_checksum(path)
+    return ManifestEntry(name, os.path.abspath(path), st.st_size, st.st_mtime_ns, sha, 0)
+
+
+def read_manifest(conn: sqlite3.Connection) -> Dict[str, ManifestEntry]:
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (MANIFEST_TABLE,)).fetchone()
+    if not exists:
+        return {}
+    rows = conn.execute(f"SELECT name, path, size, mtime_ns, sha256, rows FROM {MANIFEST_TABLE}")
+    return {r[0]: ManifestEntry(*r) for r in rows}
+
+
+def _read_manifest_file(path: str) -> Dict[str, ManifestEntry]:
+    if not os.path.exists(path):
+        return {}
+    conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True)
+    try:
+        return read_manifest(conn)
+    finally:
+        conn.close()
+
+
+def _usable_side_file(side: str) -> bool:
+    # Bulk pragmas trade crash safety for speed, so a file left by a crash is verified first
+    try:
+        conn = sqlite3.connect(side)
+        try:
+            return conn.execute("PRAGMA quick_check;").fetchone()[0] == "ok"
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError:
+        return False
+
+
+def _copy_database(src: str, dst: str) -> None:
+    """Copy src into a fresh dst with the online backup API (readers are not blocked)."""
+    source = sqlite3.connect(f"file:{pathname2url(os.path.abspath(src))}?mode=ro", uri=True)
+    target = sqlite3.connect(dst)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+class SeedInProgressError(RuntimeError):
+    pass
+
+
+@contextmanager
+def _seed_lock(path: str) -> Iterator[None]:
+    """Hold ``<path>.seeding.lock`` so two seeders never build the same side file."""
+    with open(path + LOCK_SUFFIX, "a") as f:
+        if fcntl is not None:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise SeedInProgressError(f"Another seeder is already updating {path}") from None
+        yield  # the OS drops the lock with the file, even after a crash
+
+
+def _wal_frames(path: str) -> int:
+    wal = path + "-wal"
+    return os.path.getsize(wal) if os.path.exists(wal) else 0
+
+
+def _swap_in(side: str, path: str) -> None:
+    """Rename side over path once no WAL frames of the old file can be replayed onto it.
+
+    SQLite opens any database with a ``-wal`` file next to it in WAL mode and
+    applies the frames it finds, whatever the new file's header says. So the
+    live file's WAL is checkpointed and truncated first, and writers are held
+    off (BEGIN IMMEDIATE) until the rename is done.
+    """
+    with open(side, "rb") as f:
+        os.fsync(f.fileno())
+    live = sqlite3.connect(path, isolation_level=None, timeout=30) if os.path.exists(path) else None
+    try:
+        if live is not None and _wal_frames(path):
+            busy = live.execute("PRAGMA wal_checkpoint(TRUNCATE);").fetchone()[0]
+            live.execute("BEGIN IMMEDIATE")
+            if busy or _wal_frames(path):
+                raise sqlite3.OperationalError(f"{path}-wal could not be checkpointed; {side} was not swapped in")
+        os.replace(side, path)
+    finally:
+        if live is not None:
+            if live.in_transaction:
+                live.execute("ROLLBACK")
+            live.close()
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def plan_changes(
+    csvs: Dict[str, str], manifest: Dict[str, ManifestEntry], force: bool = False, drop_missing: bool = True
+) -> Tuple[List[ManifestEntry], List[str]]:
+    """Sources to (re)load and manifest tables whose source is gone."""
+    changed = []
+    for name, csv_path in csvs.items():
+        known = manifest.get(name)
+        entry = fingerprint(name, csv_path, known)
+        if force or known is None or known.sha256 != entry.sha256:
+            changed.append(entry)
+    removed = [name for name in manifest if name not in csvs] if drop_missing else []
+    return changed, removed
+
+
+def seed_baseball(
+    source: Optional[str] = None,
+    path: Optional[str] = None,
+    workers: Optional[int] = None,
+    tables: Optional[Sequence[str]] = None,
+    force: bool = False,
+) -> List[TableLoad]:
+    """Bring the SQLite database at path (DB_PATH by default) up to date with the CSVs.
+
+    Only sources whose checksum differs from the manifest are reloaded. The
+    work happens in ``<path>.seeding``, a backup-API copy of the live file,
+    which replaces path in a single rename, so readers see either the old
+    database or the new one. After a crash the side file is verified and
+    resumed: tables already recorded in its manifest are not loaded again.
+    A second seeder for the same path raises SeedInProgressError.
+    Returns the tables loaded; an empty list means everything was current.
+    """
+    csvs = discover_csvs(resolve_source(source))
+    if tables:
+        csvs = {t: p for t, p in csvs.items() if t in set(tables)}
+    if not csvs:
+        raise FileNotFoundError("No CSV files found to seed")
+    path = os.path.abspath(path or db.DB_PATH)
+    with _seed_lock(path):
+        side = path + SIDE_SUFFIX
+        resuming = os.path.exists(side) and _usable_side_file(side)
+        if not resuming:
+            for leftover in (side, side + "-journal"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+        manifest = _read_manifest_file(side if resuming else path)
+        changed, removed = plan_changes(csvs, manifest, force, drop_missing=not tables)
+        if not (changed or removed or resuming):
+            return []
+        if not resuming and os.path.exists(path):
+            _copy_database(path, side)
+
+        workers = WORKERS if workers is None else workers
+        conn = sqlite3.connect(side, isolation_level=None, timeout=30)
+        previous = _set_pragmas(conn, BULK_PRAGMAS)
+        # The swapped-in file uses a rollback journal; _swap_in makes sure no WAL
+        # frames of the old file are left next to it to be replayed
+        previous["journal_mode"] = "DELETE"
+        # Spawned, not forked: callers such as the Streamlit app have live threads and locks a fork would copy
+        executor = (
+            ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) if workers > 0 else None
+        )
+        loads: List[TableLoad] = []
+        try:
+            conn.execute(MANIFEST_DDL)
+            for entry in changed:
+                conn.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE name = ?", (entry.name,))
+                load = load_csv(conn, entry.name, entry.path, executor, workers)
+                conn.execute(f"INSERT INTO {MANIFEST_TABLE} VALUES (?, ?, ?, ?, ?, ?)", entry._replace(rows=load.rows))
+                loads.append(load)
+            conn.execute("BEGIN")
+            for name in removed:
+                conn.execute(f"DROP TABLE IF EXISTS {_quote(name)}")
+                conn.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE name = ?", (name,))
+            conn.execute("COMMIT")
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            _set_pragmas(conn, list(previous.items()))
+            conn.close()
+        _swap_in(side, path)
+        # Pools also notice the new inode on their own; this covers the current process at once
+        reset_pools()
+        invalidate_catalog(path)
+        return loads
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", nargs="?", help="directory or zip of CSVs (default: SEED_DATA_DIR / SEED_HF_DATASET)")
+    parser.add_argument("--db", default=db.DB_PATH, help="SQLite file to seed")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="parser processes (0 parses inline)")
+    parser.add_argument("--table", action="append", dest="tables", help="only load these tables")
+    parser.add_argument("--force", action="store_true", help="reload every source, changed or not")
+    args = parser.parse_args()
+
+    loads = seed_baseball(args.source, args.db, args.workers, args.tables, args.force)
+    if not loads:
+        print(f"{args.db} is up to date")
+        return
+    for load in loads:
+        print(f"{load.table:<24} {load.rows:>10,} rows {load.seconds:>8.2f}s {load.rows_per_sec:>12,.0f} rows/s")
+        if load.lost_indexes:
+            print(f"  dropped indexes that no longer match the columns: {', '.join(load.lost_indexes)}")
+    rows = sum(load.rows for load in loads)
+    seconds = sum(load.seconds for load in loads)
+    print(f"{'total':<24} {rows:>10,} rows {seconds:>8.2f}s {rows / seconds if seconds else 0:>12,.0f} rows/s -> {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""Database backends behind one interface.
+
+``get_adapter()`` picks the backend from DATABASE_URL:
+
+- unset: ``SQLiteAdapter`` over SQLITE_PATH, the module functions in
+  ``src.db.sqlite`` (read-only pool, resource governor). Only this backend
+  has the plan gate, paginator, export, statistics and index advisor.
+- any SQLAlchemy URL (``postgresql://…``, ``mysql+pymysql://…``,
+  ``sqlite:///…``): ``SQLAlchemyAdapter``, with an engine-level connection
+  pool, server-side cursors (``stream_results``) and dialect-aware LIMITs.
+- ``athena://<workgroup>/<database>``: ``AthenaAdapter`` (``src.db.athena``).
+
+Both return plain ``(columns, rows)`` results and a ``SchemaCatalog``, so
+the prompt builder, Arrow path and Data model tab work unchanged.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection, Engine
+
+from src.agent.sql_lexer import analyze, rewrite_limit, tokenize
+
+from . import sqlite as db
+from .catalog import Column, ForeignKey, SchemaCatalog, TableInfo
+from .governor import USER_QUERY_BUDGET, QueryBudget, QueryGovernor, QueryTimeoutError, RowBudgetExceeded
+
+
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+POOL_TIMEOUT_SEC = float(os.getenv("DB_POOL_TIMEOUT_SEC", "30"))
+POOL_RECYCLE_SEC = int(os.getenv("DB_POOL_RECYCLE_SEC", "1800"))
+CATALOG_TTL_SEC = float(os.getenv("DB_CATALOG_TTL_SEC", "300"))
+
+Result = Tuple[List[str], List[Tuple]]
+# Receives a backend's statistics for one query (Athena: ``QueryStats``)
+StatsCallback = Callable[[Any], None]
+
+# Session-wide read-only switches, run once per pooled connection
+_READ_ONLY_SQL = {
+    "sqlite": "PRAGMA query_only = ON",
+    "postgresql": "SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY",
+    "mysql": "SET SESSION TRANSACTION READ ONLY",
+    "mariadb": "SET SESSION TRANSACTION READ ONLY",
+}
+# Per-query server-side timeouts
+_TIMEOUT_SQL = {
+    "postgresql": "SET LOCAL statement_timeout = {ms}",
+    "mysql": "SET SESSION max_execution_time = {ms}",
+    "mariadb": "SET SESSION max_statement_time = {sec}",
+}
+# Driver error codes those timeouts raise: SQLSTATE 57014, MySQL 3024, MariaDB 1969
+_TIMEOUT_CODES = {"57014", 3024, 1969}
+_EXPLAIN = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN ", "mysql": "EXPLAIN ", "mariadb": "EXPLAIN ", "duckdb": "EXPLAIN "}
+
+
+class DatabaseAdapter:
+    """Read-only query execution and introspection for one database."""
+
+    dialect = ""
+    # Budget for interactive queries on this backend
+    query_budget = USER_QUERY_BUDGET
+
+    @property
+    def name(self) -> str:
+        """Human-readable target, without credentials."""
+        raise NotImplementedError
+
+    def iter_batches(
+        self,
+        sql: str,
+        batch_size: int = db.FETCH_BATCH_SIZE,
+        budget: Optional[QueryBudget] = None,
+        on_stats: Optional[StatsCallback] = None,
+    ) -> Iterator[Result]:
+        """Stream ``(columns, rows)`` batches; at least one, possibly empty, is yielded.
+
+        ``on_stats`` is called with this query's statistics on backends that
+        report them; the others ignore it.
+        """
+        raise NotImplementedError
+
+    def execute_readonly(self, sql: str, budget: Optional[QueryBudget] = None) -> Result:
+        columns: List[str] = []
+        rows: List[Tuple] = []
+        for columns, batch in self.iter_batches(sql, budget=budget):
+            rows.extend(batch)
+        return columns, rows
+
+    def catalog(self) -> SchemaCatalog:
+        raise NotImplementedError
+
+    def explain(self, sql: str) -> List[str]:
+        """The engine's plan for sql, one line per step."""
+        raise NotImplementedError
+
+    def limit(self, sql: str, n: int) -> str:
+        """The first statement of sql bounded to n rows, in this dialect's syntax."""
+        return rewrite_limit(sql, n)
+
+    def quote(self, name: str) -> str:
+        return '"' + name.replace('"', '""') + '"'
+
+    def version(self) -> Tuple:
+        """Cache key for results and schema-derived data."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteAdapter(DatabaseAdapter):
+    """The built-in SQLite backend: ``src.db.sqlite`` against DB_PATH, read at call time."""
+
+    dialect = "sqlite"
+
+    @property
+    def name(self) -> str:
+        return f"SQLite ({db.DB_PATH})"
+
+    def iter_batches(
+        self,
+        sql: str,
+        batch_size: int = db.FETCH_BATCH_SIZE,
+        budget: Optional[QueryBudget] = None,
+        on_stats: Optional[StatsCallback] = None,
+    ) -> Iterator[Result]:
+        return db.execute_readonly_iter(sql, batch_size=batch_size, budget=budget)
+
+    def execute_readonly(self, sql: str, budget: Optional[QueryBudget] = None) -> Result:
+        return db.execute_readonly(sql, budget=budget)
+
+    def catalog(self) -> SchemaCatalog:
+        return db.get_schema_catalog()
+
+    def explain(self, sql: str) -> List[str]:
+        from .plan_gate import explain, format_plan
+
+        return format_plan(explain(sql)).splitlines()
+
+    def version(self) -> Tuple:
+        return db.db_version()
+
+
+def limit_style(dialect: sa.engine.Dialect) -> str:
+    """``limit``, ``top`` or ``fetch``: how the dialect compiles a row limit."""
+    compiled = str(sa.select(sa.literal_column("1")).limit(1).compile(dialect=dialect)).upper()
+    if " TOP " in compiled:
+        return "top"
+    if "FETCH FIRST" in compiled:
+        return "fetch"
+    return "limit"
+
+
+def bound_sql(sql: str, n: int, style: str) -> str:
+    """First statement of sql with at most n rows, leaving an existing bound alone."""
+    a = analyze(sql)
+    stmt = sql[: a.end]
+    top = [t for t in tokenize(stmt) if t.depth == 0]
+    words = [t.text.upper() for t in top if t.kind == "word"]
+    if style == "limit" or a.kind == "empty":
+        return rewrite_limit(sql, n, analysis=a)
+    if {"TOP", "FETCH", "LIMIT"} & set(words):
+        return stmt
+    if style == "fetch":
+        return f"{stmt} FETCH FIRST {int(n)} ROWS ONLY"
+    select = next((i for i, t in enumerate(top[:-1]) if t.text.upper() == "SELECT"), None)
+    if select is None or {"UNION", "INTERSECT", "EXCEPT"} & set(words):
+        # TOP would bind to the first branch only
+        return f"SELECT TOP {int(n)} * FROM ({stmt}) AS _bounded"
+    after = top[select + 1] if top[select + 1].text.upper() in ("ALL", "DISTINCT") else top[select]
+    return f"{stmt[: after.end]} TOP {int(n)}{stmt[after.end :]}"
+
+
+def _type_name(type_: sa.types.TypeEngine, dialect: sa.engine.Dialect) -> str:
+    try:
+        return type_.compile(dialect=dialect)
+    except Exception:
+        return ""  # NullType and other types without DDL
+
+
+def introspect_engine(engine: Engine) -> Dict[str, TableInfo]:
+    """Columns, primary keys and foreign keys of the default schema, one bulk call per kind."""
+    inspector = sa.inspect(engine)
+    columns = inspector.get_multi_columns()
+    pks = inspector.get_multi_pk_constraint()
+    fks = inspector.get_multi_foreign_keys()
+    tables: Dict[str, TableInfo] = {}
+    for key, cols in columns.items():
+        name = key[1]
+        pk = (pks.get(key) or {}).get("constrained_columns") or []
+        table_cols = tuple(
+            Column(c["name"], _type_name(c["type"], engine.dialect), not c.get("nullable", True), pk.index(c["name"]) + 1 if c["name"] in pk else 0)
+            for c in cols
+        )
+        table_fks = tuple(
+            ForeignKey(local, fk["referred_table"], remote)
+            for fk in fks.get(key, [])
+            for local, remote in zip(fk["constrained_columns"], fk["referred_columns"])
+        )
+        tables[name] = TableInfo(name, table_cols, table_fks)
+    return tables
+
+
+class SQLAlchemyAdapter(DatabaseAdapter):
+    """Any SQLAlchemy-supported database through one pooled Engine.
+
+    Connections are made read-only for the whole session where the dialect
+    allows it (the guardrails remain the first line of defence). Budgets map
+    to the closest server-side limit: the governor's progress handler on
+    SQLite, ``statement_timeout`` on PostgreSQL, ``max_execution_time`` on
+    MySQL, and a wall-clock check between batches elsewhere. ``max_steps``
+    only applies to SQLite.
+    """
+
+    def __init__(self, url: str, **engine_kwargs):
+        parsed = sa.engine.make_url(url)
+        kwargs = dict(pool_pre_ping=True, pool_recycle=POOL_RECYCLE_SEC)
+        if parsed.get_backend_name() != "sqlite" or parsed.database not in (None, "", ":memory:"):
+            kwargs.update(pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT_SEC)
+        kwargs.update(engine_kwargs)
+        self.engine = sa.create_engine(parsed, **kwargs)
+        self.dialect = self.engine.dialect.name
+        self._limit_style = limit_style(self.engine.dialect)
+        self._catalog: Optional[SchemaCatalog] = None
+        self._catalog_at = 0.0
+        self._lock = threading.Lock()
+        read_only = _READ_ONLY_SQL.get(self.dialect)
+        if read_only:
+            @sa.event.listens_for(self.engine, "connect")
+            def _read_only(dbapi_conn, _record):
+                cursor = dbapi_conn.cursor()
+                cursor.execute(read_only)
+                cursor.close()
+                if self.dialect != "sqlite":
+                    dbapi_conn.commit()
+
+    @property
+    def name(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
+
+    @contextmanager
+    def _connection(self, budget: QueryBudget) -> Iterator[Tuple[Connection, Optional[QueryGovernor]]]:
+        with self.engine.connect() as conn:
+            governor = None
+            timeout = budget.timeout_sec
+            if self.dialect == "sqlite":
+                governor = QueryGovernor(conn.connection.driver_connection, budget)
+            elif timeout is not None and self.dialect in _TIMEOUT_SQL:
+                conn.exec_driver_sql(_TIMEOUT_SQL[self.dialect].format(ms=int(timeout * 1000), sec=timeout))
+            try:
+                if governor is None:
+                    yield conn, None
+                else:
+                    with governor:
+                        yield conn, governor
+            finally:
+                # Nothing to keep: the connection goes back to the pool clean
+                conn.rollback()
+
+    def iter_batches(
+        self,
+        sql: str,
+        batch_size: int = db.FETCH_BATCH_SIZE,
+        budget: Optional[QueryBudget] = None,
+        on_stats: Optional[StatsCallback] = None,
+    ) -> Iterator[Result]:
+        budget = budget or QueryBudget()
+        start = time.monotonic()
+        rows_seen = 0
+        with self._connection(budget) as (conn, governor):
+            try:
+                # Without the trailing ';', which some drivers (e.g. Oracle's) reject
+                stmt = sql[: analyze(sql).end] or sql
+                result = conn.execution_options(stream_results=True, max_row_buffer=batch_size).exec_driver_sql(stmt)
+                columns = list(result.keys()) if result.returns_rows else []
+                first = True
+                for partition in result.partitions(batch_size) if result.returns_rows else ():
+                    batch = [tuple(r) for r in partition]
+                    rows_seen += len(batch)
+                    if governor is not None:
+                        governor.count_rows(len(batch))
+                    elif budget.max_rows is not None and rows_seen > budget.max_rows:
+                        raise RowBudgetExceeded(f"Query returned more than {budget.max_rows:,} rows.")
+                    if governor is None and budget.timeout_sec is not None and time.monotonic() - start > budget.timeout_sec:
+                        raise QueryTimeoutError(f"Query exceeded {budget.timeout_sec:g}s.")
+                    first = False
+                    yield columns, batch
+                if first:
+                    yield columns, []
+            except sa.exc.DBAPIError as e:
+                orig = e.orig
+                code = getattr(orig, "pgcode", None) or (orig.args[0] if getattr(orig, "args", None) else None)
+                if code in _TIMEOUT_CODES:
+                    raise QueryTimeoutError(f"Query exceeded {budget.timeout_sec:g}s.") from e
+                if isinstance(orig, sqlite3.Error):
+                    raise orig from None  # same errors as SQLiteAdapter (and the governor's mapping)
+                raise
+
+    def catalog(self) -> SchemaCatalog:
+        """Introspected schema, cached for DB_CATALOG_TTL_SEC (no cheap change counter off SQLite)."""
+        with self._lock:
+            if self._catalog is None or time.monotonic() - self._catalog_at > CATALOG_TTL_SEC:
+                self._catalog = SchemaCatalog(introspect_engine(self.engine), 0)
+                self._catalog_at = time.monotonic()
+            return self._catalog
+
+    def invalidate_catalog(self) -> None:
+        with self._lock:
+            self._catalog = None
+
+    def explain(self, sql: str) -> List[str]:
+        prefix = _EXPLAIN.get(self.dialect)
+        if prefix is None:
+            raise NotImplementedError(f"EXPLAIN is not wired up for {self.dialect}")
+        _, rows = self.execute_readonly(prefix + sql)
+        if self.dialect == "sqlite":
+            from .plan_gate import format_plan, parse_plan
+
+            return format_plan(parse_plan(rows)).splitlines()
+        return [" | ".join(str(v) for v in row if v is not None) for row in rows]
+
+    def limit(self, sql: str, n: int) -> str:
+        return bound_sql(sql, n, self._limit_style)
+
+    def quote(self, name: str) -> str:
+        return self.engine.dialect.identifier_preparer.quote_identifier(name)
+
+    def version(self) -> Tuple:
+        return self.name, self.catalog().fingerprint
+
+    def close(self) -> None:
+        self.engine.dispose()
+
+
+_ADAPTERS: Dict[str, DatabaseAdapter] = {}
+_ADAPTERS_LOCK = threading.Lock()
+
+
+def get_adapter(url: Optional[str] = None) -> DatabaseAdapter:
+    """Process-wide adapter for url (default DATABASE_URL; empty means SQLiteAdapter)."""
+    url = DATABASE_URL if url is None else url
+    with _ADAPTERS_LOCK:
+        adapter = _ADAPTERS.get(url)
+        if adapter is None:
+            if url.startswith("athena://"):
+                from .athena import AthenaAdapter
+
+                adapter = AthenaAdapter.from_url(url)
+            else:
+                adapter = SQLAlchemyAdapter(url) if url else SQLiteAdapter()
+            _ADAPTERS[url] = adapter
+    return adapter
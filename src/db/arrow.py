@@ -0,0 +1,229 @@
+"""Columnar query results as pyarrow record batches.
+
+Each fetched batch is pivoted with ``zip(*rows)`` and turned into one Arrow
+array per column, so only a single batch of row tuples is alive at a time.
+Column types come from the declared types of the table columns that a
+result column references directly (``hr``, ``b.hr AS home_runs``, ``*``);
+expressions, even when aliased to a column name, are inferred. SQLite
+does not enforce declared types, so a value that does not fit widens the
+column (null -> anything, int64 -> double, anything -> string) and earlier
+batches are cast to match in ``to_table``.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+from src.agent.sql_lexer import tokenize
+
+from . import result_cache
+from . import sqlite as db
+from .adapter import DatabaseAdapter, StatsCallback
+from .catalog import SchemaCatalog, affinity
+from .governor import QueryBudget
+
+
+ARROW_BATCH_SIZE = int(os.getenv("SQLITE_ARROW_BATCH_SIZE", "10000"))
+
+_AFFINITY_TYPES = {"INTEGER": pa.int64(), "REAL": pa.float64(), "TEXT": pa.string()}
+_CONVERSION_ERRORS = (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, OverflowError, ValueError)
+# Keywords that end a SELECT list
+_LIST_END = frozenset({"FROM", "WHERE", "GROUP", "HAVING", "ORDER", "LIMIT", "UNION", "INTERSECT", "EXCEPT", "WINDOW"})
+
+
+def _name(tok) -> str:
+    return tok.text.strip('"`[]').lower()
+
+
+def select_sources(sql: str) -> Tuple[Dict[str, str], Set[str], bool]:
+    """What each output column of the main SELECT list reads.
+
+    Returns (output name -> source column) for bare column references such
+    as ``b.hr`` or ``hr AS home_runs``, the output names of every other
+    expression, and whether the list has a ``*``. All names are lower-cased.
+    """
+    tokens = tokenize(sql)
+    start = next((i for i, t in enumerate(tokens) if t.depth == 0 and t.kind == "word" and t.text.upper() == "SELECT"), None)
+    bare: Dict[str, str] = {}
+    computed: Set[str] = set()
+    star = False
+    if start is None:
+        return bare, computed, star
+    items: List[list] = [[]]
+    for tok in tokens[start + 1 :]:
+        if tok.depth == 0 and (tok.kind == "word" and tok.text.upper() in _LIST_END or tok.text == ";"):
+            break
+        if tok.depth == 0 and tok.text == ",":
+            items.append([])
+        else:
+            items[-1].append(tok)
+    if items[0] and items[0][0].kind == "word" and items[0][0].text.upper() in ("DISTINCT", "ALL"):
+        items[0] = items[0][1:]
+    for item in items:
+        if not item:
+            continue
+        alias = None
+        if len(item) > 2 and item[-2].kind == "word" and item[-2].text.upper() == "AS":
+            alias, item = _name(item[-1]), item[:-2]
+        elif len(item) > 1 and item[-1].kind in ("word", "qident") and (item[-2].text == ")" or item[-2].kind in ("word", "qident", "string", "number")):
+            alias, item = _name(item[-1]), item[:-1]
+        # name, or qualifier(s) and name separated by dots
+        texts = [t.text for t in item]
+        if texts[-1] == "*" and all(t == "." for t in texts[1::2]):
+            star = True
+        elif len(item) % 2 == 1 and all(t.kind in ("word", "qident") for t in item[::2]) and all(t == "." for t in texts[1::2]):
+            bare[alias or _name(item[-1])] = _name(item[-1])
+        elif alias is not None:
+            computed.add(alias)
+        else:
+            computed.add("".join(texts).lower())
+    return bare, computed, star
+
+
+def declared_types(sql: str, columns: Sequence[str], catalog: Optional[SchemaCatalog] = None) -> List[Optional[pa.DataType]]:
+    """Arrow type per result column from the declared types of the tables sql reads.
+
+    Only bare column references (and ``*``) get a type: an expression aliased
+    to a column name, such as ``AVG(salary) AS salary``, is inferred. A column
+    gets a type when its source name matches a column of a referenced table
+    and every such match has the same affinity; None means infer.
+    """
+    catalog = catalog or db.get_schema_catalog()
+    names = {t.text.strip('"`[]').lower() for t in tokenize(sql) if t.kind in ("word", "qident")}
+    by_column: Dict[str, set] = {}
+    for table in catalog.table_names(include_internal=True):
+        if table.lower() in names:
+            for col in catalog.columns(table):
+                by_column.setdefault(col.name.lower(), set()).add(affinity(col.type))
+    bare, computed, star = select_sources(sql)
+    types: List[Optional[pa.DataType]] = []
+    for name in columns:
+        key = name.lower()
+        source = bare.get(key) or (key if star and key not in computed else None)
+        found = by_column.get(source, ()) if source else ()
+        types.append(_AFFINITY_TYPES.get(next(iter(found))) if len(found) == 1 else None)
+    return types
+
+
+def common_type(a: pa.DataType, b: pa.DataType) -> pa.DataType:
+    if a == b or pa.types.is_null(b):
+        return a
+    if pa.types.is_null(a):
+        return b
+    if {a, b} == {pa.int64(), pa.float64()}:
+        return pa.float64()
+    return pa.string()
+
+
+def _to_string(values: Sequence) -> pa.Array:
+    return pa.array(
+        [None if v is None else v.decode("utf-8", "replace") if isinstance(v, bytes) else str(v) for v in values],
+        type=pa.string(),
+    )
+
+
+def column_array(values: Sequence, type: Optional[pa.DataType]) -> pa.Array:
+    """Arrow array for one column of a batch, widening type when a value does not fit.
+
+    Values are converted by inference and only then cast (safely) to the
+    common type with ``type``, so a fraction is never truncated to fit an
+    integer column.
+    """
+    try:
+        inferred = pa.array(values)
+    except _CONVERSION_ERRORS:
+        return _to_string(values)
+    if type is None or pa.types.is_null(type):
+        return inferred
+    target = common_type(type, inferred.type)
+    if target == inferred.type:
+        return inferred
+    try:
+        return inferred.cast(target, safe=True)
+    except _CONVERSION_ERRORS:
+        return _to_string(values)
+
+
+def record_batch(columns: Sequence[str], rows: Sequence[Tuple], types: Sequence[Optional[pa.DataType]]) -> pa.RecordBatch:
+    if rows:
+        arrays = [column_array(values, t) for values, t in zip(zip(*rows), types)]
+    else:
+        arrays = [pa.array([], type=t or pa.null()) for t in types]
+    return pa.RecordBatch.from_arrays(arrays, names=list(columns))
+
+
+def iter_record_batches(
+    sql: str,
+    batch_size: int = ARROW_BATCH_SIZE,
+    budget: Optional[QueryBudget] = None,
+    types: Optional[Sequence[Optional[pa.DataType]]] = None,
+    adapter: Optional[DatabaseAdapter] = None,
+    on_stats: Optional[StatsCallback] = None,
+) -> Iterator[pa.RecordBatch]:
+    """Stream a read-only query as record batches; batch schemas may widen, see ``to_table``.
+
+    ``types`` overrides ``declared_types``. Like ``execute_readonly_iter``, at
+    least one (possibly empty) batch is yielded. ``adapter`` runs the query on
+    another backend (default: DB_PATH), passing it ``on_stats``.
+    """
+    if adapter is None:
+        source = db.execute_readonly_iter(sql, batch_size=batch_size, budget=budget)
+    else:
+        source = adapter.iter_batches(sql, batch_size=batch_size, budget=budget, on_stats=on_stats)
+    for columns, rows in source:
+        if types is None:
+            types = declared_types(sql, columns, adapter.catalog() if adapter is not None else None)
+        batch = record_batch(columns, rows, types)
+        # Later batches start from the types this one settled on
+        types = [f.type for f in batch.schema]
+        yield batch
+
+
+def to_table(batches: Iterable[pa.RecordBatch]) -> pa.Table:
+    """Concatenate batches into one table, casting columns to their widest type."""
+    batches = list(batches)
+    if not batches:
+        return pa.table({})
+    names = batches[0].schema.names
+    types = [f.type for f in batches[0].schema]
+    for batch in batches[1:]:
+        types = [common_type(a, f.type) for a, f in zip(types, batch.schema)]
+    schema = pa.schema([pa.field(n, t) for n, t in zip(names, types)])
+    unified = []
+    for batch in batches:
+        if batch.schema != schema:
+            batch = pa.RecordBatch.from_arrays(
+                [a if a.type == t else a.cast(t) for a, t in zip(batch.columns, types)], schema=schema
+            )
+        unified.append(batch)
+    return pa.Table.from_batches(unified, schema=schema)
+
+
+def to_pandas(data) -> pd.DataFrame:
+    """DataFrame backed by the Arrow buffers (ArrowDtype columns, no copy)."""
+    return data.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def execute_arrow(sql: str, batch_size: int = ARROW_BATCH_SIZE, budget: Optional[QueryBudget] = None) -> pa.Table:
+    return to_table(iter_record_batches(sql, batch_size, budget))
+
+
+def arrow_cache_key(sql: str) -> Tuple[Hashable, ...]:
+    """RESULT_CACHE key for the Arrow form of sql; read it *before* executing."""
+    return result_cache.cache_key(sql) + ("arrow",)
+
+
+def cached_execute_arrow(sql: str, budget: Optional[QueryBudget] = None, bypass: bool = False) -> pa.Table:
+    """``execute_arrow`` behind RESULT_CACHE, sized by the table's buffer bytes."""
+    key = arrow_cache_key(sql)
+    if not bypass:
+        hit = result_cache.RESULT_CACHE.get(key)
+        if hit is not None:
+            return hit[1]
+    table = execute_arrow(sql, budget=budget)
+    result_cache.RESULT_CACHE.put(key, table.column_names, table, size=table.nbytes)
+    return table
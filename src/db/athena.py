@@ -0,0 +1,279 @@
+"""Amazon Athena behind the DatabaseAdapter interface.
+
+Athena runs queries asynchronously: ``StartQueryExecution`` returns an id,
+``GetQueryExecution`` reports its state, and ``GetQueryResults`` pages
+through the finished result (at most 1000 rows per call) with typed column
+metadata. This adapter
+
+- polls adaptively: ATHENA_POLL_INITIAL_SEC first, growing by
+  ATHENA_POLL_BACKOFF up to ATHENA_POLL_MAX_SEC, so short queries return
+  within ~100ms of finishing and long ones cost few API calls;
+- streams the result pages into typed ``(columns, rows)`` batches instead of
+  downloading the whole CSV from S3;
+- asks Athena to reuse a previous result of the same query for up to
+  ATHENA_REUSE_MAX_AGE_MIN minutes (0 disables);
+- reports scanned bytes, engine time and reuse per query to the caller's
+  ``on_stats`` callback.
+
+Athena has no read-only sessions; the SQL guardrails are the only defence
+against writes. Budgets cover the wall clock (the query is stopped on
+timeout) and the row count; ``max_steps`` does not apply.
+
+Selected with ``DATABASE_URL=athena://<workgroup>/<database>``.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import os
+import threading
+import time
+from decimal import Decimal
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import boto3
+
+from . import sqlite as db
+from .adapter import CATALOG_TTL_SEC, DatabaseAdapter, Result, StatsCallback
+from .catalog import Column, SchemaCatalog, TableInfo
+from .governor import ATHENA_BUDGET, QueryBudget, QueryCancelledError, QueryTimeoutError, RowBudgetExceeded
+
+
+WORKGROUP = os.getenv("ATHENA_WORKGROUP", "primary")
+DATABASE = os.getenv("ATHENA_DATABASE", "default")
+DATA_CATALOG = os.getenv("ATHENA_DATA_CATALOG", "AwsDataCatalog")
+# Empty: use the workgroup's result location
+OUTPUT_LOCATION = os.getenv("ATHENA_OUTPUT_LOCATION", "")
+REUSE_MAX_AGE_MIN = int(os.getenv("ATHENA_REUSE_MAX_AGE_MIN", "60"))
+POLL_INITIAL_SEC = float(os.getenv("ATHENA_POLL_INITIAL_SEC", "0.1"))
+POLL_MAX_SEC = float(os.getenv("ATHENA_POLL_MAX_SEC", "2.0"))
+POLL_BACKOFF = float(os.getenv("ATHENA_POLL_BACKOFF", "1.5"))
+
+# GetQueryResults returns at most this many rows per call
+PAGE_ROWS = 1000
+
+
+class AthenaQueryError(Exception):
+    """A query Athena reported as FAILED."""
+
+
+class QueryStats(NamedTuple):
+    query_id: str
+    scanned_bytes: int
+    engine_ms: int
+    total_ms: int
+    queued_ms: int
+    reused: bool
+
+
+def poll_delays(initial: float = POLL_INITIAL_SEC, maximum: float = POLL_MAX_SEC, backoff: float = POLL_BACKOFF) -> Iterator[float]:
+    """initial, initial*backoff, … capped at maximum, forever."""
+    delay = initial
+    while True:
+        yield min(delay, maximum)
+        delay *= backoff
+
+
+def _parse_timestamp(value: str) -> dt.datetime:
+    # Athena prints up to nanoseconds; datetime keeps microseconds
+    head, dot, frac = value.partition(".")
+    return dt.datetime.fromisoformat(head + (dot + frac[:6] if dot else ""))
+
+
+_CONVERTERS: Dict[str, Callable[[str], object]] = {
+    "tinyint": int,
+    "smallint": int,
+    "integer": int,
+    "int": int,
+    "bigint": int,
+    "double": float,
+    "float": float,
+    "real": float,
+    "decimal": Decimal,
+    "boolean": lambda v: v == "true",
+    "date": dt.date.fromisoformat,
+    "timestamp": _parse_timestamp,
+}
+
+
+def converters(column_info: List[Dict]) -> List[Callable[[str], object]]:
+    """Parser per column from ResultSetMetadata; unknown types (varchar, arrays, …) stay strings."""
+    return [_CONVERTERS.get(c["Type"].split("(")[0].lower(), str) for c in column_info]
+
+
+def parse_rows(rows: List[Dict], parse: List[Callable[[str], object]]) -> List[Tuple]:
+    return [
+        tuple(None if "VarCharValue" not in d else f(d["VarCharValue"]) for f, d in zip(parse, row["Data"]))
+        for row in rows
+    ]
+
+
+class AthenaAdapter(DatabaseAdapter):
+    """Athena queries through a boto3 client; ``sleep``/``clock`` are injectable for tests."""
+
+    dialect = "athena"
+    query_budget = ATHENA_BUDGET
+
+    def __init__(
+        self,
+        client=None,
+        workgroup: str = WORKGROUP,
+        database: str = DATABASE,
+        data_catalog: str = DATA_CATALOG,
+        output_location: str = OUTPUT_LOCATION,
+        reuse_max_age_min: int = REUSE_MAX_AGE_MIN,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.client = client or boto3.client("athena")
+        self.workgroup = workgroup
+        self.database = database
+        self.data_catalog = data_catalog
+        self.output_location = output_location
+        self.reuse_max_age_min = reuse_max_age_min
+        self.sleep = sleep
+        self.clock = clock
+        self._catalog: Optional[SchemaCatalog] = None
+        self._catalog_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url: str) -> "AthenaAdapter":
+        """``athena://<workgroup>/<database>?output=s3://…&region=…``; missing parts use the env defaults."""
+        parsed = urlparse(url)
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        client = boto3.client("athena", region_name=query["region"]) if "region" in query else None
+        return cls(
+            client,
+            workgroup=parsed.hostname or WORKGROUP,
+            database=parsed.path.strip("/") or DATABASE,
+            output_location=query.get("output", OUTPUT_LOCATION),
+        )
+
+    @property
+    def name(self) -> str:
+        return f"Athena ({self.workgroup}/{self.database})"
+
+    def start(self, sql: str) -> str:
+        """Submit sql and return its QueryExecutionId."""
+        kwargs: Dict = dict(
+            QueryString=sql,
+            WorkGroup=self.workgroup,
+            QueryExecutionContext={"Database": self.database, "Catalog": self.data_catalog},
+        )
+        if self.output_location:
+            kwargs["ResultConfiguration"] = {"OutputLocation": self.output_location}
+        if self.reuse_max_age_min > 0:
+            kwargs["ResultReuseConfiguration"] = {
+                "ResultReuseByAgeConfiguration": {"Enabled": True, "MaxAgeInMinutes": self.reuse_max_age_min}
+            }
+        return self.client.start_query_execution(**kwargs)["QueryExecutionId"]
+
+    def wait(self, query_id: str, deadline: Optional[float] = None) -> QueryStats:
+        """Poll until the query finishes; stop it and raise QueryTimeoutError past deadline."""
+        for delay in poll_delays():
+            execution = self.client.get_query_execution(QueryExecutionId=query_id)["QueryExecution"]
+            status = execution["Status"]
+            state = status["State"]
+            if state == "SUCCEEDED":
+                s = execution.get("Statistics", {})
+                return QueryStats(
+                    query_id,
+                    s.get("DataScannedInBytes", 0),
+                    s.get("EngineExecutionTimeInMillis", 0),
+                    s.get("TotalExecutionTimeInMillis", 0),
+                    s.get("QueryQueueTimeInMillis", 0),
+                    s.get("ResultReuseInformation", {}).get("ReusedPreviousResult", False),
+                )
+            if state == "FAILED":
+                raise AthenaQueryError(status.get("StateChangeReason", "Athena query failed."))
+            if state == "CANCELLED":
+                raise QueryCancelledError("Query was cancelled.")
+            if deadline is not None:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    self.client.stop_query_execution(QueryExecutionId=query_id)
+                    raise QueryTimeoutError("Query exceeded its time budget.")
+                delay = min(delay, remaining)
+            self.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def iter_results(self, query_id: str, batch_size: int = db.FETCH_BATCH_SIZE) -> Iterator[Result]:
+        """Page through a finished query's results as typed batches of up to batch_size rows."""
+        columns: List[str] = []
+        parse: List[Callable[[str], object]] = []
+        pending: List[Tuple] = []
+        token: Optional[str] = None
+        yielded = False
+        while True:
+            kwargs: Dict = dict(QueryExecutionId=query_id, MaxResults=PAGE_ROWS)
+            if token:
+                kwargs["NextToken"] = token
+            page = self.client.get_query_results(**kwargs)
+            rows = page["ResultSet"]["Rows"]
+            if token is None:
+                info = page["ResultSet"]["ResultSetMetadata"]["ColumnInfo"]
+                columns = [c["Name"] for c in info]
+                parse = converters(info)
+                # SELECT results repeat the column names as their first row
+                if rows and [d.get("VarCharValue") for d in rows[0]["Data"]] == columns:
+                    rows = rows[1:]
+            pending.extend(parse_rows(rows, parse))
+            token = page.get("NextToken")
+            while len(pending) >= batch_size or (pending and not token):
+                yielded = True
+                yield columns, pending[:batch_size]
+                pending = pending[batch_size:]
+            if not token:
+                break
+        if not yielded:
+            yield columns, []
+
+    def iter_batches(
+        self,
+        sql: str,
+        batch_size: int = db.FETCH_BATCH_SIZE,
+        budget: Optional[QueryBudget] = None,
+        on_stats: Optional[StatsCallback] = None,
+    ) -> Iterator[Result]:
+        budget = budget or self.query_budget
+        deadline = None if budget.timeout_sec is None else self.clock() + budget.timeout_sec
+        query_id = self.start(sql)
+        stats = self.wait(query_id, deadline)
+        if on_stats is not None:
+            on_stats(stats)
+        rows_seen = 0
+        for columns, rows in self.iter_results(query_id, batch_size):
+            rows_seen += len(rows)
+            if budget.max_rows is not None and rows_seen > budget.max_rows:
+                raise RowBudgetExceeded(f"Query returned more than {budget.max_rows:,} rows.")
+            if deadline is not None and self.clock() > deadline:
+                raise QueryTimeoutError(f"Query exceeded {budget.timeout_sec:g}s.")
+            yield columns, rows
+
+    def catalog(self) -> SchemaCatalog:
+        """Tables of the database from the data catalog, cached for DB_CATALOG_TTL_SEC."""
+        with self._lock:
+            if self._catalog is None or self.clock() - self._catalog_at > CATALOG_TTL_SEC:
+                tables: Dict[str, TableInfo] = {}
+                paginator = self.client.get_paginator("list_table_metadata")
+                for page in paginator.paginate(CatalogName=self.data_catalog, DatabaseName=self.database):
+                    for meta in page["TableMetadataList"]:
+                        cols = meta.get("Columns", []) + meta.get("PartitionKeys", [])
+                        tables[meta["Name"]] = TableInfo(meta["Name"], tuple(Column(c["Name"], c.get("Type", ""), False, 0) for c in cols), ())
+                self._catalog = SchemaCatalog(tables, 0)
+                self._catalog_at = self.clock()
+            return self._catalog
+
+    def invalidate_catalog(self) -> None:
+        with self._lock:
+            self._catalog = None
+
+    def explain(self, sql: str) -> List[str]:
+        """Runs (and bills) an EXPLAIN query."""
+        _, rows = self.execute_readonly("EXPLAIN " + sql)
+        return [str(row[0]) for row in rows]
+
+    def version(self) -> Tuple:
+        return self.name, self.catalog().fingerprint
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .pool import get_pool
+
+
+# SQLite's own tables and the seeder's manifest (src.data.seed_sqlite)
+INTERNAL_PREFIXES = ("sqlite_", "_seed_")
+
+
+class Column(NamedTuple):
+    name: str
+    type: str
+    notnull: bool
+    pk: int  # 1-based position in the primary key, 0 if not part of it
+
+
+class ForeignKey(NamedTuple):
+    column: str
+    ref_table: str
+    ref_column: str
+
+
+def affinity(decltype: str) -> str:
+    """SQLite's column affinity for a declared type (section 3.1 of the datatype docs)."""
+    t = decltype.upper()
+    if "INT" in t:
+        return "INTEGER"
+    if "CHAR" in t or "CLOB" in t or "TEXT" in t:
+        return "TEXT"
+    if not t or "BLOB" in t:
+        return "BLOB"
+    if "REAL" in t or "FLOA" in t or "DOUB" in t:
+        return "REAL"
+    return "NUMERIC"
+
+
+class TableInfo(NamedTuple):
+    name: str
+    columns: Tuple[Column, ...]
+    foreign_keys: Tuple[ForeignKey, ...]
+
+    @property
+    def primary_key(self) -> Tuple[str, ...]:
+        return tuple(c.name for c in sorted(self.columns, key=lambda c: c.pk) if c.pk)
+
+
+class SchemaCatalog:
+    """Immutable snapshot of a database schema: tables, columns, PKs and FKs."""
+
+    def __init__(self, tables: Dict[str, TableInfo], schema_version: int):
+        self.tables = dict(sorted(tables.items()))
+        self.schema_version = schema_version
+        self._by_lower = {name.lower(): info for name, info in self.tables.items()}
+        self._fingerprint: Optional[str] = None
+
+    def table_names(self, include_internal: bool = False) -> List[str]:
+        if include_internal:
+            return list(self.tables)
+        return [t for t in self.tables if not t.startswith(INTERNAL_PREFIXES)]
+
+    def table(self, name: str) -> Optional[TableInfo]:
+        # SQLite identifiers are case-insensitive
+        return self.tables.get(name) or self._by_lower.get(name.lower())
+
+    def columns(self, name: str) -> Tuple[Column, ...]:
+        info = self.table(name)
+        return info.columns if info else ()
+
+    def foreign_keys(self, name: str) -> Tuple[ForeignKey, ...]:
+        info = self.table(name)
+        return info.foreign_keys if info else ()
+
+    @property
+    def fingerprint(self) -> str:
+        """Content hash of the schema, stable across files with the same structure."""
+        if self._fingerprint is None:
+            h = hashlib.sha1()
+            for info in self.tables.values():
+                h.update(repr((info.name, info.columns, info.foreign_keys)).encode())
+            self._fingerprint = h.hexdigest()
+        return self._fingerprint
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+# One round trip for every table's columns and foreign keys. Rows are
+# (table, kind, k1, k2, a, b, c, d): kind 0 = column (cid, -, name, type,
+# notnull, pk), kind 1 = foreign key (id, seq, from, table, to, -).
+_BULK_SQL = """
+SELECT m.name, 0, p.cid, 0, p.name, p.type, p."notnull", p.pk
+FROM sqlite_master AS m JOIN pragma_table_info(m.name) AS p
+WHERE m.type = 'table'
+UNION ALL
+SELECT m.name, 1, f.id, f.seq, f."from", f."table", f."to", NULL
+FROM sqlite_master AS m JOIN pragma_foreign_key_list(m.name) AS f
+WHERE m.type = 'table'
+ORDER BY 1, 2, 3, 4;
+"""
+
+
+def introspect_bulk(conn: sqlite3.Connection) -> Dict[str, TableInfo]:
+    """Read all tables' columns and FKs with a single statement."""
+    cols: Dict[str, List[Column]] = {}
+    fks: Dict[str, List[ForeignKey]] = {}
+    for table, kind, _k1, _k2, a, b, c, d in conn.execute(_BULK_SQL):
+        if kind == 0:
+            cols.setdefault(table, []).append(Column(a, b, bool(c), d))
+        else:
+            fks.setdefault(table, []).append(ForeignKey(a, b, c))
+    return {
+        name: TableInfo(name, tuple(cols[name]), tuple(fks.get(name, ())))
+        for name in sorted(cols)
+    }
+
+
+def introspect_per_table(conn: sqlite3.Connection) -> Dict[str, TableInfo]:
+    """PRAGMA-per-table introspection (N+1 round trips); kept as a fallback."""
+    names = [
+        r[0]
+        for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;")
+    ]
+    tables: Dict[str, TableInfo] = {}
+    for name in names:
+        # rows: cid, name, type, notnull, dflt_value, pk
+        cols = tuple(
+            Column(r[1], r[2], bool(r[3]), r[5])
+            for r in conn.execute(f"PRAGMA table_info({_quote(name)});")
+        )
+        # rows: id, seq, table, from, to, on_update, on_delete, match
+        fks = tuple(
+            ForeignKey(r[3], r[2], r[4])
+            for r in conn.execute(f"PRAGMA foreign_key_list({_quote(name)});")
+        )
+        tables[name] = TableInfo(name, cols, fks)
+    return tables
+
+
+def introspect(conn: sqlite3.Connection) -> Dict[str, TableInfo]:
+    try:
+        return introspect_bulk(conn)
+    except sqlite3.OperationalError:
+        # e.g. a virtual table whose module is not loaded makes the bulk join fail
+        return introspect_per_table(conn)
+
+
+def load_catalog(conn: sqlite3.Connection) -> SchemaCatalog:
+    version = conn.execute("PRAGMA schema_version;").fetchone()[0]
+    return SchemaCatalog(introspect(conn), version)
+
+
+def _stat_key(path: str) -> Tuple:
+    """Cheap change detector: main file plus WAL file stat."""
+    key: List = []
+    for p in (path, path + "-wal"):
+        try:
+            st = os.stat(p)
+            key.append((st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            key.append(None)
+    return tuple(key)
+
+
+class _Entry(NamedTuple):
+    stat_key: Tuple
+    version_key: Tuple
+    catalog: SchemaCatalog
+
+
+_CATALOGS: Dict[str, _Entry] = {}
+_LOCK = threading.Lock()
+
+
+def get_catalog(path: str) -> SchemaCatalog:
+    """Return the shared SchemaCatalog for path, re-introspecting only on change.
+
+    File stat is checked first; only when it moved is ``PRAGMA schema_version``
+    read, and only when that (or the file's inode) changed is the schema
+    introspected again. Data-only writes therefore cost one PRAGMA.
+    """
+    key = os.path.abspath(path)
+    stat_key = _stat_key(key)
+    entry = _CATALOGS.get(key)
+    if entry is not None and entry.stat_key == stat_key:
+        return entry.catalog
+    with _LOCK:
+        entry = _CATALOGS.get(key)
+        if entry is not None and entry.stat_key == stat_key:
+            return entry.catalog
+        with get_pool(key).connection() as conn:
+            version = conn.execute("PRAGMA schema_version;").fetchone()[0]
+            # Stat again after connecting: the pool may have just created the file
+            stat_key = _stat_key(key)
+            version_key = (stat_key[0][:2] if stat_key[0] else None, version)
+            if entry is not None and entry.version_key == version_key:
+                catalog = entry.catalog
+            else:
+                catalog = SchemaCatalog(introspect(conn), version)
+        _CATALOGS[key] = _Entry(stat_key, version_key, catalog)
+        return catalog
+
+
+def invalidate_catalog(path: Optional[str] = None) -> None:
+    """Drop cached catalogs (all of them when path is None)."""
+    with _LOCK:
+        if path is None:
+            _CATALOGS.clear()
+        else:
+            _CATALOGS.pop(os.path.abspath(path), None)
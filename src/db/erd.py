@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from .catalog import SchemaCatalog
+
+
+NODE_WITH_COLUMNS = '  node [shape=record, style="rounded,filled", fillcolor="#F6F8FA", color="#9AA0A6", fontname="Helvetica", fontsize=10];'
+NODE_NAMES_ONLY = '  node [shape=box, style="rounded,filled", fillcolor="#F6F8FA", color="#9AA0A6", fontname="Helvetica", fontsize=11];'
+EDGE_STYLE = '  edge [color="#9AA0A6", arrowsize=0.7, fontname="Helvetica", fontsize=9];'
+
+
+class Relationship(NamedTuple):
+    src: str
+    dst: str
+    label: str
+
+
+def _find_player_table(tables: List[str], by_lower: Dict[str, str]) -> Optional[str]:
+    for candidate in ("player", "players"):
+        if candidate in by_lower:
+            return by_lower[candidate]
+        for t in tables:
+            if candidate in t.lower():
+                return t
+    return None
+
+
+def _infer(catalog: SchemaCatalog) -> Tuple[Relationship, ...]:
+    tables = catalog.table_names()
+    # Name index: lower-cased table name -> table, built once per schema
+    by_lower = {t.lower().strip(): t for t in tables}
+    edges: Set[Relationship] = set()
+
+    # Prefer declared FKs
+    for t in tables:
+        for fk in catalog.foreign_keys(t):
+            edges.add(Relationship(t, fk.ref_table, f"{fk.column}->{fk.ref_column}"))
+
+    # Heuristic: link tables with playerID/player_id to 'player'
+    player_table = _find_player_table(tables, by_lower)
+
+    for t in tables:
+        cols = [c.name.lower() for c in catalog.columns(t)]
+        if player_table and t != player_table and ("playerid" in cols or "player_id" in cols):
+            edges.add(Relationship(t, player_table, "player_id"))
+        # Generic heuristic: foo_id / fooid -> foo / foos
+        for c in cols:
+            if not c.endswith("id"):
+                continue
+            base = c[:-3] if c.endswith("_id") else c[:-2]
+            if not base:
+                continue
+            for cand in (base, base + "s"):
+                target = by_lower.get(cand)
+                if target is not None and target != t:
+                    edges.add(Relationship(t, target, c))
+    return tuple(sorted(edges))
+
+
+def join_columns(catalog: SchemaCatalog, rel: Relationship) -> Optional[Tuple[str, str]]:
+    """(src_column, dst_column) a relationship joins on, resolved against the catalog."""
+    if "->" in rel.label:
+        src_col, dst_col = rel.label.split("->", 1)
+        return src_col, dst_col
+    src_cols = {c.name.lower(): c.name for c in catalog.columns(rel.src)}
+    dst_cols = {c.name.lower(): c.name for c in catalog.columns(rel.dst)}
+    candidates = ("playerid", "player_id") if rel.label == "player_id" else (rel.label,)
+    src_col = next((src_cols[c] for c in candidates if c in src_cols), None)
+    if src_col is None:
+        return None
+    dst_col = next((dst_cols[c] for c in candidates if c in dst_cols), None)
+    if dst_col is None:
+        info = catalog.table(rel.dst)
+        pk = info.primary_key if info else ()
+        if len(pk) != 1:
+            return None
+        dst_col = pk[0]
+    return src_col, dst_col
+
+
+_REL_CACHE: Dict[str, Tuple[Relationship, ...]] = {}
+_DOT_CACHE: "OrderedDict[Tuple, str]" = OrderedDict()
+_SVG_CACHE: "OrderedDict[str, str]" = OrderedDict()
+_CACHE_SIZE = 32
+_LOCK = threading.Lock()
+
+
+def infer_relationships(catalog: SchemaCatalog) -> Tuple[Relationship, ...]:
+    """Declared FKs plus naming-pattern links, computed once per schema fingerprint."""
+    key = catalog.fingerprint
+    rels = _REL_CACHE.get(key)
+    if rels is None:
+        rels = _infer(catalog)
+        with _LOCK:
+            _REL_CACHE.clear()  # only the current schema is worth keeping
+            _REL_CACHE[key] = rels
+    return rels
+
+
+def _lru_put(cache: OrderedDict, key, value) -> None:
+    with _LOCK:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > _CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def select_tables(
+    tables: List[str],
+    relationships: Iterable[Relationship],
+    focus: Optional[str] = None,
+    depth: int = 1,
+    top_n: Optional[int] = None,
+) -> List[str]:
+    """Pick the tables to draw: a focus table's neighborhood and/or the top-N most connected."""
+    rels = list(relationships)
+    neighbors: Dict[str, Set[str]] = {t: set() for t in tables}
+    for r in rels:
+        neighbors.setdefault(r.src, set()).add(r.dst)
+        neighbors.setdefault(r.dst, set()).add(r.src)
+
+    keep = list(tables)
+    if focus:
+        seen = {focus}
+        frontier = {focus}
+        for _ in range(max(0, depth)):
+            frontier = {n for t in frontier for n in neighbors.get(t, ())} - seen
+            seen |= frontier
+        keep = [t for t in keep if t in seen]
+    if top_n is not None and len(keep) > top_n:
+        degree = {t: len(neighbors.get(t, ())) for t in keep}
+        ranked = sorted(keep, key=lambda t: (-degree[t], t))[:top_n]
+        if focus and focus in keep and focus not in ranked:
+            ranked[-1] = focus
+        chosen = set(ranked)
+        keep = [t for t in keep if t in chosen]
+    return keep
+
+
+def build_erd_dot(
+    catalog: SchemaCatalog,
+    max_columns_per_table: int = 12,
+    include_columns: bool = True,
+    focus: Optional[str] = None,
+    depth: int = 1,
+    top_n: Optional[int] = None,
+) -> str:
+    """Build a Graphviz DOT ERD with basic aesthetics and heuristic links.
+
+    If SQLite tables do not declare foreign keys, we infer edges using common
+    naming patterns like playerID/player_id -> player. ``focus``/``depth``
+    restrict the graph to one table's neighborhood and ``top_n`` keeps only the
+    most connected tables, for schemas too large to draw whole.
+    """
+    key = (catalog.fingerprint, max_columns_per_table, include_columns, focus, depth, top_n)
+    dot = _DOT_CACHE.get(key)
+    if dot is not None:
+        return dot
+
+    rels = infer_relationships(catalog)
+    tables = select_tables(catalog.table_names(), rels, focus=focus, depth=depth, top_n=top_n)
+    shown = set(tables)
+
+    lines: List[str] = [
+        "digraph ERD {",
+        "  rankdir=LR;",
+        "  bgcolor=white;",
+        NODE_WITH_COLUMNS if include_columns else NODE_NAMES_ONLY,
+        EDGE_STYLE,
+    ]
+
+    # Nodes with a limited list of columns
+    for t in tables:
+        safe_t = t.replace("-", "_")
+        if include_columns:
+            raw_cols = catalog.columns(t)
+            cols = raw_cols[:max_columns_per_table] if max_columns_per_table else raw_cols
+            field_lines = [f"<f{i}> {c.name}: {c.type}" for i, c in enumerate(cols)] or ["(no columns)"]
+            label = "{" + f"{t}|" + "|".join(field_lines) + "}"
+            lines.append(f'  {safe_t} [label="{label}"];')
+        else:
+            lines.append(f'  {safe_t} [label="{t}"];')
+
+    filtered = focus is not None or top_n is not None
+    for r in rels:
+        if filtered and (r.src not in shown or r.dst not in shown):
+            continue
+        safe_src = r.src.replace("-", "_")
+        safe_dst = r.dst.replace("-", "_")
+        lines.append(f'  {safe_src} -> {safe_dst} [label="{r.label}"];')
+
+    lines.append("}")
+    dot = "\n".join(lines)
+    _lru_put(_DOT_CACHE, key, dot)
+    return dot
+
+
+def render_erd_svg(dot: str) -> Optional[str]:
+    """Lay out DOT to SVG once per distinct graph; None if Graphviz is unavailable."""
+    key = hashlib.sha1(dot.encode()).hexdigest()
+    svg = _SVG_CACHE.get(key)
+    if svg is not None:
+        return svg
+    try:
+        import graphviz
+
+        svg = graphviz.Source(dot).pipe(format="svg").decode("utf-8")
+    except Exception:
+        # Missing Python package or `dot` binary: callers fall back to client-side layout
+        return None
+    _lru_put(_SVG_CACHE, key, svg)
+    return svg
@@ -0,0 +1,242 @@
+"""Stream a full query result to CSV, Parquet or Arrow IPC.
+
+    python -m src.db.export "SELECT * FROM batting" -o batting.parquet
+    python -m src.db.export "SELECT * FROM batting" -o batting.csv.gz --compression gzip
+
+Record batches from ``src.db.arrow`` go straight into a pyarrow writer, so
+memory stays at about one batch whatever the result size. The app writes
+to a named temp file on disk (in EXPORT_DIR) under EXPORT_BUDGET instead of
+the interactive budget, and only reads it back when the download is
+clicked. Streamlit holds a download in memory, so files above
+EXPORT_DOWNLOAD_MAX_BYTES are left on disk for the CLI instead. Sessions
+that end never delete their file, so each export first sweeps files older
+than EXPORT_MAX_AGE_SEC.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import os
+import tempfile
+import time
+from typing import BinaryIO, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.ipc as pa_ipc
+import pyarrow.parquet as pq
+
+from .arrow import ARROW_BATCH_SIZE, common_type, iter_record_batches
+from .governor import EXPORT_BUDGET, QueryBudget
+
+
+# Empty: the system temp directory
+EXPORT_DIR = os.getenv("EXPORT_DIR", "")
+EXPORT_DOWNLOAD_MAX_BYTES = int(os.getenv("EXPORT_DOWNLOAD_MAX_BYTES", str(200 * 1024 * 1024)))
+EXPORT_MAX_AGE_SEC = float(os.getenv("EXPORT_MAX_AGE_SEC", str(6 * 3600)))
+EXPORT_PREFIX = "sql-agent-export-"
+READ_CHUNK_BYTES = 1 << 20
+
+# First entry is the default compression for the format
+COMPRESSIONS: Dict[str, Tuple[Optional[str], ...]] = {
+    "csv": (None, "gzip"),
+    "parquet": ("zstd", "snappy", "gzip", None),
+    "arrow": ("lz4", "zstd", None),
+}
+MIME_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+
+class ExportStats(NamedTuple):
+    rows: int
+    bytes: int
+    seconds: float
+
+
+class ExportTooLargeError(Exception):
+    """An export file too large to hand to the browser from memory."""
+
+
+class _SchemaWidened(Exception):
+    def __init__(self, types: List[pa.DataType]):
+        super().__init__("column types widened mid-stream")
+        self.types = types
+
+
+def export_filename(fmt: str, compression: Optional[str] = None, stem: str = "results") -> str:
+    suffix = ".gz" if fmt == "csv" and compression == "gzip" else ""
+    return f"{stem}.{fmt}{suffix}"
+
+
+class _CsvWriter:
+    """pyarrow's CSV writer, optionally gzipped, leaving the sink open."""
+
+    def __init__(self, sink: BinaryIO, schema: pa.Schema, compression: Optional[str]):
+        self._gzip = gzip.GzipFile(fileobj=sink, mode="wb", compresslevel=6) if compression == "gzip" else None
+        self._writer = pa_csv.CSVWriter(pa.PythonFile(self._gzip or sink, mode="w"), schema)
+
+    def write_batch(self, batch: pa.RecordBatch) -> None:
+        self._writer.write_batch(batch)
+
+    def close(self) -> None:
+        self._writer.close()
+        if self._gzip is not None:
+            self._gzip.close()
+
+
+def _open_writer(sink: BinaryIO, fmt: str, schema: pa.Schema, compression: Optional[str]):
+    if fmt == "csv":
+        return _CsvWriter(sink, schema, compression)
+    if fmt == "parquet":
+        return pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression=compression or "none")
+    options = pa_ipc.IpcWriteOptions(compression=compression)
+    return pa_ipc.new_file(pa.PythonFile(sink, mode="w"), schema, options=options)
+
+
+def _write(
+    sql: str,
+    sink: BinaryIO,
+    fmt: str,
+    compression: Optional[str],
+    budget: QueryBudget,
+    batch_size: int,
+    types: Optional[Sequence[pa.DataType]],
+) -> int:
+    writer = None
+    schema: Optional[pa.Schema] = None
+    rows = 0
+    batches = iter_record_batches(sql, batch_size, budget, types=types)
+    try:
+        for batch in batches:
+            if schema is None:
+                schema = batch.schema
+                writer = _open_writer(sink, fmt, schema, compression)
+            elif batch.schema != schema:
+                widest = [common_type(f.type, b.type) for f, b in zip(schema, batch.schema)]
+                if widest != schema.types:
+                    raise _SchemaWidened(widest)
+                batch = pa.RecordBatch.from_arrays([c.cast(t) for c, t in zip(batch.columns, widest)], schema=schema)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        batches.close()
+        # Also on errors: a writer flushing later would land after the caller truncates
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def write_export(
+    sql: str,
+    sink: BinaryIO,
+    fmt: str = "csv",
+    compression: Optional[str] = None,
+    budget: QueryBudget = EXPORT_BUDGET,
+    batch_size: int = ARROW_BATCH_SIZE,
+) -> ExportStats:
+    """Write the full result of sql to a seekable binary sink.
+
+    Writers need one schema up front, so a column whose values outgrow the
+    type of the first batch (SQLite does not enforce declared types) makes
+    the export start over with the widened types.
+    """
+    if fmt not in COMPRESSIONS:
+        raise ValueError(f"unknown export format {fmt!r}; expected one of {', '.join(COMPRESSIONS)}")
+    if compression not in COMPRESSIONS[fmt]:
+        raise ValueError(f"{fmt} export supports compression {COMPRESSIONS[fmt]}, not {compression!r}")
+    start = time.perf_counter()
+    origin = sink.tell()
+    types: Optional[List[pa.DataType]] = None
+    while True:
+        try:
+            rows = _write(sql, sink, fmt, compression, budget, batch_size, types)
+            break
+        except _SchemaWidened as e:
+            types = e.types
+            sink.seek(origin)
+            sink.truncate()
+    return ExportStats(rows, sink.tell() - origin, time.perf_counter() - start)
+
+
+def sweep_exports(directory: Optional[str] = None, max_age_sec: float = EXPORT_MAX_AGE_SEC) -> List[str]:
+    """Delete export files last written more than max_age_sec ago; returns their paths."""
+    cutoff = time.time() - max_age_sec
+    removed: List[str] = []
+    try:
+        entries = os.scandir(directory or EXPORT_DIR or tempfile.gettempdir())
+    except OSError:
+        return removed
+    with entries:
+        for entry in entries:
+            if not entry.name.startswith(EXPORT_PREFIX):
+                continue
+            try:
+                if entry.is_file(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    removed.append(entry.path)
+            except OSError:
+                continue  # already gone, or not ours to delete
+    return removed
+
+
+def export_to_file(
+    sql: str,
+    fmt: str = "csv",
+    compression: Optional[str] = None,
+    budget: QueryBudget = EXPORT_BUDGET,
+    directory: Optional[str] = None,
+) -> Tuple[str, ExportStats]:
+    """Export into a new named temp file on disk; the caller deletes it, or a later sweep does."""
+    directory = directory or EXPORT_DIR or None
+    sweep_exports(directory)
+    suffix = export_filename(fmt, compression, stem="")
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix=EXPORT_PREFIX, dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            stats = write_export(sql, f, fmt, compression, budget)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, stats
+
+
+def read_export(path: str, max_bytes: int = EXPORT_DOWNLOAD_MAX_BYTES) -> bytes:
+    """The file at path, read in chunks; ExportTooLargeError past max_bytes."""
+    data = bytearray()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_BYTES), b""):
+            data += chunk
+            if len(data) > max_bytes:
+                raise ExportTooLargeError(f"Export is larger than {max_bytes / 2**20:.0f} MiB; use python -m src.db.export.")
+    return bytes(data)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sql")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--format", choices=list(COMPRESSIONS), help="default: from the output extension")
+    parser.add_argument("--compression", help="default: the format's first choice in COMPRESSIONS")
+    args = parser.parse_args()
+
+    name = args.output[:-3] if args.output.endswith(".gz") else args.output
+    fmt = args.format or {".csv": "csv", ".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}.get(
+        os.path.splitext(name)[1], "csv"
+    )
+    compression = args.compression
+    if compression is None:
+        compression = "gzip" if args.output.endswith(".gz") else COMPRESSIONS[fmt][0]
+    elif compression == "none":
+        compression = None
+    with open(args.output, "wb") as f:
+        stats = write_export(args.sql, f, fmt, compression)
+    rate = stats.rows / stats.seconds if stats.seconds else 0
+    print(f"{stats.rows:,} rows, {stats.bytes / 2**20:.1f} MiB in {stats.seconds:.2f}s ({rate:,.0f} rows/s) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
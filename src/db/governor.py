@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+
+class QueryBudgetExceeded(Exception):
+    """Base class for queries stopped by the resource governor."""
+
+
+class QueryTimeoutError(QueryBudgetExceeded):
+    pass
+
+
+class StepBudgetExceeded(QueryBudgetExceeded):
+    pass
+
+
+class RowBudgetExceeded(QueryBudgetExceeded):
+    pass
+
+
+class QueryCancelledError(QueryBudgetExceeded):
+    pass
+
+
+@dataclass(frozen=True)
+class QueryBudget:
+    """Per-query limits; None disables a limit.
+
+    max_steps counts SQLite VM instructions, so it bounds CPU work even when
+    the wall clock is generous (e.g. a cross join on a fast machine).
+    """
+
+    timeout_sec: Optional[float] = 5.0
+    max_steps: Optional[int] = None
+    max_rows: Optional[int] = None
+
+
+def _env_number(name: str, default: Optional[float], cast=float):
+    raw = os.getenv(name)
+    if raw is None or raw == "":
+        return default
+    return None if raw.lower() == "none" else cast(raw)
+
+
+# Budgets per caller: table previews, COUNT(*)-style probes and user/model queries
+PREVIEW_BUDGET = QueryBudget(timeout_sec=2.0, max_steps=10_000_000, max_rows=1_000)
+COUNT_BUDGET = QueryBudget(timeout_sec=5.0, max_steps=200_000_000, max_rows=1)
+USER_QUERY_BUDGET = QueryBudget(
+    timeout_sec=_env_number("QUERY_TIMEOUT_SEC", 30.0),
+    max_steps=_env_number("QUERY_MAX_STEPS", 500_000_000, int),
+    max_rows=_env_number("QUERY_MAX_ROWS", 100_000, int),
+)
+# Full-result exports (src.db.export) stream to disk, so they may run longer and return more
+EXPORT_BUDGET = QueryBudget(
+    timeout_sec=_env_number("EXPORT_TIMEOUT_SEC", 600.0),
+    max_steps=_env_number("EXPORT_MAX_STEPS", 20_000_000_000, int),
+    max_rows=_env_number("EXPORT_MAX_ROWS", 50_000_000, int),
+)
+
+# Athena queries (src.db.athena) queue and scan S3, so seconds-long runs are normal
+ATHENA_BUDGET = QueryBudget(
+    timeout_sec=_env_number("ATHENA_TIMEOUT_SEC", 300.0),
+    max_rows=_env_number("ATHENA_MAX_ROWS", 1_000_000, int),
+)
+
+# Background statistics passes (src.db.stats): one aggregate scan and one sample per table
+STATS_BUDGET = QueryBudget(
+    timeout_sec=_env_number("STATS_TIMEOUT_SEC", 120.0),
+    max_steps=_env_number("STATS_MAX_STEPS", 5_000_000_000, int),
+)
+
+
+class QueryGovernor:
+    """Enforce a QueryBudget on one connection via SQLite's progress handler.
+
+    Use as a context manager around execute/fetch. When a limit trips, the
+    handler aborts the running statement and the resulting
+    ``sqlite3.OperationalError: interrupted`` is re-raised as a typed
+    QueryBudgetExceeded subclass. ``cancel()`` may be called from another
+    thread and uses ``Connection.interrupt()``.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, budget: QueryBudget, check_every: int = 1_000):
+        self.conn = conn
+        self.budget = budget
+        self.check_every = check_every
+        self.steps = 0
+        self.rows = 0
+        self._started = 0.0
+        self._deadline: Optional[float] = None
+        self._tripped: Optional[QueryBudgetExceeded] = None
+        self._cancelled = False
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started
+
+    def _on_progress(self) -> int:
+        self.steps += self.check_every
+        if self._cancelled:
+            self._tripped = QueryCancelledError("Query was cancelled.")
+            return 1
+        max_steps = self.budget.max_steps
+        if max_steps is not None and self.steps > max_steps:
+            self._tripped = StepBudgetExceeded(
+                f"Query exceeded its step budget of {max_steps:,} VM steps."
+            )
+            return 1
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            self._tripped = QueryTimeoutError(
+                f"Query exceeded its time budget of {self.budget.timeout_sec:g}s."
+            )
+            return 1
+        return 0
+
+    def count_rows(self, n: int) -> None:
+        """Account for n more fetched rows; raise once over max_rows."""
+        self.rows += n
+        max_rows = self.budget.max_rows
+        if max_rows is not None and self.rows > max_rows:
+            raise RowBudgetExceeded(f"Query returned more than {max_rows:,} rows.")
+
+    def cancel(self) -> None:
+        self._cancelled = True
+        self.conn.interrupt()
+
+    def __enter__(self) -> "QueryGovernor":
+        self._started = time.monotonic()
+        if self.budget.timeout_sec is not None:
+            self._deadline = self._started + self.budget.timeout_sec
+        self.conn.set_progress_handler(self._on_progress, self.check_every)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.conn.set_progress_handler(None, 0)
+        if isinstance(exc, sqlite3.OperationalError):
+            if self._tripped is not None:
+                raise self._tripped from exc
+            if self._cancelled:
+                raise QueryCancelledError("Query was cancelled.") from exc
@@ -0,0 +1,391 @@
+"""Workload-driven index advisor.
+
+    python -m src.db.index_advisor                                  # recorded workload
+    python -m src.db.index_advisor --workload benchmarks/data/baseball_questions.json
+    python -m src.db.index_advisor --apply                          # create, ANALYZE, re-time
+
+Queries run from the app are appended to WORKLOAD_PATH with their timings.
+For every table a query scans (per its EXPLAIN QUERY PLAN), the columns it
+constrains are collected from the SQL: equality and join columns first, then
+one range column, then ORDER BY/GROUP BY columns. Those become composite
+index candidates, widened to covering indexes when the query touches few
+enough columns. The join keys the ERD infers add single-column candidates,
+so a fresh database gets its foreign-key-style columns indexed even before
+any workload exists.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.agent.sql_lexer import tokenize
+
+from . import sqlite as db
+from .catalog import SchemaCatalog
+from .erd import infer_relationships, join_columns
+from .governor import USER_QUERY_BUDGET, QueryBudgetExceeded
+from .plan_gate import explain, loop_steps, table_aliases
+from .pool import get_pool
+from .result_cache import normalize_sql
+
+
+WORKLOAD_PATH = os.getenv("INDEX_ADVISOR_WORKLOAD_PATH", os.path.abspath(".cache/workload.jsonl"))
+MAX_COVERING_COLUMNS = int(os.getenv("INDEX_ADVISOR_MAX_COVERING_COLUMNS", "5"))
+# Past this size the log is trimmed to its newest half, so it stays bounded
+WORKLOAD_MAX_BYTES = int(os.getenv("INDEX_ADVISOR_WORKLOAD_MAX_BYTES", str(4 * 1024 * 1024)))
+
+_CLAUSES = frozenset({"SELECT", "FROM", "JOIN", "ON", "WHERE", "GROUP", "ORDER", "HAVING", "LIMIT", "USING"})
+_EQ_OPS = frozenset({"=", "==", "IN", "IS"})
+_RANGE_OPS = frozenset({"<", ">", "<=", ">=", "BETWEEN", "LIKE", "GLOB"})
+
+
+class WorkloadEntry(NamedTuple):
+    sql: str
+    count: int
+    total_sec: float
+
+
+class Recommendation(NamedTuple):
+    table: str
+    columns: Tuple[str, ...]
+    covering: bool
+    reason: str  # "workload" or "join_key"
+    queries: int  # workload queries the index serves
+    weight_sec: float  # recorded time spent in those queries
+
+    @property
+    def name(self) -> str:
+        return "idx_" + "_".join([self.table] + list(self.columns)).lower()
+
+    @property
+    def sql(self) -> str:
+        cols = ", ".join(_quote(c) for c in self.columns)
+        return f"CREATE INDEX IF NOT EXISTS {_quote(self.name)} ON {_quote(self.table)} ({cols});"
+
+
+class ColumnUsage(NamedTuple):
+    eq: List[str]  # compared to a literal or parameter
+    join: List[str]  # compared to another column (ON a.x = b.y, USING)
+    range: List[str]
+    order: List[str]  # ORDER BY / GROUP BY
+    other: List[str]  # only read
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+_LOG_LOCK = threading.Lock()
+
+
+def record_query(sql: str, elapsed_sec: float, path: Optional[str] = None, max_bytes: Optional[int] = None) -> None:
+    """Append an executed query to the workload log (one JSON object per line).
+
+    Once the log grows past ``max_bytes`` (default WORKLOAD_MAX_BYTES) it is
+    rewritten with only its newest lines, up to half that size.
+    """
+    path = path or WORKLOAD_PATH
+    max_bytes = WORKLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    line = json.dumps({"sql": sql, "elapsed_sec": round(elapsed_sec, 6), "ts": time.time()})
+    with _LOG_LOCK:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "a") as f:
+            f.write(line + "\n")
+            size = f.tell()
+        if size > max_bytes:
+            _trim_log(path, max_bytes // 2)
+
+
+def _trim_log(path: str, keep_bytes: int) -> None:
+    with open(path, "rb") as f:
+        lines = f.readlines()
+    kept: List[bytes] = []
+    total = 0
+    for raw in reversed(lines):
+        if total + len(raw) > keep_bytes and kept:
+            break
+        kept.append(raw)
+        total += len(raw)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.writelines(reversed(kept))
+    os.replace(tmp, path)
+
+
+def load_workload(path: Optional[str] = None) -> List[WorkloadEntry]:
+    """Recorded queries grouped by normalized SQL, most time-consuming first.
+
+    Also reads a JSON list of SQL strings or of objects with ``sql`` or
+    ``gold_sql`` (e.g. the NL-to-SQL benchmark questions), counted once each.
+    """
+    path = path or WORKLOAD_PATH
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        items = [i if isinstance(i, dict) else {"sql": i} for i in json.loads(text)]
+    else:
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    grouped: Dict[str, WorkloadEntry] = {}
+    for item in items:
+        sql = item.get("sql") or item.get("gold_sql")
+        if not sql:
+            continue
+        key = normalize_sql(sql)
+        prev = grouped.get(key, WorkloadEntry(sql, 0, 0.0))
+        grouped[key] = WorkloadEntry(prev.sql, prev.count + 1, prev.total_sec + float(item.get("elapsed_sec", 0.0)))
+    return sorted(grouped.values(), key=lambda e: (-e.total_sec, -e.count, e.sql))
+
+
+def column_usage(sql: str, catalog: SchemaCatalog) -> Dict[str, ColumnUsage]:
+    """Per table, the columns sql constrains, sorts on or just reads.
+
+    Lexical, not a parser: a column is qualified (``alias.col``) or a bare name
+    that belongs to exactly one table in the query; its role comes from the
+    operator next to it and the clause it sits in.
+    """
+    aliases = table_aliases(sql, catalog.table_names())
+    tokens = tokenize(sql)
+    names = [t.text.strip('"`[]').lower() if t.kind in ("word", "qident") else None for t in tokens]
+    in_query = sorted({aliases[n] for n in names if n in aliases})
+    owners: Dict[str, List[str]] = {}
+    for table in in_query:
+        for c in catalog.columns(table):
+            owners.setdefault(c.name.lower(), []).append(table)
+    usage = {t: ColumnUsage([], [], [], [], []) for t in in_query}
+
+    clause = None
+    i = 0
+    while i < len(tokens):
+        tok, name = tokens[i], names[i]
+        if tok.kind == "word" and tok.text.upper() in _CLAUSES:
+            clause = tok.text.upper()
+            i += 1
+            continue
+        start = i
+        i += 1
+        if name is None:
+            continue
+        if i + 1 < len(tokens) and tokens[i].text == "." and names[i + 1] is not None:
+            refs = [(aliases.get(name), names[i + 1])]
+            i += 2
+        elif i < len(tokens) and tokens[i].text == "(":
+            continue  # a function call
+        elif clause == "USING":
+            refs = [(t, name) for t in owners.get(name, ())]  # USING (col) names it in both tables
+        elif len(owners.get(name, ())) == 1:
+            refs = [(owners[name][0], name)]
+        else:
+            continue
+        before = tokens[start - 1].text.upper() if start else ""
+        after = tokens[i].text.upper() if i < len(tokens) else ""
+        for table, column in refs:
+            info = catalog.table(table) if table else None
+            match = next((c.name for c in info.columns if c.name.lower() == column), None) if info else None
+            if match is None:
+                continue
+            u = usage[info.name]
+            filtering = clause in ("WHERE", "ON", "HAVING")
+            if clause == "USING":
+                bucket = u.join
+            elif filtering and (before in _EQ_OPS or after in _EQ_OPS):
+                other = tokens[start - 2] if before in _EQ_OPS and start >= 2 else tokens[min(i + 1, len(tokens) - 1)]
+                bucket = u.eq if other.kind in ("number", "string", "param") or other.text == "(" else u.join
+            elif filtering and (before in _RANGE_OPS or after in _RANGE_OPS):
+                bucket = u.range
+            elif clause in ("ORDER", "GROUP"):
+                bucket = u.order
+            else:
+                bucket = u.other
+            if match not in bucket:
+                bucket.append(match)
+    return usage
+
+
+def existing_indexes(conn: sqlite3.Connection) -> Dict[str, List[Tuple[str, ...]]]:
+    """Column lists of every index per table, rowid aliases included."""
+    indexes: Dict[str, Dict[str, List[str]]] = {}
+    rows = conn.execute(
+        "SELECT m.tbl_name, m.name, ii.name FROM sqlite_master AS m, pragma_index_info(m.name) AS ii "
+        "WHERE m.type = 'index' ORDER BY m.tbl_name, m.name, ii.seqno;"
+    )
+    for table, index, column in rows:
+        indexes.setdefault(table, {}).setdefault(index, []).append(column or "")
+    out = {t: [tuple(cols) for cols in by_name.values()] for t, by_name in indexes.items()}
+    for table, info in db.get_schema_catalog().tables.items():
+        pk = [c for c in info.columns if c.pk]
+        if len(pk) == 1 and pk[0].type.upper() == "INTEGER":
+            out.setdefault(table, []).append((pk[0].name,))
+    return out
+
+
+def _covered(columns: Sequence[str], indexes: Iterable[Tuple[str, ...]]) -> bool:
+    cols = tuple(c.lower() for c in columns)
+    return any(tuple(c.lower() for c in idx[: len(cols)]) == cols for idx in indexes)
+
+
+def _candidate(u: ColumnUsage) -> Optional[Tuple[Tuple[str, ...], bool]]:
+    """Index columns for one table's usage: equality, join, one range, then order."""
+    key = list(dict.fromkeys(u.eq + u.join))
+    if u.range:
+        key.append(u.range[0])
+    elif u.order:
+        key += [c for c in u.order if c not in key]
+    if not key:
+        return None
+    cover = key + [c for c in dict.fromkeys(u.range[1:] + u.order + u.other) if c not in key]
+    covering = len(key) < len(cover) <= MAX_COVERING_COLUMNS
+    return tuple(cover if covering else key), covering
+
+
+def fold_prefixes(found: Dict[Tuple[str, Tuple[str, ...]], Recommendation]) -> None:
+    """Fold each index into a wider one it is a prefix of, shortest first, in place."""
+    for key in sorted(found, key=lambda k: len(k[1])):
+        # Re-read: narrower candidates may already have been folded into this one
+        rec = found[key]
+        wider = [
+            other for other in found.values()
+            if other.table == rec.table and len(other.columns) > len(rec.columns)
+            and other.columns[: len(rec.columns)] == rec.columns
+        ]
+        if wider:
+            target = max(wider, key=lambda r: r.weight_sec)
+            found[(target.table, target.columns)] = target._replace(
+                queries=target.queries + rec.queries, weight_sec=target.weight_sec + rec.weight_sec
+            )
+            del found[key]
+
+
+def recommend(
+    workload: Sequence[WorkloadEntry], include_join_keys: bool = True, catalog: Optional[SchemaCatalog] = None
+) -> List[Recommendation]:
+    """Index recommendations for the workload, heaviest first."""
+    catalog = catalog or db.get_schema_catalog()
+    with db.get_conn() as conn:
+        indexes = existing_indexes(conn)
+    found: Dict[Tuple[str, Tuple[str, ...]], Recommendation] = {}
+
+    for entry in workload:
+        try:
+            steps = loop_steps(explain(entry.sql))
+        except sqlite3.Error:
+            continue
+        aliases = table_aliases(entry.sql, catalog.table_names())
+        # Full scans, and SEARCHes that needed an automatic (temporary) index
+        scanned = {
+            aliases.get(name.lower())
+            for verb, name, using in steps
+            if verb == "SCAN" or not using or using.startswith("AUTOMATIC")
+        }
+        usage = column_usage(entry.sql, catalog)
+        for table in sorted(t for t in scanned if t in usage):
+            cand = _candidate(usage[table])
+            if cand is None or _covered(cand[0], indexes.get(table, ())):
+                continue
+            prev = found.get((table, cand[0]))
+            queries = entry.count + (prev.queries if prev else 0)
+            weight = entry.total_sec + (prev.weight_sec if prev else 0.0)
+            found[(table, cand[0])] = Recommendation(table, cand[0], cand[1], "workload", queries, weight)
+
+    fold_prefixes(found)
+
+    if include_join_keys:
+        for rel in infer_relationships(catalog):
+            cols = join_columns(catalog, rel)
+            if cols is None:
+                continue
+            for table, column in ((rel.src, cols[0]), (rel.dst, cols[1])):
+                info = catalog.table(table)
+                if info is None or column not in {c.name for c in info.columns}:
+                    continue
+                if _covered((column,), indexes.get(table, ())) or any(
+                    r.table == table and r.columns[0].lower() == column.lower() for r in found.values()
+                ):
+                    continue
+                found[(table, (column,))] = Recommendation(table, (column,), False, "join_key", 0, 0.0)
+
+    return sorted(found.values(), key=lambda r: (-r.weight_sec, -r.queries, r.reason != "workload", r.table, r.columns))
+
+
+def apply_recommendations(recommendations: Sequence[Recommendation], path: Optional[str] = None) -> List[str]:
+    """Maintenance mode: create the indexes on a write connection, then ANALYZE."""
+    statements = [r.sql for r in recommendations] + ["ANALYZE;"]
+    conn = sqlite3.connect(path or db.DB_PATH, timeout=30)
+    try:
+        with conn:
+            for stmt in statements:
+                conn.execute(stmt)
+    finally:
+        conn.close()
+    # Pooled readers keep their parsed schema (and cached EXPLAIN statements)
+    # until they next read a table, so hand out fresh connections instead.
+    get_pool(path or db.DB_PATH).reset()
+    return statements
+
+
+def time_workload(workload: Sequence[WorkloadEntry], repeat: int = 3) -> Dict[str, Optional[float]]:
+    """Median seconds per query after one warm-up run; None when it fails or trips the budget."""
+    timings: Dict[str, Optional[float]] = {}
+    for entry in workload:
+        runs: List[float] = []
+        try:
+            db.execute_readonly(entry.sql, budget=USER_QUERY_BUDGET)
+            for _ in range(repeat):
+                start = time.perf_counter()
+                db.execute_readonly(entry.sql, budget=USER_QUERY_BUDGET)
+                runs.append(time.perf_counter() - start)
+        except (sqlite3.Error, QueryBudgetExceeded):
+            timings[entry.sql] = None
+            continue
+        timings[entry.sql] = statistics.median(runs)
+    return timings
+
+
+def _ms(sec: Optional[float]) -> str:
+    return f"{sec * 1000:>10.2f}" if sec is not None else f"{'error':>10}"
+
+
+def format_timings(before: Dict[str, Optional[float]], after: Dict[str, Optional[float]]) -> str:
+    lines = [f"{'before ms':>10} {'after ms':>10} {'speedup':>8}  query"]
+    for sql, b in before.items():
+        a = after.get(sql)
+        speedup = f"{b / a:>7.1f}x" if a and b else f"{'-':>8}"
+        lines.append(f"{_ms(b)} {_ms(a)} {speedup}  {' '.join(sql.split())[:70]}")
+    total_b = sum(v for v in before.values() if v)
+    total_a = sum(v for v in after.values() if v)
+    lines.append(f"{total_b * 1000:>10.2f} {total_a * 1000:>10.2f}  total")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workload", default=WORKLOAD_PATH, help="JSONL log or JSON list of queries")
+    parser.add_argument("--apply", action="store_true", help="create the indexes, ANALYZE, and re-time")
+    parser.add_argument("--no-join-keys", action="store_true", help="only recommend from the workload")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workload = load_workload(args.workload)
+    recs = recommend(workload, include_join_keys=not args.no_join_keys)
+    print(f"{len(workload)} distinct queries, {len(recs)} recommendations against {db.DB_PATH}")
+    for r in recs:
+        kind = "covering" if r.covering else r.reason
+        print(f"  {r.sql}  -- {kind}, {r.queries} queries, {r.weight_sec:.3f}s recorded")
+    if not args.apply or not recs:
+        return
+    before = time_workload(workload, args.repeat)
+    apply_recommendations(recs)
+    after = time_workload(workload, args.repeat)
+    print(format_timings(before, after))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""Server-side pagination over an approved SELECT.
+
+The statement is wrapped, never re-run whole per page:
+
+- ``rowid``: a plain single-table SELECT gets ``rowid`` injected into its
+  select list and pages with ``rowid > ?`` (or after its ORDER BY columns,
+  rowid breaking ties), which SQLite turns into an index or rowid seek.
+- ``keyset``: a GROUP BY query ordered by output columns pages after the
+  last row's ORDER BY + GROUP BY values, which are unique per group.
+- ``offset``: anything else (joins, DISTINCT, compound selects, a LIMIT of
+  its own, ORDER BY on expressions) falls back to LIMIT/OFFSET.
+
+A Paginator caches pages, prefetches the next one on a background thread
+and counts the total rows asynchronously. Jumping to a page whose start key
+is not known yet uses OFFSET once, with the same ordering, and records the
+key from there on.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.agent.sql_lexer import Token, analyze, tokenize
+
+from . import sqlite as db
+from .governor import USER_QUERY_BUDGET, QueryBudget, QueryGovernor
+from .pool import get_pool
+
+
+PAGE_SIZE = int(os.getenv("PAGINATOR_PAGE_SIZE", "50"))
+CACHED_PAGES = int(os.getenv("PAGINATOR_CACHED_PAGES", "20"))
+# Shared by every session: page prefetches and COUNT(*) queries
+_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("PAGINATOR_WORKERS", "2")), thread_name_prefix="paginator")
+
+ROWID_KEY = "__page_rowid"
+COUNT_BUDGET = QueryBudget(timeout_sec=USER_QUERY_BUDGET.timeout_sec, max_steps=USER_QUERY_BUDGET.max_steps)
+
+_AGGREGATES = frozenset({"COUNT", "SUM", "AVG", "MIN", "MAX", "TOTAL", "GROUP_CONCAT", "STRING_AGG"})
+# Top-level keywords that rule out the rowid strategy
+_NOT_SIMPLE = frozenset({"JOIN", "GROUP", "HAVING", "DISTINCT", "UNION", "INTERSECT", "EXCEPT", "WINDOW", "OVER", "VALUES", "LIMIT"})
+_NOT_KEYSET = frozenset({"UNION", "INTERSECT", "EXCEPT", "WINDOW", "OVER", "DISTINCT", "LIMIT", "VALUES"})
+
+
+class SortKey(NamedTuple):
+    column: str  # output column name
+    descending: bool
+
+
+class PagePlan(NamedTuple):
+    strategy: str  # rowid | keyset | offset
+    inner: str  # the statement to wrap, ORDER BY removed for rowid/keyset
+    keys: Tuple[SortKey, ...]
+    hidden: int  # leading injected columns to strip from every row
+
+
+class Page(NamedTuple):
+    number: int  # 0-based
+    columns: List[str]
+    rows: List[Tuple]
+    has_next: bool
+
+
+def _unquote(tok: Token) -> str:
+    return tok.text[1:-1] if tok.kind == "qident" else tok.text
+
+
+def _split_terms(tokens: Sequence[Token]) -> List[List[Token]]:
+    terms: List[List[Token]] = [[]]
+    for tok in tokens:
+        if tok.text == "," and tok.depth == 0:
+            terms.append([])
+        else:
+            terms[-1].append(tok)
+    return terms
+
+
+def _column_ref(term: Sequence[Token], columns: Sequence[str]) -> Optional[str]:
+    """Output column a bare ``[qualifier.]name`` or ordinal term refers to, if unambiguous."""
+    if len(term) == 1 and term[0].kind == "number" and term[0].text.isdigit():
+        i = int(term[0].text)
+        return columns[i - 1] if 0 < i <= len(columns) else None
+    if len(term) == 3 and term[1].text == ".":
+        term = term[2:]
+    if len(term) != 1 or term[0].kind not in ("word", "qident"):
+        return None
+    matches = [c for c in columns if c.lower() == _unquote(term[0]).lower()]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _sort_keys(terms: Sequence[Sequence[Token]], columns: Sequence[str]) -> Optional[List[SortKey]]:
+    keys: List[SortKey] = []
+    for term in terms:
+        descending = False
+        if term and term[-1].kind == "word" and term[-1].text.upper() in ("ASC", "DESC"):
+            descending = term[-1].text.upper() == "DESC"
+            term = term[:-1]
+        column = _column_ref(term, columns)
+        if column is None:
+            return None  # expression, COLLATE, NULLS FIRST/LAST, unknown name
+        keys.append(SortKey(column, descending))
+    return keys
+
+
+def plan_pagination(sql: str, columns: Sequence[str]) -> PagePlan:
+    """Choose a strategy for sql given its output column names."""
+    stmt = sql[: analyze(sql).end]
+    tokens = tokenize(stmt)
+    top = [t for t in tokens if t.depth == 0]
+    words = {t.text.upper() for t in top if t.kind == "word"}
+    offset = PagePlan("offset", stmt, (), 0)
+    if not top or top[0].text.upper() != "SELECT" or words & _NOT_KEYSET:
+        return offset
+
+    clause_at = {t.text.upper(): i for i, t in enumerate(top) if t.kind == "word" and t.text.upper() in ("FROM", "WHERE", "GROUP", "HAVING", "ORDER")}
+    order_at = clause_at.get("ORDER")
+    order_terms = _split_terms(top[order_at + 2 :]) if order_at is not None else []
+    order_keys = _sort_keys(order_terms, columns) if order_terms else []
+    if order_keys is None:
+        return offset
+    inner = stmt[: top[order_at].start].rstrip() if order_at is not None else stmt
+
+    if "GROUP" in words:
+        group_at = clause_at["GROUP"]
+        group_end = min([clause_at[c] for c in ("HAVING", "ORDER") if clause_at.get(c, -1) > group_at] or [len(top)])
+        group_keys = _sort_keys(_split_terms(top[group_at + 2 : group_end]), columns)
+        if group_keys is None:
+            return offset
+        keys = list(order_keys)
+        keys += [k for k in group_keys if k.column not in {o.column for o in keys}]
+        return PagePlan("keyset", inner, tuple(keys), 0)
+
+    from_at = clause_at.get("FROM")
+    if from_at is None or words & _NOT_SIMPLE:
+        return offset
+    from_end = min([clause_at[c] for c in ("WHERE", "ORDER") if clause_at.get(c, -1) > from_at] or [len(top)])
+    source = top[from_at + 1 : from_end]
+    select_list = top[1:from_at]
+    aggregate = any(
+        t.kind == "word" and t.text.upper() in _AGGREGATES and i + 1 < len(select_list) and select_list[i + 1].text == "("
+        for i, t in enumerate(select_list)
+    )
+    # One named table, optionally aliased: no subquery, comma join or table function
+    if aggregate or not source or source[0].kind not in ("word", "qident") or len(source) > 3 or any(t.kind == "op" for t in source):
+        return offset
+    select = top[0]
+    inner = f'{inner[: select.end]} rowid AS "{ROWID_KEY}",{inner[select.end :]}'
+    return PagePlan("rowid", inner, tuple(order_keys) + (SortKey(ROWID_KEY, False),), 1)
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def keyset_predicate(keys: Sequence[SortKey], after: Sequence) -> Tuple[str, List]:
+    """WHERE clause selecting rows that sort after the key values ``after``.
+
+    SQLite sorts NULL first ascending (last descending), so comparisons are
+    spelled out NULL-aware. The expanded form is ``k1 > a OR (k1 IS a AND
+    k2 > b) ...``; a redundant bound on the leading key (``k1 >= a`` when
+    ascending and a is not NULL) lets the planner seek an index on it.
+    """
+    ors: List[str] = []
+    params: List = []
+    for i, (key, value) in enumerate(zip(keys, after)):
+        col = _quote(key.column)
+        ands = [f"{_quote(k.column)} IS ?" for k in keys[:i]]
+        part_params = list(after[:i])
+        if value is None:
+            if key.descending:
+                continue  # nothing sorts after NULL when descending
+            ands.append(f"{col} IS NOT NULL")
+        elif key.descending:
+            ands.append(f"({col} < ? OR {col} IS NULL)")
+            part_params.append(value)
+        else:
+            ands.append(f"{col} > ?")
+            part_params.append(value)
+        ors.append("(" + " AND ".join(ands) + ")")
+        params.extend(part_params)
+    if not ors:
+        return "0", []
+    where = " OR ".join(ors)
+    first, value = keys[0], after[0]
+    if value is not None:
+        col = _quote(first.column)
+        bound = f"({col} <= ? OR {col} IS NULL)" if first.descending else f"{col} >= ?"
+        where = f"{bound} AND ({where})"
+        params.insert(0, value)
+    return where, params
+
+
+def page_query(plan: PagePlan, limit: int, after: Optional[Sequence] = None, offset: int = 0) -> Tuple[str, List]:
+    """SQL and parameters for one page: keyset when ``after`` is given, else OFFSET."""
+    sql = f"SELECT * FROM ({plan.inner}) AS _page"
+    params: List = []
+    if after is not None:
+        where, params = keyset_predicate(plan.keys, after)
+        sql += f" WHERE {where}"
+    if plan.keys:
+        sql += " ORDER BY " + ", ".join(_quote(k.column) + (" DESC" if k.descending else "") for k in plan.keys)
+    sql += f" LIMIT {int(limit)}"
+    if after is None and offset:
+        sql += f" OFFSET {int(offset)}"
+    return sql, params
+
+
+def _execute(sql: str, params: Sequence, budget: QueryBudget) -> Tuple[List[str], List[Tuple]]:
+    with db.get_conn() as conn, QueryGovernor(conn, budget) as governor:
+        cursor = conn.execute(sql, list(params))
+        columns = [d[0] for d in cursor.description]
+        rows = cursor.fetchall()
+        governor.count_rows(len(rows))
+    return columns, rows
+
+
+class Paginator:
+    """Pages of one approved statement; safe to keep in Streamlit session state."""
+
+    def __init__(self, sql: str, page_size: int = PAGE_SIZE, budget: QueryBudget = USER_QUERY_BUDGET, prefetch: bool = True):
+        self.sql = sql
+        self.page_size = page_size
+        self.budget = budget
+        self.prefetch = prefetch
+        self.path = db.DB_PATH
+        stmt = sql[: analyze(sql).end]
+        self.columns, _ = _execute(f"SELECT * FROM ({stmt}) LIMIT 0", (), budget)
+        self.plan = plan_pagination(stmt, self.columns)
+        if self.plan.strategy != "offset":
+            try:
+                _execute(page_query(self.plan, 0)[0], (), budget)
+            except sqlite3.Error:
+                # e.g. a view or WITHOUT ROWID table has no rowid to page by
+                self.plan = PagePlan("offset", stmt, (), 0)
+        self._lock = threading.Lock()
+        self._pages: "OrderedDict[int, Page]" = OrderedDict()
+        self._pending: Dict[int, Future] = {}
+        self._starts: Dict[int, Tuple] = {}  # page number -> key of the previous page's last row
+        self._version = self._data_version()
+        self._total: Optional[Future] = None
+
+    @property
+    def strategy(self) -> str:
+        return self.plan.strategy
+
+    def _data_version(self) -> Tuple[int, int]:
+        return get_pool(self.path).data_version()
+
+    def _check_version(self) -> None:
+        version = self._data_version()
+        if version != self._version:
+            with self._lock:
+                self._pages.clear()
+                self._pending.clear()
+                self._starts.clear()
+                self._total = None
+                self._version = version
+
+    def _fetch(self, number: int) -> Page:
+        # Without a known start key this is OFFSET, still in keyset order
+        after = self._starts.get(number)
+        sql, params = page_query(self.plan, self.page_size + 1, after, 0 if after is not None else number * self.page_size)
+        columns, rows = _execute(sql, params, self.budget)
+        has_next = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if has_next and self.plan.keys:
+            idx = [columns.index(k.column) for k in self.plan.keys]
+            last = rows[-1]
+            with self._lock:
+                self._starts[number + 1] = tuple(last[i] for i in idx)
+        if self.plan.hidden:
+            columns = columns[self.plan.hidden :]
+            rows = [r[self.plan.hidden :] for r in rows]
+        return Page(number, columns, rows, has_next)
+
+    def _store(self, page: Page, version: Optional[Tuple[int, int]] = None) -> None:
+        with self._lock:
+            self._pending.pop(page.number, None)
+            if version is not None and version != self._version:
+                return  # fetched before the data changed
+            self._pages[page.number] = page
+            self._pages.move_to_end(page.number)
+            while len(self._pages) > CACHED_PAGES:
+                self._pages.popitem(last=False)
+
+    def _prefetch(self, number: int) -> None:
+        with self._lock:
+            if number in self._pages or number in self._pending:
+                return
+            version = self._version
+            future = _EXECUTOR.submit(self._fetch, number)
+            self._pending[number] = future
+
+        def done(f: Future) -> None:
+            if f.exception() is None:
+                self._store(f.result(), version)
+            else:
+                with self._lock:
+                    self._pending.pop(number, None)
+
+        future.add_done_callback(done)
+
+    def page(self, number: int) -> Page:
+        """Page ``number`` (0-based): from cache, a finished prefetch, or a fresh query."""
+        self._check_version()
+        with self._lock:
+            page = self._pages.get(number)
+            pending = self._pending.get(number)
+            if page is not None:
+                self._pages.move_to_end(number)
+        if page is None:
+            page = pending.result() if pending is not None else self._fetch(number)
+            self._store(page)
+        if self.prefetch and page.has_next:
+            self._prefetch(number + 1)
+        return page
+
+    def total(self, wait: bool = False) -> Optional[int]:
+        """Total row count, counted on a background thread; None until known (or on error)."""
+        with self._lock:
+            if self._total is None:
+                count_sql = f"SELECT COUNT(*) FROM ({self.sql[: analyze(self.sql).end]})"
+                self._total = _EXECUTOR.submit(_execute, count_sql, (), COUNT_BUDGET)
+            future = self._total
+        if not wait and not future.done():
+            return None
+        try:
+            return future.result()[1][0][0]
+        except Exception:
+            return None
+
+    def page_count(self) -> Optional[int]:
+        total = self.total()
+        return None if total is None else max(1, -(-total // self.page_size))
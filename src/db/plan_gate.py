@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.agent.sql_lexer import analyze, rewrite_limit, tokenize
+
+from . import sqlite as db
+from .governor import COUNT_BUDGET, QueryBudget, QueryBudgetExceeded
+from .pool import get_pool
+from .stats import get_stats
+
+
+POLICIES = ("off", "warn", "limit", "reject")
+PLAN_GATE_POLICY = os.getenv("PLAN_GATE_POLICY", "warn")
+LARGE_TABLE_ROWS = int(os.getenv("PLAN_LARGE_TABLE_ROWS", "100000"))
+LARGE_SORT_ROWS = int(os.getenv("PLAN_LARGE_SORT_ROWS", "100000"))
+MAX_PLAN_COST = float(os.getenv("PLAN_MAX_COST", "50000000"))
+GATE_LIMIT = int(os.getenv("PLAN_GATE_LIMIT", "1000"))
+
+# Rough fraction of a table an index lookup returns, by constraint shape
+EQ_SELECTIVITY = 0.01
+RANGE_SELECTIVITY = 0.25
+
+_LOOP_RE = re.compile(r"^(SCAN|SEARCH) (\S+)(?: USING (.*))?$")
+
+
+class PlanNode(NamedTuple):
+    id: int
+    parent: int
+    detail: str
+    children: List["PlanNode"]
+
+
+# Issues that trigger the limit/reject policies; the rest only warn
+SEVERE_ISSUES = frozenset({"nested_scan", "high_cost"})
+
+
+class PlanIssue(NamedTuple):
+    kind: str  # "full_scan", "nested_scan", "large_sort" or "high_cost"
+    table: Optional[str]
+    message: str
+
+
+class PlanEstimate(NamedTuple):
+    plan: List[PlanNode]
+    rows: float  # estimated result rows before LIMIT
+    cost: float  # estimated rows touched, sorts weighted n log n
+    issues: List[PlanIssue]
+
+
+class GateDecision(NamedTuple):
+    action: str  # "allow", "warn", "limit" or "reject"
+    sql: str  # the SQL to run: the input, or LIMIT-bounded under the limit policy
+    estimate: Optional[PlanEstimate]
+    message: Optional[str]
+
+    @property
+    def allowed(self) -> bool:
+        return self.action != "reject"
+
+
+def parse_plan(rows: Iterable[Tuple]) -> List[PlanNode]:
+    """Turn ``EXPLAIN QUERY PLAN`` rows (id, parent, notused, detail) into a tree."""
+    nodes: Dict[int, PlanNode] = {}
+    roots: List[PlanNode] = []
+    for row in rows:
+        node = PlanNode(row[0], row[1], row[3], [])
+        nodes[node.id] = node
+        parent = nodes.get(node.parent)
+        (parent.children if parent is not None else roots).append(node)
+    return roots
+
+
+def explain(sql: str) -> List[PlanNode]:
+    with db.get_conn() as conn:
+        return parse_plan(conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall())
+
+
+def format_plan(plan: Sequence[PlanNode], indent: int = 0) -> str:
+    """Indented text tree, as the sqlite3 shell prints it."""
+    lines: List[str] = []
+    for node in plan:
+        lines.append("   " * indent + ("|--" if indent else "") + node.detail)
+        if node.children:
+            lines.append(format_plan(node.children, indent + 1))
+    return "\n".join(lines)
+
+
+# Words that can follow a table name in FROM without being its alias
+_NOT_ALIAS = frozenset(
+    "ON USING WHERE JOIN INNER LEFT RIGHT FULL OUTER CROSS NATURAL GROUP ORDER LIMIT "
+    "UNION EXCEPT INTERSECT HAVING WINDOW INDEXED NOT".split()
+)
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _name(text: str) -> str:
+    return text.strip('"`[]').lower()
+
+
+def table_aliases(sql: str, tables: Iterable[str]) -> Dict[str, str]:
+    """Map the names a plan may print (aliases included) to catalog table names."""
+    known = {t.lower(): t for t in tables}
+    aliases: Dict[str, str] = dict(known)
+    tokens = tokenize(sql)
+    for i, tok in enumerate(tokens[:-1]):
+        table = known.get(_name(tok.text)) if tok.kind in ("word", "qident") else None
+        if table is None:
+            continue
+        nxt = tokens[i + 1]
+        if nxt.text.upper() == "AS" and i + 2 < len(tokens):
+            nxt = tokens[i + 2]
+        if nxt.kind == "qident" or nxt.kind == "word" and nxt.text.upper() not in _NOT_ALIAS:
+            aliases.setdefault(_name(nxt.text), table)
+    return aliases
+
+
+_CARDINALITIES: Dict[str, Tuple[Tuple, Dict[str, Optional[int]]]] = {}
+_CARD_LOCK = threading.Lock()
+
+
+def table_cardinalities(tables: Iterable[str]) -> Dict[str, Optional[int]]:
+    """Row counts for tables, from sqlite_stat1 when ANALYZE has run, then the
+    statistics service (``src.db.stats``), else COUNT(*).
+
+    Counts are cached until the schema or data changes. A table whose count
+    exceeds COUNT_BUDGET maps to None (treated as large).
+    """
+    path = db.DB_PATH
+    catalog = db.get_schema_catalog()
+    version = (catalog.schema_version, get_pool(path).data_version())
+    with _CARD_LOCK:
+        cached = _CARDINALITIES.get(path)
+        if cached is None or cached[0] != version:
+            cached = (version, {})
+            _CARDINALITIES[path] = cached
+        counts = cached[1]
+    missing = [t for t in tables if t not in counts]
+    if not missing:
+        return counts
+    if catalog.table("sqlite_stat1") is not None:
+        # Every row of a table starts its stat with the table's row count
+        _, rows = db.execute_readonly("SELECT tbl, stat FROM sqlite_stat1 GROUP BY tbl;", budget=QueryBudget(timeout_sec=2.0))
+        for tbl, stat in rows:
+            if tbl in missing and stat:
+                counts[tbl] = int(str(stat).split()[0])
+    # Possibly a refresh behind the data; close enough for a cost estimate
+    known = get_stats(path).row_counts()
+    for t in missing:
+        if t in counts:
+            continue
+        if t in known:
+            counts[t] = known[t]
+            continue
+        try:
+            counts[t] = int(db.execute_readonly(f"SELECT COUNT(*) FROM {_quote(t)};", budget=COUNT_BUDGET)[1][0][0])
+        except QueryBudgetExceeded:
+            counts[t] = None
+    return counts
+
+
+class _Context:
+    def __init__(self, aliases: Dict[str, str], counts: Dict[str, Optional[int]]):
+        self.aliases = aliases
+        self.counts = counts
+        self.subqueries: Dict[str, float] = {}  # materialized CTE/subquery name -> rows
+        self.issues: List[PlanIssue] = []
+
+    def rows_of(self, name: str) -> Tuple[Optional[str], float]:
+        key = name.lower()
+        if key in self.subqueries:
+            return None, self.subqueries[key]
+        table = self.aliases.get(key)
+        if table is None:
+            return None, 1.0  # an unknown source, e.g. a table-valued function
+        n = self.counts.get(table)
+        return table, float(LARGE_TABLE_ROWS if n is None else n)
+
+
+def _lookup_rows(using: str, n: float) -> float:
+    """Rows one index lookup returns, from the constraint text in the plan."""
+    if "PRIMARY KEY" in using or "sqlite_autoindex" in using or "rowid=" in using:
+        if "<" not in using and ">" not in using:
+            return 1.0
+    if "<" in using or ">" in using:
+        return max(1.0, n * RANGE_SELECTIVITY)
+    return max(1.0, n * EQ_SELECTIVITY)
+
+
+def _estimate(nodes: Sequence[PlanNode], ctx: _Context) -> Tuple[float, float]:
+    """(rows, cost) of one query level; sibling SCAN/SEARCH steps are nested loops."""
+    rows = 1.0
+    cost = 0.0
+    loops = 0
+    for node in nodes:
+        detail = node.detail
+        loop = _LOOP_RE.match(detail)
+        if loop is not None:
+            verb, name, using = loop.group(1), loop.group(2), loop.group(3) or ""
+            if name == "CONSTANT":
+                continue  # SCAN CONSTANT ROW
+            table, n = ctx.rows_of(name)
+            if verb == "SCAN":
+                step_rows, step_cost = n, n
+                if table is not None and n >= LARGE_TABLE_ROWS:
+                    how = "index " if "INDEX" in using else ""
+                    ctx.issues.append(
+                        PlanIssue("full_scan", table or name, f"Full {how}scan of {table or name} (~{n:,.0f} rows).")
+                    )
+                if loops and rows > 1:
+                    ctx.issues.append(
+                        PlanIssue(
+                            "nested_scan",
+                            table or name,
+                            f"Scan of {table or name} runs once per outer row (~{rows:,.0f} times): "
+                            "a cartesian-style join with no usable index.",
+                        )
+                    )
+            else:
+                step_rows = _lookup_rows(using, n)
+                step_cost = math.log2(n + 1) + step_rows
+            cost += rows * step_cost
+            rows *= step_rows
+            loops += 1
+        elif detail.startswith("USE TEMP B-TREE"):
+            cost += rows * math.log2(rows + 1)
+            if rows >= LARGE_SORT_ROWS:
+                what = detail[len("USE TEMP B-TREE FOR "):] or "sorting"
+                ctx.issues.append(PlanIssue("large_sort", None, f"Temp B-tree for {what} over ~{rows:,.0f} rows."))
+        elif detail.startswith(("MATERIALIZE ", "CO-ROUTINE ")):
+            sub_rows, sub_cost = _estimate(node.children, ctx)
+            ctx.subqueries[detail.split(" ", 1)[1].lower()] = sub_rows
+            cost += sub_cost
+        elif detail == "COMPOUND QUERY":
+            total = 0.0
+            for part in node.children:
+                part_rows, part_cost = _estimate(part.children, ctx)
+                total += part_rows
+                cost += part_cost
+                if "TEMP B-TREE" in part.detail:
+                    cost += total * math.log2(total + 1)
+            rows = total
+        else:
+            # Subqueries and the like; a correlated one reruns per outer row
+            sub_rows, sub_cost = _estimate(node.children, ctx)
+            cost += sub_cost * (rows if detail.startswith("CORRELATED") else 1.0)
+    return rows, cost
+
+
+def estimate_plan(
+    plan: List[PlanNode],
+    aliases: Dict[str, str],
+    counts: Dict[str, Optional[int]],
+    limit: Optional[int] = None,
+    streaming: bool = False,
+) -> PlanEstimate:
+    """Score a parsed plan against table cardinalities (a rough rows-touched model).
+
+    A ``streaming`` query (no sort, grouping, DISTINCT or aggregate) stops
+    after ``limit`` rows, so its cost is scaled down accordingly and its scans
+    are not flagged. WHERE filters are not modelled, which makes that scaling
+    optimistic for selective filters; the governor still bounds the run.
+    """
+    ctx = _Context(aliases, counts)
+    rows, cost = _estimate(plan, ctx)
+    issues = ctx.issues
+    if streaming and limit is not None and rows > limit:
+        cost *= limit / rows
+        issues = [i for i in issues if i.kind not in ("full_scan", "nested_scan")]
+    if cost > MAX_PLAN_COST:
+        issues.append(PlanIssue("high_cost", None, f"Estimated cost {cost:,.0f} exceeds {MAX_PLAN_COST:,.0f}."))
+    return PlanEstimate(plan, rows, cost, list(dict.fromkeys(issues)))
+
+
+_AGGREGATES = frozenset({"COUNT", "SUM", "AVG", "MIN", "MAX", "TOTAL", "GROUP_CONCAT"})
+
+
+def _is_streaming(sql: str, plan: Sequence[PlanNode]) -> bool:
+    """True when rows can be returned as they are found, so a LIMIT stops the work early."""
+    if any("TEMP B-TREE" in detail or detail.startswith("MATERIALIZE") for detail in _details(plan)):
+        return False
+    tokens = [t for t in tokenize(sql) if t.depth == 0]
+    for tok, nxt in zip(tokens, tokens[1:]):
+        word = tok.text.upper()
+        if word in ("GROUP", "DISTINCT") or word in _AGGREGATES and nxt.text == "(":
+            return False
+    return True
+
+
+def _details(plan: Sequence[PlanNode]) -> List[str]:
+    out: List[str] = []
+    for node in plan:
+        out.append(node.detail)
+        out.extend(_details(node.children))
+    return out
+
+
+def loop_steps(plan: Sequence[PlanNode]) -> List[Tuple[str, str, str]]:
+    """(verb, name, using) of every SCAN/SEARCH step in the plan, depth first."""
+    steps = []
+    for detail in _details(plan):
+        loop = _LOOP_RE.match(detail)
+        if loop is not None and loop.group(2) != "CONSTANT":
+            steps.append((loop.group(1), loop.group(2), loop.group(3) or ""))
+    return steps
+
+
+def estimate_query(sql: str) -> PlanEstimate:
+    plan = explain(sql)
+    aliases = table_aliases(sql, db.get_schema_catalog().table_names())
+    names = {name.lower() for _, name, _ in loop_steps(plan)}
+    counts = table_cardinalities(sorted({aliases[n] for n in names if n in aliases}))
+    count = analyze(sql).limit_count
+    return estimate_plan(plan, aliases, counts, count[2] if count else None, _is_streaming(sql, plan))
+
+
+def check_plan(sql: str, policy: str = PLAN_GATE_POLICY, limit: int = GATE_LIMIT) -> GateDecision:
+    """Pre-flight a query with EXPLAIN QUERY PLAN and apply the gate policy.
+
+    Any issue produces a warning. Under ``limit`` and ``reject`` a severe one
+    (a nested scan or a cost over MAX_PLAN_COST) either bounds the result to
+    ``limit`` rows or refuses the query. A LIMIT only helps a streaming plan:
+    sorts and aggregates read their full input first, so ``limit`` rejects
+    those too. A query that cannot be planned is rejected under ``reject``
+    and reported otherwise.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown plan gate policy {policy!r}; expected one of {POLICIES}.")
+    if policy == "off":
+        return GateDecision("allow", sql, None, None)
+    try:
+        estimate = estimate_query(sql)
+    except sqlite3.Error as e:
+        return GateDecision("reject" if policy == "reject" else "warn", sql, None, f"Could not plan query: {e}")
+    if not estimate.issues:
+        return GateDecision("allow", sql, estimate, None)
+    message = " ".join(issue.message for issue in estimate.issues)
+    if policy == "warn" or not any(issue.kind in SEVERE_ISSUES for issue in estimate.issues):
+        return GateDecision("warn", sql, estimate, message)
+    if policy == "limit":
+        if _is_streaming(sql, estimate.plan):
+            return GateDecision("limit", rewrite_limit(sql, limit, max_limit=limit), estimate, message)
+        message += " A LIMIT would not help: the query sorts or aggregates its full input."
+    return GateDecision("reject", sql, estimate, message)
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.request import pathname2url
+
+
+POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "4"))
+POOL_TIMEOUT_SEC = float(os.getenv("SQLITE_POOL_TIMEOUT_SEC", "30"))
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", str(64 * 1024)))
+
+
+FileIdentity = Optional[Tuple[int, int]]
+
+
+def file_identity(path: str) -> FileIdentity:
+    """Return (st_dev, st_ino) for path, or None if it does not exist.
+
+    A changed identity means the file was replaced (e.g. deleted and reseeded,
+    or atomically renamed over), not merely written to.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_dev, st.st_ino
+
+
+class ReadOnlyPool:
+    """Thread-aware pool of long-lived, read-only SQLite connections.
+
+    Connections are opened once in URI ``mode=ro`` with ``query_only`` and
+    read-tuned pragmas, then handed out one caller at a time. A connection is
+    health-checked on checkout, and the whole pool is reset when the database
+    file is replaced on disk.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        size: int = POOL_SIZE,
+        timeout_sec: float = POOL_TIMEOUT_SEC,
+        mmap_size: int = MMAP_SIZE,
+        cache_kib: int = CACHE_KIB,
+    ):
+        self.path = os.path.abspath(path)
+        self.size = max(1, size)
+        self.timeout_sec = timeout_sec
+        self.mmap_size = mmap_size
+        self.cache_kib = cache_kib
+        self._idle: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._generation = 0
+        self._identity: FileIdentity = None
+        # Dedicated connection for PRAGMA data_version, whose value is per-connection
+        self._probe: Optional[sqlite3.Connection] = None
+        self._probe_lock = threading.Lock()
+        self._probe_generation = -1
+        self._probe_last: Optional[int] = None
+        self._changes = 0
+
+    @property
+    def generation(self) -> int:
+        """Incremented every time the pool is reset."""
+        return self._generation
+
+    def _connect(self) -> sqlite3.Connection:
+        if not os.path.exists(self.path):
+            # Preserve the old sqlite3.connect() behaviour of creating an empty DB
+            sqlite3.connect(self.path).close()
+        uri = f"file:{pathname2url(self.path)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON;")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)};")
+        conn.execute(f"PRAGMA cache_size = {-int(self.cache_kib)};")
+        conn.execute("PRAGMA temp_store = MEMORY;")
+        return conn
+
+    @staticmethod
+    def _healthy(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1;").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _check_file(self) -> None:
+        identity = file_identity(self.path)
+        if identity != self._identity:
+            with self._lock:
+                if identity != self._identity:
+                    self._reset_locked()
+                    self._identity = identity
+
+    def _reset_locked(self) -> None:
+        for conn in self._idle:
+            conn.close()
+        self._idle.clear()
+        self._generation += 1
+
+    def reset(self) -> None:
+        """Close idle connections; checked-out ones are closed on return."""
+        with self._lock:
+            self._reset_locked()
+            self._identity = file_identity(self.path)
+
+    def data_version(self) -> Tuple[int, int]:
+        """Return (pool generation, commit counter) for change detection.
+
+        ``PRAGMA data_version`` only changes when *other* connections commit and
+        is not comparable across connections, so it is polled on one long-lived
+        probe connection and folded into a monotonically increasing counter.
+        """
+        with self._probe_lock:
+            self._check_file()
+            if self._probe is None or self._probe_generation != self._generation:
+                if self._probe is not None:
+                    self._probe.close()
+                self._probe = self._connect()
+                self._probe_generation = self._generation
+                self._probe_last = None
+            value = self._probe.execute("PRAGMA data_version;").fetchone()[0]
+            if value != self._probe_last:
+                if self._probe_last is not None:
+                    self._changes += 1
+                self._probe_last = value
+            return self._probe_generation, self._changes
+
+    def checkout(self) -> Tuple[sqlite3.Connection, int]:
+        if not self._slots.acquire(timeout=self.timeout_sec):
+            raise TimeoutError(f"No SQLite connection available after {self.timeout_sec}s")
+        try:
+            self._check_file()
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+                generation = self._generation
+            if conn is not None and not self._healthy(conn):
+                conn.close()
+                conn = None
+            if conn is None:
+                conn = self._connect()
+                # The file may have been created by _connect()
+                if self._identity is None:
+                    self._check_file()
+                    generation = self._generation
+            return conn, generation
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def checkin(self, conn: sqlite3.Connection, generation: int) -> None:
+        try:
+            with self._lock:
+                if generation == self._generation and len(self._idle) < self.size:
+                    self._idle.append(conn)
+                    return
+            conn.close()
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn, generation = self.checkout()
+        try:
+            yield conn
+        finally:
+            self.checkin(conn, generation)
+
+    def close(self) -> None:
+        with self._lock:
+            self._reset_locked()
+        with self._probe_lock:
+            if self._probe is not None:
+                self._probe.close()
+                self._probe = None
+
+
+_POOLS: Dict[str, ReadOnlyPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(path: str) -> ReadOnlyPool:
+    """Return the process-wide pool for path (shared across Streamlit sessions)."""
+    key = os.path.abspath(path)
+    pool = _POOLS.get(key)
+    if pool is None:
+        with _POOLS_LOCK:
+            pool = _POOLS.get(key)
+            if pool is None:
+                pool = ReadOnlyPool(key)
+                _POOLS[key] = pool
+    return pool
+
+
+def reset_pools() -> None:
+    """Reset every pool, e.g. after seeding rewrote a database in place."""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+    for pool in pools:
+        pool.reset()
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from . import sqlite as db
+from .governor import QueryBudget
+from .pool import get_pool
+
+
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+Result = Tuple[List[str], List[Tuple]]
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace outside string literals and drop trailing semicolons.
+
+    Keyword case is left alone: folding it safely would need a full lexer, and
+    generated SQL for the same question is almost always byte-identical anyway.
+    """
+    out: List[str] = []
+    quote: Optional[str] = None
+    pending_space = False
+    for ch in sql.strip().rstrip(";").rstrip():
+        if quote:
+            out.append(ch)
+            if ch == quote:
+                quote = None
+            continue
+        if ch.isspace():
+            pending_space = True
+            continue
+        if pending_space and out:
+            out.append(" ")
+        pending_space = False
+        out.append(ch)
+        if ch in ("'", '"', "`"):
+            quote = ch
+    return "".join(out)
+
+
+def estimate_size(columns: List[str], rows: List[Tuple], sample: int = 200) -> int:
+    """Approximate in-memory size of a result, extrapolated from a row sample."""
+    size = sys.getsizeof(rows) + sum(sys.getsizeof(c) for c in columns)
+    if not rows:
+        return size
+    head = rows[:sample]
+    per_row = sum(sys.getsizeof(r) + sum(sys.getsizeof(v) for v in r) for r in head) / len(head)
+    return size + int(per_row * len(rows))
+
+
+class ResultCache:
+    """Thread-safe LRU of query results bounded by an estimated byte budget."""
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Result, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Result]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, columns: List[str], rows: List[Tuple], size: Optional[int] = None) -> bool:
+        """Cache a result; returns False if it alone exceeds the budget.
+
+        ``size`` overrides the sampled estimate, e.g. for an Arrow table whose
+        buffer size is known exactly (``src.db.arrow``).
+        """
+        size = estimate_size(columns, rows) if size is None else size
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = ((columns, rows), size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+RESULT_CACHE = ResultCache()
+
+
+def cache_key(sql: str) -> Tuple:
+    """Key for sql against the current DB state; read it *before* executing."""
+    path = os.path.abspath(db.DB_PATH)
+    data_version = get_pool(path).data_version()
+    schema_version = db.get_schema_catalog().schema_version
+    return path, normalize_sql(sql), schema_version, data_version
+
+
+def cached_execute_readonly(
+    sql: str, budget: Optional[QueryBudget] = None, bypass: bool = False
+) -> Result:
+    """``execute_readonly`` behind RESULT_CACHE; ``bypass`` forces a fresh run.
+
+    Cached row lists are shared between callers and must not be mutated.
+    """
+    key = cache_key(sql)
+    if not bypass:
+        hit = RESULT_CACHE.get(key)
+        if hit is not None:
+            return hit
+    columns, rows = db.execute_readonly(sql, budget=budget)
+    RESULT_CACHE.put(key, columns, rows)
+    return columns, rows
@@ -3,53 +3,104 @@ from __future__ import annotations
 import os
 import sqlite3
 from contextlib import contextmanager
-from typing import Iterator, List, Tuple, Dict, Set
+from typing import Iterator, List, Optional, Tuple
+
+from . import erd
+from .catalog import SchemaCatalog, get_catalog
+from .governor import PREVIEW_BUDGET, QueryBudget, QueryGovernor
+from .pool import get_pool
 
 
 DB_PATH = os.getenv("SQLITE_PATH", os.path.abspath("test.db"))
+FETCH_BATCH_SIZE = int(os.getenv("SQLITE_FETCH_BATCH_SIZE", "1000"))
 
 
 @contextmanager
 def get_conn() -> Iterator[sqlite3.Connection]:
-    conn = sqlite3.connect(DB_PATH)
-    try:
+    """Borrow a pooled read-only connection to DB_PATH."""
+    with get_pool(DB_PATH).connection() as conn:
         yield conn
-    finally:
-        conn.close()
 
 
-def execute_readonly(sql: str, timeout_sec: int = 5) -> Tuple[List[str], List[Tuple]]:
-    with get_conn() as conn:
-        conn.execute("PRAGMA query_only = ON;")
+def execute_readonly(
+    sql: str, timeout_sec: Optional[float] = 5, budget: Optional[QueryBudget] = None
+) -> Tuple[List[str], List[Tuple]]:
+    """Run a read-only query under a resource budget.
+
+    ``budget`` overrides ``timeout_sec``; see ``src.db.governor`` for the
+    per-caller presets and the typed errors raised when a limit trips.
+    """
+    budget = budget or QueryBudget(timeout_sec=timeout_sec)
+    with get_conn() as conn, QueryGovernor(conn, budget) as governor:
         cursor = conn.execute(sql)
         col_names = [d[0] for d in cursor.description] if cursor.description else []
-        rows = cursor.fetchall()
+        if budget.max_rows is None:
+            rows = cursor.fetchall()
+        else:
+            # Fetch one past the budget so overflow is detected without reading everything
+            rows = cursor.fetchmany(budget.max_rows + 1)
+        cursor.close()
+        governor.count_rows(len(rows))
     return col_names, rows
 
 
+def execute_readonly_iter(
+    sql: str, batch_size: int = FETCH_BATCH_SIZE, budget: Optional[QueryBudget] = None
+) -> Iterator[Tuple[List[str], List[Tuple]]]:
+    """Stream a read-only query as ``(columns, rows)`` batches of ``batch_size``.
+
+    At least one batch is always yielded, so callers see the columns of an
+    empty result. The pooled connection and the budget stay held until the
+    generator is exhausted or closed, so close it when abandoning a stream.
+    """
+    budget = budget or QueryBudget()
+    with get_conn() as conn, QueryGovernor(conn, budget) as governor:
+        cursor = conn.execute(sql)
+        try:
+            col_names = [d[0] for d in cursor.description] if cursor.description else []
+            first = True
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch and not first:
+                    break
+                first = False
+                governor.count_rows(len(batch))
+                yield col_names, batch
+                if len(batch) < batch_size:
+                    break
+        finally:
+            cursor.close()
+
+
+def get_schema_catalog() -> SchemaCatalog:
+    """Shared, version-checked schema snapshot of DB_PATH."""
+    return get_catalog(DB_PATH)
+
+
+def db_version() -> Tuple:
+    """Key that changes whenever DB_PATH is replaced or its schema or data change."""
+    path = os.path.abspath(DB_PATH)
+    return path, get_schema_catalog().schema_version, get_pool(path).data_version()
+
+
 def list_tables() -> List[str]:
-    with get_conn() as conn:
-        cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;")
-        return [r[0] for r in cursor.fetchall()]
+    return get_schema_catalog().table_names(include_internal=True)
 
 
 def preview_table(table_name: str, limit: int = 10) -> Tuple[List[str], List[Tuple]]:
     query = f"SELECT * FROM {table_name} LIMIT {limit};"
-    return execute_readonly(query)
+    return execute_readonly(query, budget=PREVIEW_BUDGET)
 
 
 def get_table_columns(table_name: str) -> List[Tuple[str, str]]:
-    with get_conn() as conn:
-        rows = conn.execute(f"PRAGMA table_info({table_name});").fetchall()
-        # rows: cid, name, type, notnull, dflt_value, pk
-        return [(r[1], r[2]) for r in rows]
+    return [(c.name, c.type) for c in get_schema_catalog().columns(table_name)]
 
 
-def get_schema_overview(max_tables: int = 20, max_columns: int = 50) -> str:
-    tables = [t for t in list_tables() if not t.startswith("sqlite_")]
+def get_schema_overview(max_tables: int = 20, max_columns: int = 50, catalog: Optional[SchemaCatalog] = None) -> str:
+    catalog = catalog or get_schema_catalog()
     lines: List[str] = []
-    for t in tables[:max_tables]:
-        cols = get_table_columns(t)
+    for t in catalog.table_names()[:max_tables]:
+        cols = [(c.name, c.type) for c in catalog.columns(t)]
         if len(cols) > max_columns:
             cols = cols[:max_columns]
         col_str = ", ".join([f"{name} {dtype}" for name, dtype in cols])
@@ -59,102 +110,22 @@ def get_schema_overview(max_tables: int = 20, max_columns: int = 50) -> str:
 
 def get_foreign_keys(table_name: str) -> List[Tuple[str, str, str]]:
     """Return list of (from_column, ref_table, ref_column) for the table."""
-    with get_conn() as conn:
-        rows = conn.execute(f"PRAGMA foreign_key_list({table_name});").fetchall()
-        fks: List[Tuple[str, str, str]] = []
-        for r in rows:
-            # r columns: id, seq, table, from, to, on_update, on_delete, match
-            fks.append((r[3], r[2], r[4]))
-        return fks
-
-
-def build_erd_dot(max_columns_per_table: int = 12, include_columns: bool = True) -> str:
-    """Build a Graphviz DOT ERD with basic aesthetics and heuristic links.
-
-    If SQLite tables do not declare foreign keys, we infer edges using common
-    naming patterns like playerID/player_id -> player.
-    """
-    tables = [t for t in list_tables() if not t.startswith("sqlite_")]
-    if include_columns:
-        node_line = '  node [shape=record, style="rounded,filled", fillcolor="#F6F8FA", color="#9AA0A6", fontname="Helvetica", fontsize=10];'
-    else:
-        node_line = '  node [shape=box, style="rounded,filled", fillcolor="#F6F8FA", color="#9AA0A6", fontname="Helvetica", fontsize=11];'
-
-    lines: List[str] = [
-        "digraph ERD {",
-        "  rankdir=LR;",
-        "  bgcolor=white;",
-        node_line,
-        "  edge [color=\"#9AA0A6\", arrowsize=0.7, fontname=\"Helvetica\", fontsize=9];",
-    ]
-
-    # Collect columns lower-cased for heuristics
-    table_to_cols: Dict[str, List[str]] = {}
-    for t in tables:
-        cols = [c for c, _ in get_table_columns(t)]
-        table_to_cols[t] = [c.lower() for c in cols]
-
-    # Nodes with a limited list of columns
-    for t in tables:
-        safe_t = t.replace('-', '_')
-        if include_columns:
-            raw_cols = get_table_columns(t)
-            cols = raw_cols[:max_columns_per_table] if max_columns_per_table else raw_cols
-            field_lines = [f"<f{i}> {name}: {dtype}" for i, (name, dtype) in enumerate(cols)] or ["(no columns)"]
-            title = t
-            label = "{" + f"{title}|" + "|".join(field_lines) + "}"
-            lines.append(f"  {safe_t} [label=\"{label}\"];")
-        else:
-            lines.append(f"  {safe_t} [label=\"{t}\"];")
-
-    # Build edges: prefer declared FKs; then add inferred links
-    edges: Set[Tuple[str, str, str]] = set()
-    for t in tables:
-        for from_col, ref_table, ref_col in get_foreign_keys(t):
-            edges.add((t, ref_table, f"{from_col}->{ref_col}"))
-
-    # Heuristic: link tables with playerID/player_id to 'player'
-    player_table = None
-    for candidate in ("player", "players"):
-        if candidate in tables:
-            player_table = candidate
-            break
-        for t in tables:
-            if candidate in t.lower():
-                player_table = t
-                break
-        if player_table:
-            break
-
-    if player_table:
-        for t, cols in table_to_cols.items():
-            if t == player_table:
-                continue
-            if any(c in cols for c in ("playerid", "player_id")):
-                edges.add((t, player_table, "player_id"))
-
-    # Generic heuristic: foo_id -> foo / foos
-    def normalize(name: str) -> str:
-        return name.lower().strip()
-
-    table_names_norm = {normalize(t): t for t in tables}
-    for t, cols in table_to_cols.items():
-        for c in cols:
-            if c.endswith("_id") or c.endswith("id"):
-                base = c[:-3] if c.endswith("_id") else c[:-2]
-                for cand in (base, base + "s"):
-                    if cand and cand in table_names_norm:
-                        target = table_names_norm[cand]
-                        if target != t:
-                            edges.add((t, target, c))
-
-    # Render edges
-    for src, dst, label in sorted(edges):
-        safe_src = src.replace('-', '_')
-        safe_dst = dst.replace('-', '_')
-        lines.append(f"  {safe_src} -> {safe_dst} [label=\"{label}\"];")
-
-    lines.append("}")
-    return "\n".join(lines)
-
-
+    return [tuple(fk) for fk in get_schema_catalog().foreign_keys(table_name)]
+
+
+def build_erd_dot(
+    max_columns_per_table: int = 12,
+    include_columns: bool = True,
+    focus: Optional[str] = None,
+    depth: int = 1,
+    top_n: Optional[int] = None,
+) -> str:
+    """Graphviz DOT ERD of DB_PATH; see ``src.db.erd.build_erd_dot``."""
+    return erd.build_erd_dot(
+        get_schema_catalog(),
+        max_columns_per_table=max_columns_per_table,
+        include_columns=include_columns,
+        focus=focus,
+        depth=depth,
+        top_n=top_n,
+    )
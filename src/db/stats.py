@@ -0,0 +1,356 @@
+"""Table and column statistics, refreshed in the background.
+
+    python -m src.db.stats            # refresh changed tables and print a summary
+    python -m src.db.stats --force    # recompute every table
+
+Per table: the exact row count. Per column: NULL fraction and min/max (one
+aggregate pass in SQLite), an estimated distinct count and the most common
+values (from a uniform sample of STATS_SAMPLE_ROWS rows, drawn in SQLite
+with ``ORDER BY random() LIMIT n``). The distinct estimate is Haas and
+Stokes' Duj1, as PostgreSQL's ANALYZE uses.
+
+Results live in a sidecar SQLite file next to the database, not in it: the
+app opens the database read-only, a write would bump ``data_version`` and
+drop every cache keyed on it, and a reseed swaps the file out anyway. Each
+table's row carries a cheap signature (row count, max rowid and the
+seeder's checksum), so a refresh after ``data_version`` moves recomputes
+only the tables that changed. A table whose column pass exceeds
+STATS_BUDGET keeps just the row count from its signature (``partial``); one
+whose signature pass exceeds it is listed in ``failed()``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from . import sqlite as db
+from .catalog import get_catalog
+from .governor import STATS_BUDGET, QueryBudgetExceeded, QueryGovernor
+from .pool import get_pool
+
+
+SAMPLE_ROWS = int(os.getenv("STATS_SAMPLE_ROWS", "20000"))
+TOP_VALUES = int(os.getenv("STATS_TOP_VALUES", "5"))
+STATS_SUFFIX = ".stats"
+
+_SIDECAR_DDL = """
+CREATE TABLE IF NOT EXISTS table_stats (
+    name TEXT PRIMARY KEY,
+    signature TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    refreshed_at REAL NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS column_stats (
+    table_name TEXT NOT NULL REFERENCES table_stats(name) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    column_name TEXT NOT NULL,
+    null_frac REAL NOT NULL,
+    n_distinct REAL NOT NULL,
+    min_value,
+    max_value,
+    top_values TEXT NOT NULL,
+    PRIMARY KEY (table_name, position)
+);
+"""
+
+
+class ColumnStats(NamedTuple):
+    name: str
+    null_frac: float
+    distinct: float  # estimated distinct non-NULL values
+    min: object
+    max: object
+    top: Tuple[Tuple[object, float], ...]  # most common values, fraction of all rows
+
+
+class TableStats(NamedTuple):
+    name: str
+    rows: int
+    columns: Tuple[ColumnStats, ...]
+    signature: str
+    refreshed_at: float
+    seconds: float
+
+    @property
+    def partial(self) -> bool:
+        """Only the row count: the column pass ran out of budget (a table always has columns)."""
+        return not self.columns
+
+    def column(self, name: str) -> Optional[ColumnStats]:
+        return next((c for c in self.columns if c.name.lower() == name.lower()), None)
+
+
+def stats_path(path: str) -> str:
+    return os.getenv("SQLITE_STATS_PATH") or path + STATS_SUFFIX
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def estimate_distinct(counts: Counter, sampled: int, total: int) -> float:
+    """Distinct values among total from the value counts of a uniform sample of sampled.
+
+    Duj1: ``n*d / (n - f1 + f1*n/N)`` where d is the distinct values seen
+    and f1 those seen once; exact when the sample is the whole population.
+    """
+    d = len(counts)
+    if sampled >= total or d == 0:
+        return float(d)
+    f1 = sum(1 for c in counts.values() if c == 1)
+    estimate = sampled * d / (sampled - f1 + f1 * sampled / total)
+    return float(min(max(estimate, d), total))
+
+
+def table_signature(conn: sqlite3.Connection, table: str, checksums: Dict[str, str]) -> Tuple[int, str]:
+    """(row count, signature) for table; COUNT(*) and MAX(rowid) are both B-tree walks, no row decoding."""
+    qt = _quote(table)
+    rows = conn.execute(f"SELECT COUNT(*) FROM {qt}").fetchone()[0]
+    try:
+        last = conn.execute(f"SELECT MAX(rowid) FROM {qt}").fetchone()[0]
+    except sqlite3.OperationalError:
+        last = None  # WITHOUT ROWID
+    return rows, f"{rows}:{last}:{checksums.get(table, '')}"
+
+
+def _seed_checksums(conn: sqlite3.Connection) -> Dict[str, str]:
+    try:
+        return dict(conn.execute("SELECT name, sha256 FROM _seed_manifest"))
+    except sqlite3.OperationalError:
+        return {}
+
+
+def collect_table_stats(
+    conn: sqlite3.Connection, table: str, columns: Sequence[str], signature: str, sample_rows: int = SAMPLE_ROWS
+) -> TableStats:
+    start = time.perf_counter()
+    qt = _quote(table)
+    quoted = [_quote(c) for c in columns]
+    agg = ", ".join(f"COUNT({q}), MIN({q}), MAX({q})" for q in quoted)
+    row = conn.execute(f"SELECT COUNT(*), {agg} FROM {qt}").fetchone()
+    total = row[0]
+    sample_sql = f"SELECT {', '.join(quoted)} FROM {qt}"
+    if total > sample_rows:
+        sample_sql += f" ORDER BY random() LIMIT {int(sample_rows)}"
+    sample = conn.execute(sample_sql).fetchall()
+
+    stats: List[ColumnStats] = []
+    for i, name in enumerate(columns):
+        non_null, lo, hi = row[1 + 3 * i : 4 + 3 * i]
+        counts = Counter(r[i] for r in sample if r[i] is not None)
+        sampled = sum(counts.values())
+        top = tuple(
+            (value, n / len(sample))
+            for value, n in counts.most_common(TOP_VALUES)
+            if n > 1 and not isinstance(value, bytes)
+        )
+        stats.append(
+            ColumnStats(
+                name,
+                1 - non_null / total if total else 0.0,
+                estimate_distinct(counts, sampled, non_null),
+                lo,
+                hi,
+                top,
+            )
+        )
+    return TableStats(table, total, tuple(stats), signature, time.time(), time.perf_counter() - start)
+
+
+def _open_sidecar(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(_SIDECAR_DDL)
+    return conn
+
+
+def read_sidecar(path: str) -> Dict[str, TableStats]:
+    if not os.path.exists(path):
+        return {}
+    conn = _open_sidecar(path)
+    try:
+        columns: Dict[str, List[ColumnStats]] = {}
+        for table, name, null_frac, distinct, lo, hi, top in conn.execute(
+            "SELECT table_name, column_name, null_frac, n_distinct, min_value, max_value, top_values "
+            "FROM column_stats ORDER BY table_name, position"
+        ):
+            top_values = tuple((v, f) for v, f in json.loads(top))
+            columns.setdefault(table, []).append(ColumnStats(name, null_frac, distinct, lo, hi, top_values))
+        return {
+            name: TableStats(name, rows, tuple(columns.get(name, ())), signature, refreshed_at, seconds)
+            for name, signature, rows, refreshed_at, seconds in conn.execute(
+                "SELECT name, signature, row_count, refreshed_at, seconds FROM table_stats"
+            )
+        }
+    finally:
+        conn.close()
+
+
+def _write_sidecar(path: str, changed: Sequence[TableStats], dropped: Sequence[str]) -> None:
+    conn = _open_sidecar(path)
+    try:
+        with conn:
+            for name in list(dropped) + [t.name for t in changed]:
+                conn.execute("DELETE FROM table_stats WHERE name = ?", (name,))
+            for t in changed:
+                conn.execute(
+                    "INSERT INTO table_stats VALUES (?, ?, ?, ?, ?)",
+                    (t.name, t.signature, t.rows, t.refreshed_at, t.seconds),
+                )
+                conn.executemany(
+                    "INSERT INTO column_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (t.name, i, c.name, c.null_frac, c.distinct, c.min, c.max, json.dumps([list(v) for v in c.top]))
+                        for i, c in enumerate(t.columns)
+                    ],
+                )
+    finally:
+        conn.close()
+
+
+# One background thread for every database: refreshes are full-table scans
+_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stats")
+
+
+class StatsService:
+    """Statistics for one database, served from memory and the sidecar file.
+
+    ``current()`` never scans: it returns what is known and, when the
+    database's ``data_version`` moved since the last look, schedules a
+    background refresh of the tables whose signature changed.
+    """
+
+    def __init__(self, path: str, sidecar: Optional[str] = None, sample_rows: int = SAMPLE_ROWS):
+        self.path = os.path.abspath(path)
+        self.sidecar = sidecar or stats_path(self.path)
+        self.sample_rows = sample_rows
+        self._lock = threading.Lock()
+        self._stats = read_sidecar(self.sidecar)
+        self._failed: Dict[str, str] = {}  # table -> why not even its row count was collected
+        self._version: Optional[Tuple[int, int]] = None
+        self._future: Optional[Future] = None
+
+    def refresh(self, force: bool = False) -> List[str]:
+        """Recompute the tables that changed (all with force); returns their names."""
+        catalog = get_catalog(self.path)
+        known = self._stats
+        changed: List[TableStats] = []
+        failed: Dict[str, str] = {}
+        with get_pool(self.path).connection() as conn:
+            checksums = _seed_checksums(conn)
+            for table in catalog.table_names():
+                try:
+                    with QueryGovernor(conn, STATS_BUDGET):
+                        rows, signature = table_signature(conn, table, checksums)
+                except (QueryBudgetExceeded, sqlite3.Error) as e:
+                    failed[table] = str(e)
+                    continue  # keep the previous stats, if any
+                old = known.get(table)
+                if not (force or old is None or old.signature != signature):
+                    continue
+                start = time.perf_counter()
+                columns = [c.name for c in catalog.columns(table)]
+                try:
+                    with QueryGovernor(conn, STATS_BUDGET):
+                        changed.append(collect_table_stats(conn, table, columns, signature, self.sample_rows))
+                except (QueryBudgetExceeded, sqlite3.Error):
+                    # Record the row count, so this table is not retried until it changes
+                    changed.append(TableStats(table, rows, (), signature, time.time(), time.perf_counter() - start))
+        dropped = [t for t in known if catalog.table(t) is None]
+        if changed or dropped:
+            _write_sidecar(self.sidecar, changed, dropped)
+            with self._lock:
+                stats = {k: v for k, v in self._stats.items() if k not in dropped}
+                stats.update((t.name, t) for t in changed)
+                self._stats = stats
+        with self._lock:
+            self._failed = failed
+        return [t.name for t in changed]
+
+    def refresh_async(self) -> Future:
+        """Schedule a refresh unless one is already queued or running."""
+        with self._lock:
+            if self._future is None or self._future.done():
+                self._future = _EXECUTOR.submit(self.refresh)
+            return self._future
+
+    def current(self) -> Dict[str, TableStats]:
+        version = get_pool(self.path).data_version()
+        if version != self._version:
+            self._version = version
+            self.refresh_async()
+        return self._stats
+
+    def table(self, name: str) -> Optional[TableStats]:
+        stats = self.current()
+        return stats.get(name) or next((t for t in stats.values() if t.name.lower() == name.lower()), None)
+
+    def row_counts(self) -> Dict[str, int]:
+        return {name: t.rows for name, t in self.current().items()}
+
+    def failed(self) -> Dict[str, str]:
+        """Tables the last refresh could not even count, with the reason."""
+        return self._failed
+
+
+_SERVICES: Dict[str, StatsService] = {}
+_SERVICES_LOCK = threading.Lock()
+
+
+def get_stats(path: Optional[str] = None) -> StatsService:
+    """Process-wide StatsService for path (default DB_PATH)."""
+    key = os.path.abspath(path or db.DB_PATH)
+    with _SERVICES_LOCK:
+        service = _SERVICES.get(key)
+        if service is None:
+            service = StatsService(key)
+            _SERVICES[key] = service
+    return service
+
+
+def _short(value: object, max_len: int = 24) -> str:
+    text = f"{value:g}" if isinstance(value, float) else str(value)
+    return text if len(text) <= max_len else text[: max_len - 1] + "…"
+
+
+def column_hint(stats: ColumnStats) -> str:
+    """Prompt hint such as ``1871 to 2015`` or ``one of AL, NL``; empty when nothing useful."""
+    if stats.distinct == 0:
+        return "always NULL"
+    numeric = (int, float)
+    if isinstance(stats.min, numeric) and isinstance(stats.max, numeric):
+        return f"{_short(stats.min)} to {_short(stats.max)}"
+    values = [v for v, _ in stats.top]
+    # Only when the top values are all the values there are
+    if values and len(values) >= round(stats.distinct):
+        return "one of " + ", ".join(_short(v) for v in values)
+    return ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--force", action="store_true", help="recompute tables whose signature did not change")
+    args = parser.parse_args()
+
+    service = StatsService(db.DB_PATH)
+    refreshed = service.refresh(force=args.force)
+    print(f"Refreshed {len(refreshed)} table(s) into {service.sidecar}")
+    for name, t in sorted(read_sidecar(service.sidecar).items()):
+        mark = "*" if name in refreshed else " "
+        detail = "row count only" if t.partial else f"{len(t.columns)} columns"
+        print(f"{mark} {name}: {t.rows:,} rows, {detail} ({t.seconds:.2f}s)")
+    for name, reason in sorted(service.failed().items()):
+        print(f"! {name}: {reason}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import sqlite3
+from typing import Dict, Iterable, Optional, Sequence
+
+import pytest
+
+from src.db import sqlite as db
+
+
+@pytest.fixture
+def make_db(tmp_path, monkeypatch):
+    # make_db(script, {table: rows}) builds a SQLite file in tmp_path and points DB_PATH at it
+    def make(script: str, rows: Optional[Dict[str, Iterable[Sequence]]] = None, name: str = "test.db") -> str:
+        path = str(tmp_path / name)
+        conn = sqlite3.connect(path)
+        conn.executescript(script)
+        for table, values in (rows or {}).items():
+            values = list(values)
+            if values:
+                conn.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * len(values[0]))})", values)
+        conn.commit()
+        conn.close()
+        monkeypatch.setattr(db, "DB_PATH", path)
+        return path
+
+    return make
@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+from sqlalchemy.dialects import mssql, oracle, postgresql
+
+from src.db.adapter import SQLAlchemyAdapter, SQLiteAdapter, bound_sql, limit_style
+from src.db.catalog import affinity
+from src.db.governor import QueryBudget, QueryTimeoutError, RowBudgetExceeded, StepBudgetExceeded
+
+CROSS_JOIN = "SELECT COUNT(*) FROM batting a, batting b, batting c"
+
+
+# Conformance suite: every adapter must pass against the same local SQLite file
+@pytest.fixture(params=["sqlite", "sqlalchemy"])
+def adapter(request, make_db):
+    path = make_db(
+        """
+        CREATE TABLE team (team_id TEXT PRIMARY KEY, name VARCHAR(40));
+        CREATE TABLE batting (player_id TEXT, team_id TEXT REFERENCES team(team_id), year INT, avg DOUBLE);
+        """,
+        {
+            "team": [("BOS", "Boston"), ("NYA", "New York")],
+            "batting": [(f"p{i}", ("BOS", "NYA")[i % 2], 1900 + i, i / 100) for i in range(250)],
+        },
+    )
+    adapter = SQLiteAdapter() if request.param == "sqlite" else SQLAlchemyAdapter(f"sqlite:///{path}")
+    yield adapter
+    adapter.close()
+
+
+def test_execute_and_stream(adapter):
+    columns, rows = adapter.execute_readonly("SELECT team_id, name FROM team ORDER BY team_id;")
+    assert columns == ["team_id", "name"] and rows == [("BOS", "Boston"), ("NYA", "New York")]
+    batches = list(adapter.iter_batches("SELECT year FROM batting ORDER BY year", batch_size=100))
+    assert [len(rows) for _, rows in batches] == [100, 100, 50]
+    assert batches[2][1][-1] == (2149,)
+    assert list(adapter.iter_batches("SELECT year FROM batting WHERE 0", batch_size=100)) == [(["year"], [])]
+
+
+def test_read_only_and_errors(adapter):
+    with pytest.raises(sqlite3.Error):
+        adapter.execute_readonly("INSERT INTO team VALUES ('SEA', 'Seattle')")
+    with pytest.raises(sqlite3.OperationalError):
+        adapter.execute_readonly("SELECT missing FROM team")
+    assert adapter.execute_readonly("SELECT COUNT(*) FROM team")[1] == [(2,)]
+
+
+def test_budgets(adapter):
+    with pytest.raises(RowBudgetExceeded):
+        list(adapter.iter_batches("SELECT * FROM batting", batch_size=100, budget=QueryBudget(max_rows=120)))
+    with pytest.raises(QueryTimeoutError):
+        adapter.execute_readonly(CROSS_JOIN, budget=QueryBudget(timeout_sec=0.05))
+    with pytest.raises(StepBudgetExceeded):
+        adapter.execute_readonly(CROSS_JOIN, budget=QueryBudget(timeout_sec=None, max_steps=100_000))
+
+
+def test_catalog_explain_and_limit(adapter):
+    catalog = adapter.catalog()
+    assert catalog.table_names() == ["batting", "team"]
+    assert catalog.table("team").primary_key == ("team_id",)
+    assert [(c.name, affinity(c.type)) for c in catalog.columns("batting")] == [
+        ("player_id", "TEXT"),
+        ("team_id", "TEXT"),
+        ("year", "INTEGER"),
+        ("avg", "REAL"),
+    ]
+    assert [tuple(fk) for fk in catalog.foreign_keys("batting")] == [("team_id", "team", "team_id")]
+    plan = adapter.explain("SELECT name FROM team WHERE team_id = 'BOS'")
+    assert any("team" in line for line in plan)
+    assert adapter.limit("SELECT * FROM team -- all", 5) == "SELECT * FROM team LIMIT 5;"
+    assert adapter.version() == adapter.version()
+
+
+def test_dialect_aware_limits():
+    top, fetch = limit_style(mssql.dialect()), limit_style(oracle.dialect())
+    assert (top, fetch, limit_style(postgresql.dialect())) == ("top", "fetch", "limit")
+    assert bound_sql("SELECT DISTINCT a FROM t ORDER BY a;", 50, top) == "SELECT DISTINCT TOP 50 a FROM t ORDER BY a"
+    assert bound_sql("SELECT a FROM t UNION SELECT b FROM u", 50, top).startswith("SELECT TOP 50 * FROM (")
+    assert bound_sql("SELECT a FROM t ORDER BY a", 50, fetch) == "SELECT a FROM t ORDER BY a FETCH FIRST 50 ROWS ONLY"
+    assert bound_sql("SELECT TOP 5 a FROM t", 50, top) == "SELECT TOP 5 a FROM t"
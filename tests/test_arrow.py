@@ -0,0 +1,60 @@
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src.db import result_cache
+from src.db.arrow import cached_execute_arrow, column_array, execute_arrow, iter_record_batches, select_sources, to_pandas, to_table
+from src.db.result_cache import ResultCache
+
+
+@pytest.fixture
+def db_path(make_db, monkeypatch):
+    rows = [(f"p{i}", 1900 + i, None if i % 3 == 0 else i, i / 10, None) for i in range(25)]
+    # SQLite keeps values that do not fit the declared type as they are
+    rows.append(("p25", 1925, "n/a", 0.5, b"\x00"))
+    path = make_db("CREATE TABLE batting (player_id VARCHAR(9), year INT, hr INTEGER, avg DOUBLE, note BLOB)", {"batting": rows})
+    monkeypatch.setattr(result_cache, "RESULT_CACHE", ResultCache(max_bytes=1 << 20))
+    return path
+
+
+def test_declared_and_inferred_types(db_path):
+    table = execute_arrow("SELECT b.player_id, year, avg, hr * 2 AS hr2, COUNT(*) OVER () AS n FROM batting b WHERE year < 1910")
+    assert table.schema.types == [pa.string(), pa.int64(), pa.float64(), pa.int64(), pa.int64()]
+    df = to_pandas(table)
+    assert all(isinstance(t, pd.ArrowDtype) for t in df.dtypes)
+    assert df["year"].tolist() == list(range(1900, 1910))
+    assert list(df.select_dtypes(include=["number"]).columns) == ["year", "avg", "hr2", "n"]
+
+
+def test_expressions_aliased_to_column_names_keep_their_values(db_path):
+    sql = (
+        "SELECT player_id AS year, AVG(hr) AS hr, year * 1.0 / 3 AS year2, 10.5 AS avg, COUNT(*) hr_count "
+        "FROM batting WHERE year < 1905 GROUP BY year"
+    )
+    bare, computed, star = select_sources(sql)
+    assert bare == {"year": "player_id"} and computed == {"hr", "year2", "avg", "hr_count"} and not star
+    table = execute_arrow(sql)
+    assert table.schema.types == [pa.string(), pa.float64(), pa.float64(), pa.float64(), pa.int64()]
+    row = table.slice(1, 1).to_pylist()[0]
+    assert row == {"year": "p1", "hr": 1.0, "year2": 1901 / 3, "avg": 10.5, "hr_count": 1}
+    averaged = execute_arrow("SELECT AVG(hr) AS hr FROM batting WHERE year IN (1901, 1902)")
+    assert averaged.column("hr").to_pylist() == [1.5]
+    # A declared type never truncates what does not fit it
+    assert column_array([7.5, 1], pa.int64()).to_pylist() == [7.5, 1.0]
+
+
+def test_widening_across_batches(db_path):
+    batches = list(iter_record_batches("SELECT hr, note FROM batting", batch_size=10))
+    assert [b.schema.field("hr").type for b in batches] == [pa.int64(), pa.int64(), pa.string()]
+    table = to_table(batches)
+    assert table.schema.types == [pa.string(), pa.binary()]
+    assert table.column("hr").to_pylist()[:3] == [None, "1", "2"] and table.column("hr")[-1].as_py() == "n/a"
+
+
+def test_empty_result_and_cache(db_path):
+    empty = execute_arrow("SELECT player_id, year FROM batting WHERE 0")
+    assert empty.num_rows == 0 and empty.column_names == ["player_id", "year"]
+    first = cached_execute_arrow("SELECT year FROM batting")
+    assert cached_execute_arrow("SELECT  year FROM batting;") is first
+    stats = result_cache.RESULT_CACHE.stats()
+    assert stats["hits"] == 1 and stats["bytes"] == first.nbytes
@@ -0,0 +1,31 @@
+import asyncio
+
+from src.agent.async_providers import run_sql_batch
+
+
+def test_batch_is_ordered_bounded_and_reports_failures():
+    in_flight = []
+    peak = []
+
+    async def generate(prompt):
+        in_flight.append(prompt)
+        peak.append(len(in_flight))
+        try:
+            if prompt == "slow":
+                await asyncio.sleep(1)
+            await asyncio.sleep(0.01 * (5 - len(prompt) % 5))
+            if prompt == "boom":
+                raise ValueError("bad prompt")
+            return f"SELECT '{prompt}';"
+        finally:
+            in_flight.remove(prompt)
+
+    prompts = ["a", "bb", "boom", "slow", "ccc", "dddd"]
+    results = run_sql_batch(prompts, generate, concurrency=2, timeout_sec=0.2)
+
+    assert [r.index for r in results] == list(range(len(prompts)))
+    assert max(peak) <= 2
+    assert results[0].sql == "SELECT 'a';" and results[0].ok
+    assert results[2].error == "ValueError: bad prompt"
+    assert results[3].error.startswith("timed out")
+    assert [r.ok for r in results] == [True, True, False, False, True, True]
@@ -0,0 +1,112 @@
+import datetime as dt
+from decimal import Decimal
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from src.db.athena import AthenaAdapter, AthenaQueryError, QueryStats, poll_delays
+from src.db.adapter import SQLiteAdapter
+from src.db.governor import ATHENA_BUDGET, USER_QUERY_BUDGET, QueryBudget, QueryTimeoutError
+
+COLUMNS = [
+    {"Name": "team", "Type": "varchar"},
+    {"Name": "hr", "Type": "bigint"},
+    {"Name": "avg", "Type": "decimal(4,3)"},
+    {"Name": "day", "Type": "date"},
+    {"Name": "at", "Type": "timestamp"},
+]
+
+
+def _row(*values):
+    return {"Data": [{} if v is None else {"VarCharValue": v} for v in values]}
+
+
+def _execution(state, **stats):
+    return {"QueryExecution": {"QueryExecutionId": "q1", "Status": {"State": state, "StateChangeReason": "boom"}, "Statistics": stats}}
+
+
+@pytest.fixture
+def athena():
+    client = boto3.client("athena", region_name="us-east-1", aws_access_key_id="x", aws_secret_access_key="x")
+    clock = {"now": 0.0, "sleeps": []}
+
+    def sleep(seconds):
+        clock["sleeps"].append(round(seconds, 3))
+        clock["now"] += seconds
+
+    adapter = AthenaAdapter(client, workgroup="wg", database="mlb", output_location="s3://bucket/results/", sleep=sleep, clock=lambda: clock["now"])
+    with Stubber(client) as stub:
+        yield adapter, stub, clock
+        stub.assert_no_pending_responses()
+
+
+def test_poll_delays_back_off():
+    delays = poll_delays(0.1, 1.0, 2.0)
+    assert [next(delays) for _ in range(6)] == [0.1, 0.2, 0.4, 0.8, 1.0, 1.0]
+
+
+def test_streams_typed_pages_with_reuse_and_stats(athena):
+    adapter, stub, clock = athena
+    stub.add_response(
+        "start_query_execution",
+        {"QueryExecutionId": "q1"},
+        {
+            "QueryString": "SELECT * FROM batting",
+            "WorkGroup": "wg",
+            "QueryExecutionContext": {"Database": "mlb", "Catalog": "AwsDataCatalog"},
+            "ResultConfiguration": {"OutputLocation": "s3://bucket/results/"},
+            "ResultReuseConfiguration": {"ResultReuseByAgeConfiguration": {"Enabled": True, "MaxAgeInMinutes": 60}},
+        },
+    )
+    stub.add_response("get_query_execution", _execution("QUEUED"), {"QueryExecutionId": "q1"})
+    stub.add_response("get_query_execution", _execution("RUNNING"), {"QueryExecutionId": "q1"})
+    stats = dict(DataScannedInBytes=4096, EngineExecutionTimeInMillis=900, TotalExecutionTimeInMillis=1000, QueryQueueTimeInMillis=50, ResultReuseInformation={"ReusedPreviousResult": True})
+    stub.add_response("get_query_execution", _execution("SUCCEEDED", **stats), {"QueryExecutionId": "q1"})
+    header = _row("team", "hr", "avg", "day", "at")
+    first = [header, _row("BOS", "12", "0.301", "2015-04-06", "2015-04-06 13:05:00.123456789"), _row("NYA", None, None, None, None)]
+    meta = {"ColumnInfo": COLUMNS}
+    stub.add_response("get_query_results", {"ResultSet": {"Rows": first, "ResultSetMetadata": meta}, "NextToken": "t2"}, {"QueryExecutionId": "q1", "MaxResults": 1000})
+    second = [_row("SEA", "7", "0.250", "2015-04-07", "2015-04-07 19:10:00")]
+    stub.add_response("get_query_results", {"ResultSet": {"Rows": second, "ResultSetMetadata": meta}}, {"QueryExecutionId": "q1", "MaxResults": 1000, "NextToken": "t2"})
+
+    stats = []
+    batches = list(adapter.iter_batches("SELECT * FROM batting", batch_size=2, on_stats=stats.append))
+    assert [c for c, _ in batches] == [["team", "hr", "avg", "day", "at"]] * 2
+    rows = [r for _, batch in batches for r in batch]
+    assert [len(b) for _, b in batches] == [2, 1]
+    assert rows[0] == ("BOS", 12, Decimal("0.301"), dt.date(2015, 4, 6), dt.datetime(2015, 4, 6, 13, 5, 0, 123456))
+    assert rows[1] == ("NYA", None, None, None, None) and rows[2][1] == 7
+    assert clock["sleeps"] == [0.1, 0.15]
+    assert stats == [QueryStats("q1", 4096, 900, 1000, 50, True)]
+
+
+def test_failure_and_timeout(athena):
+    adapter, stub, clock = athena
+    stub.add_response("start_query_execution", {"QueryExecutionId": "q1"}, None)
+    stub.add_response("get_query_execution", _execution("FAILED"), {"QueryExecutionId": "q1"})
+    with pytest.raises(AthenaQueryError, match="boom"):
+        adapter.execute_readonly("SELECT nope")
+
+    stub.add_response("start_query_execution", {"QueryExecutionId": "q1"}, None)
+    for _ in range(3):
+        stub.add_response("get_query_execution", _execution("RUNNING"), {"QueryExecutionId": "q1"})
+    stub.add_response("stop_query_execution", {}, {"QueryExecutionId": "q1"})
+    with pytest.raises(QueryTimeoutError):
+        adapter.execute_readonly("SELECT slow", budget=QueryBudget(timeout_sec=0.2))
+    assert clock["sleeps"] == [0.1, 0.1]
+    assert adapter.query_budget is ATHENA_BUDGET and SQLiteAdapter().query_budget is USER_QUERY_BUDGET
+
+
+def test_catalog_from_table_metadata(athena):
+    adapter, stub, _ = athena
+    tables = [
+        {"Name": "batting", "Columns": [{"Name": "player_id", "Type": "string"}, {"Name": "hr", "Type": "int"}], "PartitionKeys": [{"Name": "year", "Type": "int"}]},
+        {"Name": "team", "Columns": [{"Name": "team_id", "Type": "string"}]},
+    ]
+    stub.add_response("list_table_metadata", {"TableMetadataList": tables}, {"CatalogName": "AwsDataCatalog", "DatabaseName": "mlb"})
+    catalog = adapter.catalog()
+    assert catalog.table_names() == ["batting", "team"]
+    assert [c.name for c in catalog.columns("batting")] == ["player_id", "hr", "year"]
+    assert adapter.catalog() is catalog
+    assert adapter.limit("SELECT * FROM team", 5) == "SELECT * FROM team LIMIT 5;"
@@ -0,0 +1,38 @@
+import pytest
+
+from src.db import sqlite as db
+from src.db.erd import Relationship, infer_relationships
+
+
+@pytest.fixture
+def db_path(make_db):
+    return make_db(
+        """
+        CREATE TABLE player (player_id TEXT PRIMARY KEY, name TEXT);
+        CREATE TABLE team (team_id TEXT PRIMARY KEY);
+        CREATE TABLE batting (playerID TEXT, team_id TEXT, year INTEGER);
+        CREATE TABLE salary (player_id TEXT, team_id TEXT REFERENCES team(team_id));
+        CREATE TABLE appearances (player_id TEXT, team_id TEXT);
+        CREATE TABLE park (park_id TEXT);
+        """
+    )
+
+
+def test_infer_relationships(db_path):
+    rels = set(infer_relationships(db.get_schema_catalog()))
+    assert Relationship("batting", "player", "player_id") in rels
+    assert Relationship("batting", "team", "team_id") in rels
+    assert Relationship("salary", "team", "team_id->team_id") in rels
+    assert not any(r.src == "park" or r.dst == "park" for r in rels)
+
+
+def test_focus_restricts_to_neighborhood(db_path):
+    dot = db.build_erd_dot(include_columns=False, focus="batting", depth=1)
+    assert "batting -> player" in dot and "batting -> team" in dot
+    assert "park" not in dot and "salary" not in dot and "appearances" not in dot
+
+
+def test_top_n_keeps_most_connected(db_path):
+    dot = db.build_erd_dot(include_columns=False, top_n=2)
+    assert 'player [label="player"]' in dot and 'team [label="team"]' in dot
+    assert "batting" not in dot
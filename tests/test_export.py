@@ -0,0 +1,95 @@
+import gzip
+import io
+import os
+import sqlite3
+import time
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.ipc as pa_ipc
+import pyarrow.parquet as pq
+import pytest
+
+from src.agent.sql_guardrails import check_sql
+from src.db.export import EXPORT_MAX_AGE_SEC, ExportTooLargeError, export_filename, export_to_file, read_export, write_export
+from src.db.governor import QueryBudget, RowBudgetExceeded
+
+
+@pytest.fixture
+def db_path(make_db):
+    return make_db("CREATE TABLE t (id INTEGER, name TEXT, score REAL)", {"t": [(i, f"n{i}", i / 4) for i in range(120)]})
+
+
+def test_export_runs_the_statement_without_the_preview_limit(db_path, tmp_path):
+    verdict = check_sql("SELECT id, name FROM t ORDER BY id -- all", default_limit=50)
+    assert verdict.sql.endswith("LIMIT 50;") and verdict.statement == "SELECT id, name FROM t ORDER BY id;"
+    assert check_sql("SELECT id FROM t LIMIT 5", default_limit=50).statement == "SELECT id FROM t LIMIT 5;"
+
+    path, stats = export_to_file(verdict.statement, "csv", directory=str(tmp_path))
+    table = pa_csv.read_csv(path)
+    assert stats.rows == table.num_rows == 120 and table.column("name")[119].as_py() == "n119"
+
+
+def test_download_reads_the_file_on_disk_up_to_a_cap(db_path, tmp_path):
+    path, stats = export_to_file("SELECT * FROM t", "csv", "gzip", directory=str(tmp_path))
+    assert path.endswith(".csv.gz") and os.path.getsize(path) == stats.bytes
+    data = read_export(path, max_bytes=stats.bytes)
+    assert gzip.decompress(data).decode().count("\n") == 121
+    with pytest.raises(ExportTooLargeError):
+        read_export(path, max_bytes=stats.bytes - 1)
+    # A failed export leaves no file behind
+    failed = tmp_path / "failed"
+    failed.mkdir()
+    with pytest.raises(RowBudgetExceeded):
+        export_to_file("SELECT * FROM t", "csv", budget=QueryBudget(max_rows=10), directory=str(failed))
+    assert not list(failed.iterdir())
+
+
+def test_abandoned_exports_are_swept(db_path, tmp_path):
+    stale, _ = export_to_file("SELECT id FROM t", "csv", directory=str(tmp_path))
+    old = time.time() - EXPORT_MAX_AGE_SEC - 60
+    os.utime(stale, (old, old))
+    other = tmp_path / "export-unrelated.csv"
+    other.write_text("x")
+    os.utime(other, (old, old))
+    fresh, _ = export_to_file("SELECT id FROM t", "csv", directory=str(tmp_path))
+    assert os.path.exists(fresh) and not os.path.exists(stale) and other.exists()
+
+
+@pytest.mark.parametrize(
+    "fmt, compression",
+    [("csv", "gzip"), ("parquet", "zstd"), ("parquet", None), ("arrow", "lz4"), ("arrow", None)],
+)
+def test_formats_round_trip(db_path, fmt, compression):
+    buf = io.BytesIO()
+    stats = write_export("SELECT * FROM t", buf, fmt, compression, batch_size=32)
+    assert stats.bytes == len(buf.getvalue()) and stats.rows == 120
+    buf.seek(0)
+    if fmt == "csv":
+        table = pa_csv.read_csv(io.BytesIO(gzip.decompress(buf.read())))
+    elif fmt == "parquet":
+        table = pq.read_table(buf)
+    else:
+        table = pa_ipc.open_file(buf).read_all()
+    assert table.schema.types == [pa.int64(), pa.string(), pa.float64()]
+    assert table.column("score").to_pylist()[-1] == 119 / 4
+    assert export_filename(fmt, compression) in {"results.csv.gz", "results.parquet", "results.arrow"}
+
+
+def test_widened_column_restarts_export(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO t VALUES ('x', 'late', 0.0)")
+    conn.commit()
+    conn.close()
+    buf = io.BytesIO()
+    stats = write_export("SELECT id FROM t", buf, "parquet", batch_size=50)
+    table = pq.read_table(io.BytesIO(buf.getvalue()))
+    assert stats.rows == table.num_rows == 121
+    assert table.schema.types == [pa.string()] and table.column("id").to_pylist()[-2:] == ["119", "x"]
+
+
+def test_export_budget(db_path):
+    with pytest.raises(RowBudgetExceeded):
+        write_export("SELECT * FROM t", io.BytesIO(), "csv", budget=QueryBudget(max_rows=100), batch_size=10)
+    with pytest.raises(ValueError):
+        write_export("SELECT * FROM t", io.BytesIO(), "csv", compression="zstd")
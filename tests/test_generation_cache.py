@@ -0,0 +1,40 @@
+from src.agent.generation_cache import GenerationCache, cached_generate, normalize_question
+
+SCOPE = ("schema1", "openai", "gpt-4o-mini")
+
+
+def test_normalize_question():
+    assert normalize_question("  Who had the MOST home-runs? ") == "who had the most home runs"
+
+
+def test_exact_hit_persists_across_instances(tmp_path):
+    path = str(tmp_path / "gen.db")
+    cache = GenerationCache(path)
+    cache.put("How many players?", *SCOPE, "SELECT COUNT(*) FROM player;")
+    cache.close()
+
+    hit = GenerationCache(path).get("how many players", *SCOPE)
+    assert hit is not None and hit.sql == "SELECT COUNT(*) FROM player;" and hit.similarity == 1.0
+
+
+def test_near_duplicate_and_scope(tmp_path):
+    cache = GenerationCache(str(tmp_path / "gen.db"), threshold=0.75)
+    cache.put("top 5 players by salary in 2015", *SCOPE, "SELECT 1;")
+    hit = cache.get("top 5 player by salaries in 2015", *SCOPE)
+    assert hit is not None and hit.sql == "SELECT 1;" and hit.similarity < 1.0
+    # Different numbers or a different schema never match
+    assert cache.get("top 5 players by salary in 2016", *SCOPE) is None
+    assert cache.get("top 5 players by salary in 2015", "schema2", "openai", "gpt-4o-mini") is None
+
+
+def test_cached_generate_calls_model_once(tmp_path):
+    cache = GenerationCache(str(tmp_path / "gen.db"))
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return "SELECT 2;"
+
+    assert cached_generate("q", *SCOPE, generate, cache=cache) == ("SELECT 2;", None)
+    sql, hit = cached_generate("q", *SCOPE, generate, cache=cache)
+    assert sql == "SELECT 2;" and hit is not None and len(calls) == 1
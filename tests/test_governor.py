@@ -0,0 +1,39 @@
+import pytest
+
+from src.db import sqlite as db
+from src.db.governor import (
+    QueryBudget,
+    QueryTimeoutError,
+    RowBudgetExceeded,
+    StepBudgetExceeded,
+)
+
+CROSS_JOIN = "SELECT COUNT(*) FROM t a, t b, t c, t d"
+
+
+@pytest.fixture
+def db_path(make_db):
+    return make_db("CREATE TABLE t (a INTEGER)", {"t": [(i,) for i in range(200)]})
+
+
+def test_timeout_budget(db_path):
+    with pytest.raises(QueryTimeoutError):
+        db.execute_readonly(CROSS_JOIN, budget=QueryBudget(timeout_sec=0.05))
+
+
+def test_step_budget(db_path):
+    with pytest.raises(StepBudgetExceeded):
+        db.execute_readonly(CROSS_JOIN, budget=QueryBudget(timeout_sec=None, max_steps=100_000))
+
+
+def test_row_budget(db_path):
+    with pytest.raises(RowBudgetExceeded):
+        db.execute_readonly("SELECT a FROM t", budget=QueryBudget(max_rows=10))
+    cols, rows = db.execute_readonly("SELECT a FROM t LIMIT 10", budget=QueryBudget(max_rows=10))
+    assert cols == ["a"] and len(rows) == 10
+
+
+def test_connection_usable_after_trip(db_path):
+    with pytest.raises(StepBudgetExceeded):
+        db.execute_readonly(CROSS_JOIN, budget=QueryBudget(max_steps=1_000))
+    assert db.execute_readonly("SELECT COUNT(*) FROM t")[1] == [(200,)]
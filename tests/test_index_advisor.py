@@ -0,0 +1,93 @@
+import os
+import sqlite3
+
+import pytest
+
+from src.db.catalog import SchemaCatalog, introspect
+from src.db.index_advisor import (
+    Recommendation,
+    WorkloadEntry,
+    apply_recommendations,
+    column_usage,
+    fold_prefixes,
+    load_workload,
+    recommend,
+    record_query,
+    time_workload,
+)
+from src.db.plan_gate import explain, loop_steps
+
+
+SCHEMA = """
+CREATE TABLE player (player_id TEXT PRIMARY KEY, name_first TEXT);
+CREATE TABLE batting (player_id TEXT, year INTEGER, hr INTEGER, team_id TEXT);
+"""
+
+
+@pytest.fixture
+def db_path(make_db):
+    return make_db(
+        SCHEMA,
+        {
+            "player": [(f"p{i}", f"n{i}") for i in range(100)],
+            "batting": [(f"p{i % 100}", 1900 + i % 50, i % 30, "t1") for i in range(2000)],
+        },
+    )
+
+
+def test_column_usage_roles():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(SCHEMA)
+    catalog = SchemaCatalog(introspect(conn), 0)
+    usage = column_usage(
+        "SELECT p.name_first, SUM(b.hr) FROM batting b JOIN player p ON p.player_id = b.player_id "
+        "WHERE b.year = 2000 AND b.hr > 3 GROUP BY p.name_first",
+        catalog,
+    )
+    assert usage["batting"].eq == ["year"] and usage["batting"].join == ["player_id"]
+    assert usage["batting"].range == ["hr"]
+    assert usage["player"].join == ["player_id"] and usage["player"].order == ["name_first"]
+
+
+def test_fold_prefixes_keeps_chained_weights():
+    recs = [Recommendation("batting", cols, False, "workload", 1, w) for cols, w in [(("year",), 1.0), (("year", "hr"), 5.0), (("year", "hr", "team_id"), 4.0)]]
+    found = {(r.table, r.columns): r for r in recs}
+    fold_prefixes(found)
+    assert list(found.values()) == [Recommendation("batting", ("year", "hr", "team_id"), False, "workload", 3, 10.0)]
+
+
+def test_workload_log_roundtrip(tmp_path):
+    path = str(tmp_path / "w.jsonl")
+    record_query("SELECT 1", 0.5, path)
+    record_query("SELECT  1;", 0.25, path)
+    record_query("SELECT 2", 0.1, path)
+    entries = load_workload(path)
+    assert [(e.count, e.total_sec) for e in entries] == [(2, 0.75), (1, 0.1)]
+
+
+def test_workload_log_is_capped(tmp_path):
+    path = str(tmp_path / "w.jsonl")
+    for i in range(200):
+        record_query(f"SELECT {i}", 0.01, path, max_bytes=4000)
+    assert os.path.getsize(path) <= 4000
+    entries = load_workload(path)
+    assert 20 < len(entries) < 200 and "SELECT 199" in {e.sql for e in entries}
+
+
+def test_recommend_apply_and_time(db_path):
+    sql = "SELECT b.year, SUM(b.hr) FROM batting b JOIN player p ON p.player_id = b.player_id WHERE b.year = 1910 GROUP BY b.year"
+    workload = [WorkloadEntry(sql, 3, 0.3)]
+    recs = recommend(workload)
+    top = recs[0]
+    assert (top.table, top.columns[:2], top.reason, top.queries) == ("batting", ("year", "player_id"), "workload", 3)
+    assert top.covering and "hr" in top.columns
+    # Join keys from the ERD are offered too, but never ahead of the workload
+    assert all(r.reason == "join_key" for r in recs[1:])
+
+    before = time_workload(workload, repeat=1)
+    statements = apply_recommendations([top])
+    assert statements[-1] == "ANALYZE;"
+    assert ("SCAN", "b", "") not in loop_steps(explain(sql))
+    assert time_workload(workload, repeat=1)[sql] is not None and before[sql] is not None
+    # Already indexed now, so it is no longer recommended
+    assert all(r.columns != top.columns for r in recommend(workload))
@@ -0,0 +1,45 @@
+from functools import partial
+
+import pytest
+
+from benchmarks.mock_llm_server import start_mock_server
+from benchmarks.nl2sql import percentile, run_benchmark
+from src.agent.providers import generate_sql_local, stream_sql_openai
+
+ITEMS = [
+    {"question": "How many players?", "gold_sql": "SELECT COUNT(*) FROM player;",
+     "completion": "Sure:\n```sql\nSELECT COUNT(*) AS n FROM player;\n```"},
+    {"question": "Tallest player?", "gold_sql": "SELECT name FROM player ORDER BY height DESC LIMIT 1;",
+     "completion": "SELECT name FROM player ORDER BY height ASC LIMIT 1;"},
+    {"question": "Drop it", "gold_sql": "SELECT 1;", "completion": "DROP TABLE player;"},
+]
+
+
+@pytest.fixture
+def mock_llm(make_db):
+    make_db("CREATE TABLE player (name TEXT, height INTEGER)", {"player": [("a", 70), ("b", 80)]})
+    server, url, llm = start_mock_server(ITEMS)
+    yield url, llm
+    server.shutdown()
+
+
+def test_percentile():
+    assert percentile([3, 1, 2, 4], 50) == 2
+    assert percentile([3, 1, 2, 4], 99) == 4
+    assert percentile([], 50) == 0.0
+
+
+def test_benchmark_against_mock_llm(mock_llm):
+    url, llm = mock_llm
+    report = run_benchmark(ITEMS, partial(generate_sql_local, base_url=url, model="mock"), concurrency=2, repeat=2)
+    assert report["runs"] == 6 and llm.requests == 6
+    assert report["accuracy"] == pytest.approx(2 / 6)
+    assert set(report["stages_ms"]) == {"prompt", "generate", "guardrails", "limit", "execute", "total"}
+    assert ("Drop it", "failed guardrails") in report["failures"]
+    assert ("Tallest player?", "wrong result") in report["failures"]
+
+
+def test_mock_llm_streams(mock_llm, monkeypatch):
+    url, _ = mock_llm
+    monkeypatch.setenv("OPENAI_API_BASE", url + "/chat/completions")
+    assert stream_sql_openai("Question: How many players?", api_key="x") == "SELECT COUNT(*) AS n FROM player;"
@@ -0,0 +1,97 @@
+import sqlite3
+
+import pytest
+
+from src.db.paginator import Paginator, page_query, plan_pagination
+from src.db.pool import reset_pools
+
+
+@pytest.fixture
+def db_path(make_db):
+    rows = [(f"p{i % 17}", 1900 + i % 9, None if i % 5 == 0 else i % 7) for i in range(103)]
+    path = make_db("CREATE TABLE batting (player_id TEXT, year INTEGER, hr INTEGER)", {"batting": rows})
+    reset_pools()
+    return path
+
+
+def _all_pages(pager):
+    rows, number = [], 0
+    while True:
+        page = pager.page(number)
+        rows += page.rows
+        if not page.has_next:
+            return page.columns, rows
+        number += 1
+
+
+def test_strategy_selection():
+    cols = ["player_id", "year", "hr"]
+    assert plan_pagination("SELECT * FROM batting b WHERE year > 1900 ORDER BY b.year DESC, 3", cols).keys[:2] == (
+        ("year", True),
+        ("hr", False),
+    )
+    assert plan_pagination("SELECT * FROM batting", cols).strategy == "rowid"
+    grouped = plan_pagination("SELECT year, COUNT(*) AS n FROM batting GROUP BY year ORDER BY n DESC", ["year", "n"])
+    assert grouped.strategy == "keyset" and [k.column for k in grouped.keys] == ["n", "year"]
+    assert "ORDER" not in grouped.inner
+    for sql in (
+        "SELECT a.year FROM batting a JOIN batting b USING (year)",
+        "SELECT * FROM batting ORDER BY hr + 1",
+        "SELECT DISTINCT year FROM batting",
+        "SELECT * FROM batting LIMIT 5",
+        "SELECT COUNT(*) FROM batting",
+        "SELECT year FROM batting UNION SELECT 1",
+    ):
+        assert plan_pagination(sql, cols).strategy == "offset", sql
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT * FROM batting",
+        "SELECT player_id, hr FROM batting WHERE year > 1901 ORDER BY hr DESC",
+        "SELECT * FROM batting ORDER BY hr, player_id DESC",
+        "SELECT hr, COUNT(*) AS n FROM batting GROUP BY hr ORDER BY n DESC",
+        "SELECT a.hr FROM batting a JOIN batting b ON a.rowid = b.rowid ORDER BY a.hr",
+    ],
+)
+def test_pages_match_full_result(db_path, sql):
+    pager = Paginator(sql, page_size=10)
+    conn = sqlite3.connect(db_path)
+    expected = conn.execute(sql).fetchall()
+    columns, rows = _all_pages(pager)
+    assert columns == [d[0] for d in conn.execute(sql).description]
+    if "ORDER BY" in sql and pager.strategy != "offset":
+        # Ties are broken by rowid / group keys: compare as ordered on the ORDER BY
+        assert sorted(rows, key=repr) == sorted(expected, key=repr)
+        key_cols = [columns.index(k.column) for k in pager.plan.keys if k.column in columns][:1]
+        assert [[r[i] for i in key_cols] for r in rows] == [[r[i] for i in key_cols] for r in expected]
+    else:
+        assert rows == expected
+    assert pager.total(wait=True) == len(expected)
+
+
+def test_rowid_pages_seek(db_path):
+    plan = plan_pagination("SELECT * FROM batting", ["player_id", "year", "hr"])
+    sql, params = page_query(plan, 11, after=(42,))
+    conn = sqlite3.connect(db_path)
+    detail = " ".join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+    assert "rowid>?" in detail and "SCAN" not in detail
+
+
+def test_jump_then_continue_and_invalidate(db_path):
+    pager = Paginator("SELECT * FROM batting ORDER BY year", page_size=10, prefetch=False)
+    jumped = pager.page(4)
+    assert 5 in pager._starts  # the OFFSET jump recorded the key for the next page
+    following = pager.page(5)
+    full = Paginator("SELECT * FROM batting ORDER BY year", page_size=10, prefetch=False)
+    assert jumped.rows + following.rows == full.page(4).rows + full.page(5).rows
+    assert pager.page_count() is None or pager.page_count() == 11
+    assert pager.total(wait=True) == 103 and pager.page_count() == 11
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("DELETE FROM batting WHERE year = 1900")
+    conn.commit()
+    conn.close()
+    assert pager.page(4).rows != jumped.rows
+    assert pager.total(wait=True) == 103 - 12
@@ -0,0 +1,72 @@
+import pytest
+
+from src.db import plan_gate
+from src.db.plan_gate import check_plan, estimate_plan, format_plan, parse_plan, table_aliases
+
+
+@pytest.fixture
+def db_path(make_db, monkeypatch):
+    path = make_db(
+        """
+        CREATE TABLE player (player_id TEXT PRIMARY KEY, name TEXT);
+        CREATE TABLE batting (player_id TEXT, year INTEGER, hr INTEGER);
+        CREATE INDEX batting_year ON batting (year);
+        """,
+        {
+            "player": [(f"p{i}", f"n{i}") for i in range(50)],
+            "batting": [(f"p{i % 50}", 1900 + i % 100, i % 40) for i in range(3000)],
+        },
+    )
+    monkeypatch.setattr(plan_gate, "LARGE_TABLE_ROWS", 1000)
+    monkeypatch.setattr(plan_gate, "LARGE_SORT_ROWS", 1000)
+    monkeypatch.setattr(plan_gate, "MAX_PLAN_COST", 100_000)
+    return path
+
+
+def test_parse_and_format_plan():
+    rows = [(2, 0, 0, "MATERIALIZE x"), (5, 2, 0, "SCAN t"), (9, 0, 0, "SCAN x")]
+    plan = parse_plan(rows)
+    assert [n.detail for n in plan] == ["MATERIALIZE x", "SCAN x"]
+    assert format_plan(plan) == "MATERIALIZE x\n   |--SCAN t\nSCAN x"
+    rows, cost, issues = estimate_plan(plan, {"t": "t"}, {"t": 10})[1:]
+    assert rows == 10 and cost == 20 and issues == []
+
+
+def test_aliases():
+    aliases = table_aliases("SELECT * FROM batting b JOIN player AS p ON p.player_id = b.player_id", ["batting", "player"])
+    assert aliases["b"] == "batting" and aliases["p"] == "player"
+
+
+def test_indexed_lookup_allowed(db_path):
+    decision = check_plan("SELECT name FROM player WHERE player_id = 'p1'", policy="reject")
+    assert decision.action == "allow" and decision.estimate.cost < 100
+
+
+def test_cross_join_flagged_per_policy(db_path):
+    sql = "SELECT COUNT(*) FROM batting a, batting b WHERE a.hr > b.hr"
+    warn = check_plan(sql, policy="warn")
+    kinds = {i.kind for i in warn.estimate.issues}
+    assert warn.action == "warn" and {"full_scan", "nested_scan", "high_cost"} <= kinds
+    assert check_plan(sql, policy="reject").action == "reject"
+    # COUNT(*) reads the whole join whatever the LIMIT, so there is no mitigation to apply
+    aggregated = check_plan(sql, policy="limit", limit=10)
+    assert aggregated.action == "reject" and aggregated.sql == sql and "LIMIT would not help" in aggregated.message
+    grouped = check_plan("SELECT a.hr, COUNT(*) FROM batting a, batting b WHERE a.hr > b.hr GROUP BY a.hr", policy="limit")
+    assert grouped.action == "reject"
+    streaming = "SELECT a.player_id FROM batting a, batting b WHERE a.hr > b.hr"
+    limited = check_plan(streaming, policy="limit", limit=10)
+    assert limited.action == "limit" and limited.sql.endswith("LIMIT 10;")
+    assert check_plan(sql, policy="off").estimate is None
+
+
+def test_streaming_limit_is_not_severe(db_path):
+    # A plain scan stops after LIMIT rows; a grouped one reads everything first
+    assert check_plan("SELECT * FROM batting a, batting b LIMIT 5", policy="reject").action == "allow"
+    grouped = check_plan("SELECT hr, COUNT(*) FROM batting GROUP BY hr", policy="reject")
+    assert grouped.action == "warn"
+    assert {i.kind for i in grouped.estimate.issues} == {"full_scan", "large_sort"}
+
+
+def test_unplannable_query(db_path):
+    assert check_plan("SELECT * FROM missing", policy="reject").action == "reject"
+    assert check_plan("SELECT * FROM missing", policy="warn").message.startswith("Could not plan")
@@ -0,0 +1,70 @@
+from src.agent import bedrock_client, providers
+
+
+class _Resp:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"choices": [{"message": {"content": "```sql\nSELECT 1;\n```"}}]}
+
+
+def test_http_session_is_shared_and_retries():
+    session = providers.get_http_session()
+    assert providers.get_http_session() is session
+    retry = session.get_adapter("https://api.openai.com").max_retries
+    assert retry.total == providers.HTTP_RETRIES
+    assert 429 in retry.status_forcelist and "POST" in retry.allowed_methods
+
+
+def test_openai_uses_pooled_session(monkeypatch):
+    calls = []
+    session = providers.get_http_session()
+    monkeypatch.setattr(session, "post", lambda url, **kw: calls.append(url) or _Resp())
+    assert providers.generate_sql_openai("q", api_key="k") == "SELECT 1;"
+    assert providers.generate_sql_openai("q", api_key="k") == "SELECT 1;"
+    assert len(calls) == 2
+
+
+def test_bedrock_clients_are_cached():
+    a = providers.get_bedrock_client(region="us-west-2")
+    b = providers.get_bedrock_client(region="us-west-2")
+    assert a is b
+    assert bedrock_client.get_runtime_client("us-west-2") is a.client
+    assert a.client.meta.config.max_pool_connections == bedrock_client.BEDROCK_MAX_POOL_CONNECTIONS
+
+
+class _StreamResp:
+    def __init__(self, lines):
+        self.lines = lines
+        self.read = 0
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self, decode_unicode=False):
+        for line in self.lines:
+            self.read += 1
+            yield line
+
+    def close(self):
+        self.closed = True
+
+
+def _sse(text):
+    import json
+
+    return "data: " + json.dumps({"choices": [{"delta": {"content": text}}]})
+
+
+def test_openai_stream_stops_at_first_statement(monkeypatch):
+    lines = [_sse("SELECT a "), "", _sse("FROM t;"), _sse(" And also SELECT b;"), "data: [DONE]"]
+    resp = _StreamResp(lines)
+    session = providers.get_http_session()
+    monkeypatch.setattr(session, "post", lambda url, **kw: resp)
+    seen = []
+    sql = providers.stream_sql_openai("q", api_key="k", on_delta=seen.append)
+    assert sql == "SELECT a FROM t;"
+    assert seen[-1] == "SELECT a FROM t;"
+    assert resp.closed and resp.read == 3
@@ -0,0 +1,45 @@
+import sqlite3
+
+import pytest
+
+from src.db import result_cache
+from src.db.result_cache import ResultCache, cached_execute_readonly, normalize_sql
+
+
+@pytest.fixture
+def db_path(make_db, monkeypatch):
+    path = make_db("CREATE TABLE t (a INTEGER)", {"t": [(i,) for i in range(5)]})
+    monkeypatch.setattr(result_cache, "RESULT_CACHE", ResultCache(max_bytes=1 << 20))
+    return path
+
+
+def test_normalize_sql_keeps_literals():
+    assert normalize_sql("SELECT  a\n FROM t WHERE b = 'x  y' ;") == "SELECT a FROM t WHERE b = 'x  y'"
+
+
+def test_hit_then_invalidated_by_write(db_path):
+    assert cached_execute_readonly("SELECT COUNT(*) FROM t")[1] == [(5,)]
+    assert cached_execute_readonly("SELECT   COUNT(*) FROM t;")[1] == [(5,)]
+    assert result_cache.RESULT_CACHE.stats()["hits"] == 1
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO t VALUES (99)")
+    conn.commit()
+    conn.close()
+    assert cached_execute_readonly("SELECT COUNT(*) FROM t")[1] == [(6,)]
+
+
+def test_bypass_skips_lookup(db_path):
+    cached_execute_readonly("SELECT a FROM t")
+    cached_execute_readonly("SELECT a FROM t", bypass=True)
+    assert result_cache.RESULT_CACHE.stats()["hits"] == 0
+
+
+def test_lru_eviction_under_byte_budget():
+    cache = ResultCache(max_bytes=5_000)
+    rows = [(i, "x" * 10) for i in range(20)]
+    for i in range(5):
+        cache.put(i, ["a", "b"], rows)
+    stats = cache.stats()
+    assert stats["evictions"] > 0 and stats["bytes"] <= 5_000
+    assert cache.get(4) is not None and cache.get(0) is None
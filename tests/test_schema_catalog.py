@@ -0,0 +1,79 @@
+import os
+import sqlite3
+
+import pytest
+
+from src.db import catalog as catalog_mod
+from src.db import sqlite as db
+
+
+@pytest.fixture
+def db_path(make_db):
+    return make_db(
+        """
+        CREATE TABLE team (team_id TEXT PRIMARY KEY, name TEXT);
+        CREATE TABLE player (player_id TEXT PRIMARY KEY, team_id TEXT REFERENCES team(team_id));
+        """
+    )
+
+
+def test_catalog_contents(db_path):
+    cat = db.get_schema_catalog()
+    assert cat.table_names() == ["player", "team"]
+    assert cat.table("PLAYER").primary_key == ("player_id",)
+    assert db.get_table_columns("team") == [("team_id", "TEXT"), ("name", "TEXT")]
+    assert db.get_foreign_keys("player") == [("team_id", "team", "team_id")]
+    assert db.get_table_columns("missing") == []
+
+
+def test_catalog_reused_across_data_writes(db_path, monkeypatch):
+    first = db.get_schema_catalog()
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO team VALUES ('BOS', 'Boston')")
+    conn.commit()
+    conn.close()
+
+    calls = []
+    real = catalog_mod.introspect
+    monkeypatch.setattr(catalog_mod, "introspect", lambda c: calls.append(1) or real(c))
+    assert db.get_schema_catalog() is first
+    assert calls == []
+
+
+def test_catalog_refreshes_on_schema_change(db_path):
+    first = db.get_schema_catalog()
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE salary (player_id TEXT, amount INTEGER)")
+    conn.commit()
+    conn.close()
+    second = db.get_schema_catalog()
+    assert second is not first
+    assert "salary" in second.table_names()
+    assert second.fingerprint != first.fingerprint
+
+
+def test_bulk_introspection_matches_per_table(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        assert catalog_mod.introspect_bulk(conn) == catalog_mod.introspect_per_table(conn)
+    finally:
+        conn.close()
+
+
+def test_db_version_moves_on_data_schema_and_file_swap(db_path, tmp_path):
+    first = db.db_version()
+    assert db.db_version() == first
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO team VALUES ('BOS', 'Boston')")
+    conn.commit()
+    after_insert = db.db_version()
+    conn.execute("CREATE INDEX team_name ON team (name)")
+    conn.commit()
+    conn.close()
+    after_index = db.db_version()
+    assert len({first, after_insert, after_index}) == 3
+
+    other = str(tmp_path / "other.db")
+    sqlite3.connect(other).close()
+    os.replace(other, db_path)
+    assert db.db_version() != after_index
@@ -0,0 +1,48 @@
+import sqlite3
+
+import pytest
+
+from src.agent.schema_index import build_schema_prompt, get_schema_index, tokenize
+
+
+@pytest.fixture
+def db_path(make_db):
+    # 25 filler tables sort before the ones that matter, past the old 20-table cut
+    fillers = "".join(f"CREATE TABLE aa_filler_{i:02d} (x INTEGER, note TEXT);\n" for i in range(25))
+    return make_db(
+        fillers
+        + """
+        CREATE TABLE player (player_id TEXT PRIMARY KEY, name_first TEXT, name_last TEXT);
+        CREATE TABLE salary (year INTEGER, team_id TEXT, player_id TEXT, salary INTEGER);
+        CREATE TABLE team (team_id TEXT PRIMARY KEY, name TEXT, league_id TEXT);
+        INSERT INTO team VALUES ('BOS', 'Boston Red Sox', 'AL');
+        """
+    )
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("playerID salaries team_id") == ["player", "id", "salary", "team", "id"]
+    assert tokenize("status games_played class") == ["status", "game", "played", "class"]
+    assert tokenize("salary per team") == tokenize("salaries teams")
+
+
+def test_prompt_keeps_relevant_tables_past_position_20(db_path):
+    prompt = build_schema_prompt("What was the highest salary paid to a player?")
+    assert "Table salary:" in prompt and "Table player:" in prompt
+    assert "aa_filler" not in prompt
+    assert "salary.player_id = player.player_id" in prompt
+
+
+def test_sample_values_are_searchable(db_path):
+    prompt = build_schema_prompt("Red Sox")
+    assert prompt.splitlines()[0].startswith("Table team:")
+
+
+def test_sample_values_follow_the_data(db_path):
+    assert get_schema_index().search("Yankees", k=1) == []
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO team VALUES ('NYA', 'New York Yankees', 'AL')")
+    conn.commit()
+    conn.close()
+    # Same schema, new data: the samples are taken again
+    assert get_schema_index().search("Yankees", k=1) == ["team"]
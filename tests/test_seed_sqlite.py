@@ -0,0 +1,174 @@
+import os
+import sqlite3
+
+import pytest
+
+from src.data import seed_sqlite
+from src.data.seed_sqlite import MANIFEST_TABLE, CsvFormatError, discover_csvs, iter_blocks, load_csv, seed_baseball
+from src.db import sqlite as db
+
+
+@pytest.fixture
+def csv_dir(tmp_path):
+    root = tmp_path / "TheHistoryofBaseball"
+    (root / "player").mkdir(parents=True)
+    (root / "batting").mkdir()
+    (root / "player" / "player.csv").write_text(
+        'player_id,name_first,birth_year,Weight (lb)\n'
+        'aaronha01,Hank,1934,180\n'
+        'ruthba01,"Babe\nthe Bambino",1895,\n'
+        'cobbty01,"Ty, ""the Peach""",,175.5\n'
+    )
+    lines = ["player_id,year,hr,avg"] + [f"p{i % 7},{1900 + i % 90},{'' if i % 5 == 0 else i % 40},0.{i % 1000:03d}" for i in range(3000)]
+    (root / "batting" / "batting.csv").write_text("\n".join(lines) + "\n")
+    return str(root)
+
+
+def test_blocks_end_on_record_boundaries(csv_dir):
+    path = os.path.join(csv_dir, "player", "player.csv")
+    blocks = list(iter_blocks(path, chunk_bytes=30))
+    assert blocks[0] == b"player_id,name_first,birth_year,Weight (lb)\n"
+    assert b"".join(blocks) == open(path, "rb").read()
+    assert all(b.count(b'"') % 2 == 0 for b in blocks)
+    assert sorted(discover_csvs(csv_dir)) == ["batting", "player"]
+
+
+def test_late_values_widen_types_and_stray_quotes_fail(tmp_path):
+    root = tmp_path / "csv"
+    root.mkdir()
+    lines = ["team,wins,era"] + [f"t{i},{i},{i}" for i in range(2000)] + ["late1,007,2.5", "late2,n/a,3"]
+    (root / "team.csv").write_text("\n".join(lines) + "\n")
+    conn = sqlite3.connect(str(tmp_path / "w.db"), isolation_level=None)
+    # The first 200-byte block only has integers; the reload keeps "007" as written
+    load = load_csv(conn, "team", str(root / "team.csv"), chunk_bytes=200)
+    assert load.rows == 2002
+    assert {r[1]: r[2] for r in conn.execute("PRAGMA table_info(team)")} == {"team": "TEXT", "wins": "TEXT", "era": "REAL"}
+    assert conn.execute("SELECT wins, era FROM team WHERE team LIKE 'late%' ORDER BY team").fetchall() == [("007", 2.5), ("n/a", 3.0)]
+    conn.close()
+
+    bad = tmp_path / "bad.csv"
+    bad.write_text('a,b\n1,"oops\n' + "2,3\n" * 500)
+    with pytest.raises(CsvFormatError, match="unbalanced quote"):
+        list(iter_blocks(str(bad), chunk_bytes=10, max_record_bytes=100))
+
+
+def test_numbers_affinity_would_rewrite_widen_without_other_text(tmp_path):
+    path = tmp_path / "zip.csv"
+    late = [("z1", "007", "1.0", "3"), ("z2", "+5", "2.5", "-0"), ("z3", " 7", "4", "02134")]
+    lines = ["id,code,ratio,zip"] + [f"r{i},{i},{i},{i}" for i in range(500)] + [",".join(r) for r in late]
+    path.write_text("\n".join(lines) + "\n")
+    conn = sqlite3.connect(str(tmp_path / "z.db"), isolation_level=None)
+    load_csv(conn, "z", str(path), chunk_bytes=1000)
+    assert {r[1]: r[2] for r in conn.execute("PRAGMA table_info(z)")} == {"id": "TEXT", "code": "TEXT", "ratio": "REAL", "zip": "TEXT"}
+    stored = conn.execute("SELECT code, ratio, zip FROM z WHERE id LIKE 'z%' ORDER BY id").fetchall()
+    assert stored == [("007", 1.0, "3"), ("+5", 2.5, "-0"), (" 7", 4.0, "02134")]
+    assert conn.execute("SELECT typeof(code), typeof(ratio) FROM z WHERE id = 'r1'").fetchone() == ("text", "real")
+    conn.close()
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_seed_types_and_rows(csv_dir, tmp_path, workers):
+    path = str(tmp_path / "seed.db")
+    sqlite3.connect(path).execute("PRAGMA journal_mode = WAL").fetchall()
+    loads = seed_baseball(csv_dir, path=path, workers=workers)
+    assert {(load.table, load.rows) for load in loads} == {("batting", 3000), ("player", 3)}
+
+    conn = sqlite3.connect(path)
+    # The swapped-in file always uses a rollback journal
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    cols = {r[1]: r[2] for r in conn.execute("PRAGMA table_info(player)")}
+    assert cols == {"player_id": "TEXT", "name_first": "TEXT", "birth_year": "INTEGER", "weight_lb": "REAL"}
+    assert conn.execute("SELECT name_first, birth_year, weight_lb FROM player WHERE player_id = 'ruthba01'").fetchone() == (
+        "Babe\nthe Bambino",
+        1895,
+        None,
+    )
+    assert conn.execute("SELECT name_first FROM player WHERE player_id = 'cobbty01'").fetchone() == ('Ty, "the Peach"',)
+    assert conn.execute("SELECT COUNT(*), COUNT(hr), typeof(year), typeof(avg) FROM batting").fetchone() == (3000, 2400, "integer", "real")
+
+
+def test_incremental_reload_and_atomic_swap(csv_dir, tmp_path, monkeypatch):
+    path = str(tmp_path / "live.db")
+    monkeypatch.setattr(db, "DB_PATH", path)
+    assert len(seed_baseball(csv_dir, workers=0)) == 2
+    assert db.list_tables() == ["_seed_manifest", "batting", "player"]
+    assert db.get_schema_catalog().table_names() == ["batting", "player"]
+    inode = os.stat(path).st_ino
+    assert seed_baseball(csv_dir, workers=0) == []
+    assert os.stat(path).st_ino == inode
+
+    batting = os.path.join(csv_dir, "batting", "batting.csv")
+    with open(batting, "a") as f:
+        f.write("p1,1999,70,0.300\n")
+    loads = seed_baseball(csv_dir, workers=0)
+    assert [(load.table, load.rows) for load in loads] == [("batting", 3001)]
+    assert os.stat(path).st_ino != inode and not os.path.exists(path + ".seeding")
+    # Pooled readers opened before the swap reopen on the new file
+    assert db.execute_readonly("SELECT MAX(hr) FROM batting")[1] == [(70,)]
+    manifest = dict(sqlite3.connect(path).execute(f"SELECT name, rows FROM {MANIFEST_TABLE}").fetchall())
+    assert manifest == {"batting": 3001, "player": 3}
+
+
+def test_reload_keeps_the_tables_indexes(csv_dir, tmp_path):
+    path = str(tmp_path / "live.db")
+    seed_baseball(csv_dir, path=path, workers=0)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE INDEX advisor_batting_year ON batting (year, hr)")
+    conn.execute("CREATE INDEX advisor_batting_avg ON batting (avg)")
+    conn.close()
+
+    batting = os.path.join(csv_dir, "batting", "batting.csv")
+    lines = open(batting).read().splitlines()
+    # The reloaded file renames avg, so only the first index still applies
+    lines = [lines[0].replace("avg", "average")] + lines[1:] + ["p1,1999,70,0.300"]
+    with open(batting, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    (load,) = seed_baseball(csv_dir, path=path, workers=0)
+    assert load.rows == 3001 and load.lost_indexes == ("advisor_batting_avg",)
+    conn = sqlite3.connect(path)
+    indexes = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'batting'").fetchall()
+    assert indexes == [("advisor_batting_year",)]
+    conn.close()
+
+
+def test_resume_after_crash(csv_dir, tmp_path, monkeypatch):
+    path = str(tmp_path / "live.db")
+    load_csv = seed_sqlite.load_csv
+
+    def crash_on_player(conn, table, *args, **kwargs):
+        if table == "player":
+            raise KeyboardInterrupt
+        return load_csv(conn, table, *args, **kwargs)
+
+    monkeypatch.setattr(seed_sqlite, "load_csv", crash_on_player)
+    with pytest.raises(KeyboardInterrupt):
+        seed_baseball(csv_dir, path=path, workers=0)
+    assert os.path.exists(path + ".seeding")
+    assert not os.path.exists(path)
+
+    monkeypatch.setattr(seed_sqlite, "load_csv", load_csv)
+    assert [load.table for load in seed_baseball(csv_dir, path=path, workers=0)] == ["player"]
+    assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM batting").fetchone() == (3000,)
+
+
+def test_swap_never_replays_the_old_wal(csv_dir, tmp_path):
+    path = str(tmp_path / "wal.db")
+    reader = sqlite3.connect(path)
+    reader.execute("PRAGMA journal_mode = WAL").fetchall()
+    reader.execute("CREATE TABLE player (player_id TEXT)")
+    reader.executemany("INSERT INTO player VALUES (?)", [(f"old{i}",) for i in range(50)])
+    reader.commit()
+    assert os.path.getsize(path + "-wal") > 0  # frames not yet checkpointed, reader still open
+    seed_baseball(csv_dir, path=path, workers=0, force=True)
+    fresh = sqlite3.connect(path)
+    assert fresh.execute("SELECT COUNT(*), MIN(player_id) FROM player").fetchone() == (3, "aaronha01")
+    fresh.close()
+    reader.close()
+
+
+def test_concurrent_seeders_are_refused(csv_dir, tmp_path):
+    path = str(tmp_path / "locked.db")
+    with seed_sqlite._seed_lock(path):
+        with pytest.raises(seed_sqlite.SeedInProgressError):
+            seed_baseball(csv_dir, path=path, workers=0)
+    assert len(seed_baseball(csv_dir, path=path, workers=0)) == 2
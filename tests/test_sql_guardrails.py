@@ -1,4 +1,5 @@
-from src.agent.sql_guardrails import is_select_only, contains_forbidden, ensure_limit, extract_first_select
+from src.agent.sql_guardrails import IncrementalSqlExtractor, check_sql, is_select_only, contains_forbidden, ensure_limit, extract_first_select
+from src.db import sqlite as db
 
 
 def test_is_select_only():
@@ -23,5 +24,41 @@ SELECT a FROM t;
 ```
 """
     assert extract_first_select(txt).strip().lower().startswith("select")
+    assert extract_first_select("Use a CTE with totals:\nWITH x AS (SELECT 1 AS a) SELECT a FROM x; done") == "WITH x AS (SELECT 1 AS a) SELECT a FROM x;"
+    assert extract_first_select("SELECT ';' AS s FROM t; SELECT 2;") == "SELECT ';' AS s FROM t;"
 
 
+def test_unbalanced_parentheses_are_rejected():
+    assert check_sql("SELECT 1 AS a) SELECT a FROM x;").reason == "unbalanced parentheses"
+    assert check_sql("SELECT (1 FROM t").reason == "unbalanced parentheses"
+    assert not is_select_only("SELECT a FROM (SELECT 1 AS a")
+    assert check_sql("SELECT ')' FROM t WHERE a IN (1, 2)").ok
+
+
+def test_model_text_to_execution(make_db):
+    make_db("CREATE TABLE t (a INTEGER)", {"t": [(i,) for i in range(10)]})
+    answer = "Here is the query with a CTE:\n```sql\nWITH big AS (SELECT a FROM t WHERE a > 6)\nSELECT COUNT(*) FROM big;\n```"
+    streamed = IncrementalSqlExtractor()
+    for i in range(0, len(answer), 7):
+        streamed.feed(answer[i : i + 7])
+    for sql in (extract_first_select(answer), streamed.finish()):
+        verdict = check_sql(sql, default_limit=5)
+        assert verdict.ok, verdict.reason
+        assert verdict.sql == "WITH big AS (SELECT a FROM t WHERE a > 6)\nSELECT COUNT(*) FROM big LIMIT 5;"
+        assert db.execute_readonly(verdict.sql) == (["COUNT(*)"], [(3,)])
+
+
+def test_incremental_extractor_stops_at_first_statement():
+    ex = IncrementalSqlExtractor()
+    chunks = ["Sure! ```sql\nSEL", "ECT name FROM t WHERE x = 'a;b' -- no; ", "\n/* ; */ LIMIT 5", ";\n```", " SELECT 2;"]
+    results = [ex.feed(c) for c in chunks[:4]]
+    assert results[:3] == [None, None, None]
+    assert results[3] == "SELECT name FROM t WHERE x = 'a;b' -- no; \n/* ; */ LIMIT 5;"
+    assert ex.done and ex.finish() == results[3]
+
+
+def test_incremental_extractor_falls_back_without_semicolon():
+    ex = IncrementalSqlExtractor()
+    ex.feed("SELECT a FROM t")
+    assert not ex.done and ex.partial == "SELECT a FROM t"
+    assert ex.finish() == "SELECT a FROM t;"
@@ -0,0 +1,66 @@
+import sqlite3
+
+from src.agent.sql_guardrails import check_many, check_sql, contains_forbidden, ensure_limit, is_select_only
+from src.agent.sql_lexer import analyze, split_statements, tokenize
+
+
+def test_keywords_in_literals_and_comments_are_ignored():
+    sql = "SELECT 'drop table t' AS \"update\" FROM t -- delete everything\n/* insert */ WHERE a = 1;"
+    assert is_select_only(sql)
+    assert not contains_forbidden(sql)
+
+
+def test_cte_and_stacked_statements():
+    assert is_select_only("WITH x AS (SELECT 1 AS a) SELECT a FROM x;")
+    assert not is_select_only("WITH x AS (SELECT 1) DELETE FROM t;")
+    assert not is_select_only("SELECT 1; DROP TABLE t;")
+    assert contains_forbidden("SELECT 1; DROP TABLE t;")
+    assert analyze("SELECT 1;; SELECT 2;").statements == 2
+    assert split_statements("SELECT ';'; SELECT 2") == ["SELECT ';'", "SELECT 2"]
+
+
+def test_unterminated_literal_is_rejected():
+    assert not is_select_only("SELECT 'abc FROM t")
+    assert check_sql("SELECT a FROM t /* x").reason.startswith("unterminated")
+
+
+def test_outermost_limit_only():
+    sub = "SELECT * FROM (SELECT a FROM t LIMIT 5) s"
+    assert analyze(sub).limit is None
+    assert ensure_limit(sub, 50) == sub + " LIMIT 50;"
+    union = "SELECT a FROM t UNION ALL SELECT a FROM u ORDER BY a LIMIT 1000 OFFSET 10;"
+    assert analyze(union).limit_count[2] == 1000
+    assert ensure_limit(union, 50, max_limit=200).endswith("LIMIT 200 OFFSET 10;")
+    assert ensure_limit("SELECT a FROM t LIMIT 10, 900", 50, max_limit=100) == "SELECT a FROM t LIMIT 10, 100;"
+    # A trailing comment must not swallow the appended LIMIT
+    assert ensure_limit("SELECT a FROM t -- all rows", 5) == "SELECT a FROM t LIMIT 5;"
+
+
+def test_rewritten_sql_runs():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (a INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(20)])
+    for sql in [
+        "WITH x AS (SELECT a FROM t LIMIT 15) SELECT a FROM x -- note",
+        "SELECT a FROM t UNION SELECT a + 100 FROM t",
+        "SELECT a FROM t ORDER BY a LIMIT 12",
+    ]:
+        verdict = check_sql(sql, default_limit=10, max_limit=10)
+        assert verdict.ok, verdict.reason
+        assert len(conn.execute(verdict.sql).fetchall()) == 10
+
+
+def test_check_many_and_tokenize():
+    results = check_many(["SELECT 1", "DELETE FROM t", "PRAGMA table_info(t)"], default_limit=5)
+    assert [r.ok for r in results] == [True, False, False]
+    assert results[0].sql == "SELECT 1 LIMIT 5;"
+    kinds = [(t.kind, t.depth) for t in tokenize("SELECT f(a) FROM t")]
+    assert kinds == [("word", 0), ("word", 0), ("op", 0), ("word", 1), ("op", 0), ("word", 0), ("word", 0)]
+
+
+def test_analyze_and_tokenize_agree():
+    sql = "SELECT a -- x ; DROP\n FROM t /* ; */ WHERE b = 'a;b' AND \"c;\" = `d` LIMIT 3"
+    a = analyze(sql)
+    assert (a.statements, a.forbidden) == (1, ())
+    assert a.end == tokenize(sql)[-1].end == len(sql)
+    assert sql[a.limit[0] : a.limit[1]] == "LIMIT 3"
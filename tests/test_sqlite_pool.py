@@ -0,0 +1,48 @@
+import os
+import sqlite3
+
+import pytest
+
+from src.db import sqlite as db
+from src.db.pool import ReadOnlyPool
+
+
+SCHEMA = "CREATE TABLE t (a INTEGER)"
+
+
+def test_connections_are_reused(make_db):
+    path = make_db(SCHEMA, {"t": [(1,), (2,)]})
+    pool = ReadOnlyPool(path, size=2)
+    with pool.connection() as c1:
+        pass
+    with pool.connection() as c2:
+        assert c2 is c1
+        assert c2.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 2
+
+
+def test_connections_are_read_only(make_db):
+    path = make_db(SCHEMA, {"t": [(1,)]})
+    pool = ReadOnlyPool(path)
+    with pool.connection() as conn:
+        with pytest.raises(sqlite3.Error):
+            conn.execute("INSERT INTO t VALUES (3)")
+
+
+def test_unhealthy_connection_is_replaced(make_db):
+    path = make_db(SCHEMA, {"t": [(1,)]})
+    pool = ReadOnlyPool(path)
+    with pool.connection() as c1:
+        c1.close()
+    with pool.connection() as c2:
+        assert c2 is not c1
+        assert c2.execute("SELECT a FROM t").fetchone() == (1,)
+
+
+def test_pool_resets_when_file_replaced(make_db, monkeypatch):
+    path = make_db(SCHEMA, {"t": [(1,)]})
+    assert db.execute_readonly("SELECT COUNT(*) FROM t")[1] == [(1,)]
+
+    side = make_db(SCHEMA, {"t": [(1,), (2,), (3,)]}, name="b.db")
+    monkeypatch.setattr(db, "DB_PATH", path)  # make_db pointed it at the side file
+    os.replace(side, path)
+    assert db.execute_readonly("SELECT COUNT(*) FROM t")[1] == [(3,)]
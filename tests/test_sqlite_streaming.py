@@ -0,0 +1,35 @@
+import pytest
+
+from src.db import sqlite as db
+from src.db.governor import QueryBudget, RowBudgetExceeded
+
+
+@pytest.fixture
+def db_path(make_db):
+    return make_db("CREATE TABLE t (a INTEGER, b TEXT)", {"t": [(i, str(i)) for i in range(25)]})
+
+
+def test_iter_yields_batches(db_path):
+    batches = list(db.execute_readonly_iter("SELECT a, b FROM t ORDER BY a", batch_size=10))
+    assert [len(rows) for _, rows in batches] == [10, 10, 5]
+    assert all(cols == ["a", "b"] for cols, _ in batches)
+    assert [r[0] for _, rows in batches for r in rows] == list(range(25))
+
+
+def test_iter_empty_result_still_yields_columns(db_path):
+    batches = list(db.execute_readonly_iter("SELECT a FROM t WHERE a < 0"))
+    assert batches == [(["a"], [])]
+
+
+def test_iter_row_budget_spans_batches(db_path):
+    stream = db.execute_readonly_iter("SELECT a FROM t", batch_size=10, budget=QueryBudget(max_rows=15))
+    assert len(next(stream)[1]) == 10
+    with pytest.raises(RowBudgetExceeded):
+        next(stream)
+
+
+def test_abandoned_stream_releases_connection(db_path):
+    stream = db.execute_readonly_iter("SELECT a FROM t", batch_size=5)
+    next(stream)
+    stream.close()
+    assert db.execute_readonly("SELECT COUNT(*) FROM t")[1] == [(25,)]
@@ -0,0 +1,91 @@
+import random
+import sqlite3
+from collections import Counter
+
+import pytest
+
+from src.agent.schema_index import build_schema_prompt
+from src.db import plan_gate
+from src.db import stats
+from src.db.governor import QueryTimeoutError
+from src.db.stats import StatsService, column_hint, estimate_distinct, get_stats, read_sidecar
+
+
+@pytest.fixture
+def db_path(make_db, monkeypatch):
+    rows = [(f"p{i % 300}", 1871 + i % 145, ("AL", "NL")[i % 2], None if i % 4 == 0 else i % 60) for i in range(5000)]
+    monkeypatch.delenv("SQLITE_STATS_PATH", raising=False)
+    return make_db(
+        """
+        CREATE TABLE batting (player_id TEXT, year INTEGER, league_id TEXT, hr INTEGER);
+        CREATE TABLE team (team_id TEXT PRIMARY KEY, name TEXT);
+        """,
+        {"batting": rows, "team": [(f"t{i}", f"Team {i}") for i in range(30)]},
+    )
+
+
+def test_estimate_distinct():
+    rng = random.Random(7)
+    population = [rng.randrange(100) for _ in range(100_000)]
+    sample = rng.sample(population, 2000)
+    assert 95 <= estimate_distinct(Counter(sample), 2000, len(population)) <= 100
+    unique = rng.sample(range(100_000), 2000)
+    assert estimate_distinct(Counter(unique), 2000, 100_000) > 90_000
+    assert estimate_distinct(Counter("aab"), 3, 3) == 2
+
+
+def test_refresh_is_incremental_and_persisted(db_path, tmp_path):
+    sidecar = str(tmp_path / "side.stats")
+    service = StatsService(db_path, sidecar=sidecar, sample_rows=1000)
+    assert sorted(service.refresh()) == ["batting", "team"]
+    batting = read_sidecar(sidecar)["batting"]
+    assert batting.rows == 5000
+    year, league, hr = batting.column("year"), batting.column("league_id"), batting.column("HR")
+    assert (year.min, year.max, column_hint(year)) == (1871, 2015, "1871 to 2015")
+    assert league.distinct == 2 and column_hint(league) in ("one of AL, NL", "one of NL, AL")
+    assert hr.null_frac == 0.25 and 40 <= hr.distinct <= 59
+    assert service.refresh() == []
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO team VALUES ('t99', 'Expansion')")
+    conn.execute("DROP TABLE batting")
+    conn.commit()
+    conn.close()
+    assert service.refresh() == ["team"]
+    stored = read_sidecar(sidecar)
+    assert stored["team"].rows == 31 and "batting" not in stored
+
+
+def test_consumers_read_stats_without_scanning(db_path, monkeypatch):
+    service = get_stats()
+    service.current()  # returns what is known and schedules a refresh
+    service.refresh_async().result()
+    assert service.row_counts() == {"batting": 5000, "team": 30}
+    assert "year INTEGER (1871 to 2015)" in build_schema_prompt("home runs by year in batting")
+
+    class Fake:
+        def row_counts(self):
+            return {"batting": 123}
+
+    monkeypatch.setattr(plan_gate, "get_stats", lambda path: Fake())
+    assert plan_gate.table_cardinalities(["batting", "team"]) == {"batting": 123, "team": 30}
+
+
+def test_tables_over_budget_get_a_partial_or_failed_entry(db_path, tmp_path, monkeypatch):
+    def slow(*args, **kwargs):
+        raise QueryTimeoutError("Query exceeded 30s.")
+
+    sidecar = str(tmp_path / "side.stats")
+    service = StatsService(db_path, sidecar=sidecar)
+    monkeypatch.setattr(stats, "collect_table_stats", slow)
+    assert sorted(service.refresh()) == ["batting", "team"]
+    batting = read_sidecar(sidecar)["batting"]
+    assert batting.partial and batting.rows == 5000 and batting.column("year") is None
+    assert service.row_counts() == {"batting": 5000, "team": 30}
+    # Not retried until the table changes
+    assert service.refresh() == [] and service.failed() == {}
+
+    monkeypatch.setattr(stats, "table_signature", slow)
+    fresh = StatsService(db_path, sidecar=str(tmp_path / "other.stats"))
+    assert fresh.refresh() == [] and fresh.row_counts() == {}
+    assert fresh.failed() == {"batting": "Query exceeded 30s.", "team": "Query exceeded 30s."}